@@ -1 +1,6 @@
 # This file makes the directory a Python package
+
+# Load .env once, before any app module reads its settings from the environment
+from dotenv import load_dotenv
+
+load_dotenv()
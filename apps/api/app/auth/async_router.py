@@ -0,0 +1,43 @@
+from typing import Dict
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..authenticate import get_current_user_async
+from ..instrumentation import TimedRoute
+from ..database import get_async_db
+from .. import schemas
+from . import sync
+from .router import UserSyncRequest
+
+# Async twins of the routes in router.py, mounted in their place when DB_MODE=async
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.post("/auth/sync-user", response_model=Dict)
+async def sync_user(
+    user_data: UserSyncRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Sync user from frontend session to backend database"""
+    try:
+        user = schemas.User.model_validate(await sync.sync_user_async(db, user_data))
+        
+        return {"user": user}
+        
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to sync user: {str(e)}"
+        )
+
+
+@router.get("/auth/me", response_model=schemas.User)
+async def get_me(
+    current_user=Depends(get_current_user_async)
+):
+    """Get current user information"""
+    # In a real app, you'd use the user ID from the token to fetch from DB
+    # For now, return basic info from the token
+    return {"message": "Current user info", "user": current_user}
@@ -5,11 +5,12 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from ..authenticate import get_current_user
+from ..instrumentation import TimedRoute
 from ..database import get_db
-from ..db_models import User as DBUser
 from .. import schemas
+from . import sync
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 class UserSyncRequest(BaseModel):
@@ -19,38 +20,18 @@ class UserSyncRequest(BaseModel):
 
 
 @router.post("/auth/sync-user", response_model=Dict)
-async def sync_user(
+def sync_user(
     user_data: UserSyncRequest,
     db: Session = Depends(get_db)
 ):
     """Sync user from frontend session to backend database"""
     try:
-        # Check if user exists in database
-        db_user = db.query(DBUser).filter(DBUser.email == user_data.email).first()
-        
-        if not db_user:
-            # Create new user
-            db_user = DBUser(
-                email=user_data.email,
-                name=user_data.name,
-                google_id=user_data.google_id
-            )
-            db.add(db_user)
-            db.commit()
-            db.refresh(db_user)
-        else:
-            # Update existing user info
-            db_user.name = user_data.name or db_user.name
-            db_user.google_id = user_data.google_id or db_user.google_id
-            db.commit()
-            db.refresh(db_user)
-        
-        # Convert db_user to Pydantic model
-        user = schemas.User.model_validate(db_user)
+        user = schemas.User.model_validate(sync.sync_user(db, user_data))
         
         return {"user": user}
         
     except Exception as e:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Failed to sync user: {str(e)}"
@@ -0,0 +1,102 @@
+"""
+User sync for POST /auth/sync-user.
+
+The frontend calls sync-user on every login and session refresh, nearly
+always with details the database already has. Instead of a SELECT followed
+by an INSERT or UPDATE and a refresh, the user is written with one
+INSERT ... ON CONFLICT (email) DO UPDATE ... RETURNING on Postgres and
+SQLite. The DO UPDATE only fires when the name or google_id actually change,
+so an unchanged sync writes nothing, and concurrent first logins for the same
+email no longer race on the unique constraint.
+
+The synced identity goes into the auth user cache, which lets the following
+get_current_user skip its user lookup.
+"""
+import logging
+from typing import Any, Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..auth_cache import AuthenticatedUser, remember_user
+from ..authenticate import AUTH_LOG_SAMPLE_RATE
+from ..db_models import User
+from ..logs import log_sampled
+
+logger = logging.getLogger(__name__)
+
+users = User.__table__
+
+
+def upsert_statement(dialect_name: str, data: Any):
+    """INSERT ... ON CONFLICT returning the row when it was written, or None for other dialects"""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+
+    statement = insert(users).values(email=data.email, name=data.name, google_id=data.google_id)
+    name = func.coalesce(func.nullif(statement.excluded.name, ""), users.c.name)
+    google_id = func.coalesce(func.nullif(statement.excluded.google_id, ""), users.c.google_id)
+    return statement.on_conflict_do_update(
+        index_elements=[users.c.email],
+        # ON CONFLICT does not apply the column's onupdate
+        set_={"name": name, "google_id": google_id, "updated_at": func.now()},
+        where=or_(users.c.name.is_distinct_from(name), users.c.google_id.is_distinct_from(google_id)),
+    ).returning(*users.c)
+
+
+def _by_email(email: str):
+    return select(users).where(users.c.email == email)
+
+
+def _synced(row, outcome: str) -> AuthenticatedUser:
+    user = AuthenticatedUser.from_orm(row)
+    remember_user(user)
+    log_sampled(logger, AUTH_LOG_SAMPLE_RATE, "auth.user_synced", outcome=outcome, user_id=user.id)
+    return user
+
+
+def _apply(db_user: Optional[User], data: Any) -> User:
+    """Fallback for dialects without ON CONFLICT: the original read-then-write sync"""
+    if db_user is None:
+        return User(email=data.email, name=data.name, google_id=data.google_id)
+    db_user.name = data.name or db_user.name
+    db_user.google_id = data.google_id or db_user.google_id
+    return db_user
+
+
+def sync_user(db: Session, data: Any) -> AuthenticatedUser:
+    statement = upsert_statement(db.get_bind().dialect.name, data)
+    if statement is None:
+        db_user = _apply(db.query(User).filter(User.email == data.email).first(), data)
+        db.add(db_user)
+        db.commit()
+        db.refresh(db_user)
+        return _synced(db_user, "written")
+
+    row = db.execute(statement).first()
+    db.commit()
+    if row is not None:
+        return _synced(row, "written")
+    return _synced(db.execute(_by_email(data.email)).first(), "unchanged")
+
+
+async def sync_user_async(db: AsyncSession, data: Any) -> AuthenticatedUser:
+    statement = upsert_statement(db.bind.dialect.name, data)
+    if statement is None:
+        result = await db.execute(select(User).where(User.email == data.email))
+        db_user = _apply(result.scalars().first(), data)
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return _synced(db_user, "written")
+
+    row = (await db.execute(statement)).first()
+    await db.commit()
+    if row is not None:
+        return _synced(row, "written")
+    return _synced((await db.execute(_by_email(data.email))).first(), "unchanged")
@@ -0,0 +1,137 @@
+"""
+In-process caches used by get_current_user.
+
+Resolving a NextAuth session costs an HKDF expansion, a JWE decrypt and a
+user lookup. The token cache below maps a digest of the raw session token to
+the resolved user identity so repeat requests skip all three. The user cache
+maps a google_id to the same identity; /auth/sync-user fills it at login, so
+the first request with a new session token only pays for the decrypt. When a
+sync changes a user's google_id, the entry under the old one is dropped.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional
+
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Detached snapshot of a User row, safe to share between requests"""
+    id: int
+    email: str
+    name: str
+    google_id: Optional[str]
+    is_active: bool
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_orm(cls, user) -> "AuthenticatedUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            name=user.name,
+            google_id=user.google_id,
+            is_active=user.is_active,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire at a deadline"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        """Store value until the earlier of the cache TTL and expires_at (a unix timestamp)"""
+        deadline = time.monotonic() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, time.monotonic() + (expires_at - time.time()))
+        if deadline <= time.monotonic():
+            return
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def token_digest(token: str) -> str:
+    """Key tokens by digest so raw session tokens are never held in memory longer than needed"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+user_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+# user id -> the google_id its user_cache entry is under; written alongside it so both age together
+_user_keys = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+
+def remember_user(user: AuthenticatedUser) -> None:
+    previous = _user_keys.get(user.id)
+    if previous is not None and previous != user.google_id:
+        user_cache.delete(previous)
+        _user_keys.delete(user.id)
+    if user.google_id:
+        user_cache.set(user.google_id, user)
+        _user_keys.set(user.id, user.google_id)
+
+
+def stats() -> Dict[str, Any]:
+    return {"token_cache": token_cache.stats(), "user_cache": user_cache.stats()}
@@ -1,33 +1,53 @@
 import os
-from typing import Optional, Any, Dict
+import time
+import logging
+from functools import lru_cache
+from typing import Optional, Any, Dict, List, Tuple
 import json
 from hkdf import Hkdf
-from jose import jwt, jwe, JWTError
 
 from fastapi import Depends, HTTPException, status, Request
-from google.auth.transport import requests
-from google.oauth2 import id_token
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .database import get_db
+from . import google_certs, rate_limit
+from .auth_cache import AuthenticatedUser, remember_user, token_cache, token_digest, user_cache
+from .database import get_async_db, get_db
 from .db_models import User
+from .instrumentation import timed
+from .logs import log_sampled
+
+logger = logging.getLogger(__name__)
 
 # Google OAuth Configuration
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 NEXTAUTH_SECRET = os.getenv("NEXTAUTH_SECRET")
+# Comma-separated secrets that are still accepted for decryption while sessions
+# minted before a secret rotation age out
+NEXTAUTH_PREVIOUS_SECRETS = [
+    secret.strip() for secret in os.getenv("NEXTAUTH_PREVIOUS_SECRETS", "").split(",") if secret.strip()
+]
+AUTH_LOG_SAMPLE_RATE = float(os.getenv("AUTH_LOG_SAMPLE_RATE", "0.01"))
 
 
+@lru_cache(maxsize=8)
 def __encryption_key(secret: str):
     return Hkdf("", bytes(secret, "utf-8")).expand(b"NextAuth.js Generated Encryption Key", 32)
 
 
 def encode_jwe(payload: Dict[str, Any], secret: str):
+    # jose pulls in its whole crypto backend stack; load it on first use (or in warm_up)
+    from jose import jwe
+
     data = bytes(json.dumps(payload), "utf-8")
     key = __encryption_key(secret)
     return bytes.decode(jwe.encrypt(data, key), "utf-8")
 
 
 def decode_jwe(token: str, secret: str):
+    from jose import jwe
+
     decrypted = jwe.decrypt(token, __encryption_key(secret))
 
     if decrypted:
@@ -36,17 +56,42 @@ def decode_jwe(token: str, secret: str):
         return None
 
 
+def session_secrets() -> List[str]:
+    """Current secret first, then any previous secrets still accepted"""
+    return [secret for secret in [NEXTAUTH_SECRET, *NEXTAUTH_PREVIOUS_SECRETS] if secret]
+
+
+def decode_session_token(token: str) -> Optional[Dict[str, Any]]:
+    """Decrypt a NextAuth session token with the current or a previous secret"""
+    for secret in session_secrets():
+        try:
+            decrypted = decode_jwe(token, secret)
+        except Exception:
+            continue
+        if decrypted is not None:
+            return decrypted
+    return None
+
+
+def warm_up() -> None:
+    """Load the JWE stack and derive session keys before the first request needs them"""
+    from jose import jwe  # noqa: F401
+
+    for secret in session_secrets():
+        __encryption_key(secret)
+    if GOOGLE_CLIENT_ID:
+        try:
+            google_certs.verifier().warm_up()
+        except google_certs.CertSourceError as exc:
+            # Not fatal: the first verification retries the fetch
+            logger.warning("auth.google_certs_warm_up_failed error=%s", exc)
+
+
 def verify_google_token(token: str) -> dict:
     """Verify Google ID token and return user info"""
     try:
-        # Specify the CLIENT_ID of the app that accesses the backend
-        idinfo = id_token.verify_oauth2_token(token, requests.Request(), GOOGLE_CLIENT_ID)
-
-        # ID token is valid. Get the user's Google Account ID from the decoded token.
-        if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
-            raise ValueError('Wrong issuer.')
-
-        return idinfo
+        # Certificates are cached by google_certs, so this only does network I/O on a cold cache
+        return google_certs.verifier().verify(token)
     except ValueError:
         # Invalid token
         raise HTTPException(
@@ -54,13 +99,15 @@ def verify_google_token(token: str) -> dict:
             detail="Invalid Google token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    except google_certs.CertSourceError:
+        # Already logged by google_certs; the token may be fine, so this is not a 401
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Unable to verify Google token",
+        )
 
 
-def get_current_user(
-    request: Request,
-    db: Session = Depends(get_db)
-):
-    """Get current user from NextAuth JWT token"""
+def _bearer_token(request: Request) -> str:
     authorization = request.headers.get("Authorization")
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -68,31 +115,108 @@ def get_current_user(
             detail="Not authenticated"
         )
     
-    token = authorization.split(" ")[1]
-    print(f"Token: {token}")  # Debug log
-    try:
-        print(f"Secret: {NEXTAUTH_SECRET}")  # Debug log
-        # NextAuth uses JWE (encrypted JWT), so decrypt first
-        decrypted_token = decode_jwe(token, NEXTAUTH_SECRET)
-        if decrypted_token is None:
-            raise Exception("Decryption failed")
-        print(f"Decrypted token: {decrypted_token}")  # Debug log
-        user_google_id = decrypted_token.get("id")
-        print(f"User google_id: {user_google_id}")  # Debug log
-        if user_google_id:
-            user = db.query(User).filter(User.google_id == user_google_id).first()
-            print(f"User found: {user}")  # Debug log
-            if user:
-                return user
-    except Exception as e:
-        print(f"Error: {e}")  # Debug log
-        import traceback
-        traceback.print_exc()
-    
-    raise HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Not authenticated"
-    )
+    return authorization.split(" ")[1]
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def _cached_user(digest: str, started: float) -> Optional[AuthenticatedUser]:
+    cached_user = token_cache.get(digest)
+    if cached_user is not None:
+        log_sampled(logger, AUTH_LOG_SAMPLE_RATE, "auth.resolved", cache="hit", user_id=cached_user.id,
+                    duration_ms=_elapsed_ms(started))
+    return cached_user
+
+
+def _session_claims(token: str) -> Tuple[Optional[str], Optional[float]]:
+    """Return (google_id, exp) from a session token, or (None, None) when it is unusable"""
+    # NextAuth uses JWE (encrypted JWT), so decrypt first
+    decrypted_token = decode_session_token(token)
+    if decrypted_token is None:
+        log_sampled(logger, AUTH_LOG_SAMPLE_RATE, "auth.rejected", level=logging.WARNING, reason="decrypt")
+        return None, None
+    expires_at = decrypted_token.get("exp")
+    if expires_at is not None and expires_at <= time.time():
+        log_sampled(logger, AUTH_LOG_SAMPLE_RATE, "auth.rejected", level=logging.WARNING, reason="expired")
+        return None, None
+    return decrypted_token.get("id"), expires_at
+
+
+def _accept_user(user: Optional[User], digest: str, expires_at: Optional[float], started: float,
+                 cache: str = "miss") -> AuthenticatedUser:
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+
+    current_user = user if isinstance(user, AuthenticatedUser) else AuthenticatedUser.from_orm(user)
+    token_cache.set(digest, current_user, expires_at=expires_at)
+    remember_user(current_user)
+    log_sampled(logger, AUTH_LOG_SAMPLE_RATE, "auth.resolved", cache=cache, user_id=current_user.id,
+                duration_ms=_elapsed_ms(started))
+    return current_user
+
+
+def _resolve_user(request: Request, db: Session) -> AuthenticatedUser:
+    token = _bearer_token(request)
+    with timed("auth"):
+        started = time.perf_counter()
+        digest = token_digest(token)
+        cached_user = _cached_user(digest, started)
+        if cached_user is not None:
+            return cached_user
+
+        user_google_id, expires_at = _session_claims(token)
+        if not user_google_id:
+            return _accept_user(None, digest, expires_at, started)
+        known_user = user_cache.get(user_google_id)
+        if known_user is not None:
+            return _accept_user(known_user, digest, expires_at, started, cache="user")
+        user = db.query(User).filter(User.google_id == user_google_id).first()
+        return _accept_user(user, digest, expires_at, started)
+
+
+def get_current_user(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> AuthenticatedUser:
+    """Get current user from NextAuth JWT token"""
+    # Kept on the request for middleware, e.g. replicas' write tracking
+    request.state.user = _resolve_user(request, db)
+    rate_limit.enforce(request, request.state.user.id)
+    return request.state.user
+
+
+async def _resolve_user_async(request: Request, db: AsyncSession) -> AuthenticatedUser:
+    token = _bearer_token(request)
+    with timed("auth"):
+        started = time.perf_counter()
+        digest = token_digest(token)
+        cached_user = _cached_user(digest, started)
+        if cached_user is not None:
+            return cached_user
+
+        user_google_id, expires_at = _session_claims(token)
+        if not user_google_id:
+            return _accept_user(None, digest, expires_at, started)
+        known_user = user_cache.get(user_google_id)
+        if known_user is not None:
+            return _accept_user(known_user, digest, expires_at, started, cache="user")
+        result = await db.execute(select(User).where(User.google_id == user_google_id))
+        return _accept_user(result.scalars().first(), digest, expires_at, started)
+
+
+async def get_current_user_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+) -> AuthenticatedUser:
+    """Async counterpart of get_current_user for routes served in DB_MODE=async"""
+    request.state.user = await _resolve_user_async(request, db)
+    rate_limit.enforce(request, request.state.user.id)
+    return request.state.user
 
 # Only import get_current_user here, after all other imports and definitions
-__all__ = ["get_current_user"]
+__all__ = ["get_current_user", "get_current_user_async"]
@@ -0,0 +1,236 @@
+"""
+Planning and applying POST /batch operations.
+
+BatchPlan walks the operations in order against the state the earlier ones
+leave behind (a card cannot be created in a deck deleted two operations
+before) and folds them into the final effect on each row: the rows to
+insert, the last values of every updated field, and the rows to delete.
+Nothing is written while planning, so an aborted batch costs two ownership
+queries. apply writes the plan with one bulk statement per kind of change.
+
+Rows created in the batch are keyed by the negative of their operation's
+position until they get a server id, so they never collide with real ids.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, true, update
+from sqlalchemy.orm import Session
+
+from .. import db_models, schemas
+
+MODELS = {"deck": db_models.Deck, "flashcard": db_models.Flashcard}
+SCHEMAS = {
+    ("create", "deck"): schemas.DeckCreate,
+    ("update", "deck"): schemas.DeckUpdate,
+    ("create", "flashcard"): schemas.FlashcardCreate,
+    ("update", "flashcard"): schemas.FlashcardUpdate,
+}
+NOT_FOUND = {"deck": "Deck not found", "flashcard": "Flashcard not found"}
+
+
+class OperationError(Exception):
+    def __init__(self, status: str, error: str):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'data'}: {detail['msg']}" for detail in error.errors()
+    )
+
+
+def owned_rows(db: Session, owner_id: int, operations: List[schemas.BatchOperation]):
+    """The referenced active decks, and the referenced active cards with their decks, that owner_id owns"""
+    Deck, Flashcard = db_models.Deck, db_models.Flashcard
+    deck_ids, card_ids = set(), set()
+    for op in operations:
+        if op.type == "deck" and isinstance(op.id, int):
+            deck_ids.add(op.id)
+        elif op.type == "flashcard" and isinstance(op.id, int):
+            card_ids.add(op.id)
+        if op.type == "flashcard" and isinstance(op.deck_id, int):
+            deck_ids.add(op.deck_id)
+
+    decks = set(db.execute(select(Deck.id).where(
+        Deck.id.in_(deck_ids),
+        Deck.owner_id == owner_id,
+        Deck.is_active == true()
+    )).scalars().all()) if deck_ids else set()
+    cards = dict(db.execute(select(Flashcard.id, Flashcard.deck_id).join(Deck).where(
+        Flashcard.id.in_(card_ids),
+        Deck.owner_id == owner_id,
+        Flashcard.is_active == true()
+    )).all()) if card_ids else {}
+    return decks, cards
+
+
+class BatchPlan:
+    def __init__(self, live_decks: Set[int], live_cards: Dict[int, int]):
+        self.live_decks = set(live_decks)
+        # card key -> deck key, for cards that still exist and for every card the batch touches
+        self.live_cards = dict(live_cards)
+        self.card_decks = dict(live_cards)
+        self.temp_ids: Dict[str, tuple] = {}
+        self.inserts: Dict[str, Dict[int, dict]] = {"deck": {}, "flashcard": {}}
+        self.updates: Dict[str, Dict[int, dict]] = {"deck": {}, "flashcard": {}}
+        self.deletes: Dict[str, Set[int]] = {"deck": set(), "flashcard": set()}
+        self.results: List[schemas.BatchOperationResult] = []
+        # result index -> row key, for filling in server ids once rows are inserted
+        self.result_keys: Dict[int, int] = {}
+
+    @property
+    def failed(self) -> int:
+        return sum(result.status != "applied" for result in self.results)
+
+    @property
+    def empty(self) -> bool:
+        return not any((*self.inserts.values(), *self.updates.values(), *self.deletes.values()))
+
+    def add(self, index: int, op: schemas.BatchOperation) -> None:
+        result = schemas.BatchOperationResult(index=index, status="applied", temp_id=op.temp_id)
+        try:
+            key = getattr(self, f"_{op.op}")(index, op)
+        except OperationError as e:
+            result.status, result.error = e.status, e.error
+        else:
+            self.result_keys[index] = key
+        self.results.append(result)
+
+    def _validate(self, op: schemas.BatchOperation) -> dict:
+        try:
+            values = SCHEMAS[op.op, op.type].model_validate(op.data).model_dump(exclude_unset=op.op == "update")
+        except ValidationError as e:
+            raise OperationError("invalid", validation_message(e))
+        table = MODELS[op.type].__table__
+        for field, value in values.items():
+            if value is None and not table.c[field].nullable:
+                raise OperationError("invalid", f"{field}: may not be null")
+        return values
+
+    def _resolve(self, kind: str, ref: Optional[Union[int, str]], field: str = "id") -> int:
+        if ref is None:
+            raise OperationError("invalid", f"{field} is required")
+        if isinstance(ref, str):
+            if ref not in self.temp_ids or self.temp_ids[ref][0] != kind:
+                raise OperationError("invalid", f"Unknown {kind} temp_id {ref!r}")
+            ref = self.temp_ids[ref][1]
+        if ref not in (self.live_decks if kind == "deck" else self.live_cards):
+            raise OperationError("not_found", NOT_FOUND[kind])
+        return ref
+
+    def _create(self, index: int, op: schemas.BatchOperation) -> int:
+        if op.id is not None:
+            raise OperationError("invalid", "id is assigned by the server; use temp_id")
+        if op.temp_id is not None and op.temp_id in self.temp_ids:
+            raise OperationError("invalid", f"Duplicate temp_id {op.temp_id!r}")
+        values = self._validate(op)
+        key = -(index + 1)
+        if op.type == "flashcard":
+            deck_key = self._resolve("deck", op.deck_id, "deck_id")
+            values["deck_id"] = deck_key
+            self.live_cards[key] = self.card_decks[key] = deck_key
+        else:
+            self.live_decks.add(key)
+        self.inserts[op.type][key] = values
+        if op.temp_id is not None:
+            self.temp_ids[op.temp_id] = (op.type, key)
+        return key
+
+    def _update(self, index: int, op: schemas.BatchOperation) -> int:
+        key = self._resolve(op.type, op.id)
+        values = self._validate(op)
+        if not values:
+            raise OperationError("invalid", "data: no fields to update")
+        # Later updates of a field win; rows created in this batch are inserted with their final values
+        (self.inserts[op.type][key] if key < 0 else self.updates[op.type].setdefault(key, {})).update(values)
+        return key
+
+    def _delete(self, index: int, op: schemas.BatchOperation) -> int:
+        key = self._resolve(op.type, op.id)
+        if op.type == "deck":
+            self.live_decks.discard(key)
+        else:
+            del self.live_cards[key]
+        self.deletes[op.type].add(key)
+        return key
+
+    def drop_unchanged(self, db: Session) -> None:
+        """Leave out updated fields that already hold their value, and updates left with no fields
+
+        The operations still report applied, but a no-op update neither takes
+        a change number nor bumps its deck's version.
+        """
+        for kind, model in MODELS.items():
+            updates = self.updates[kind]
+            if not updates:
+                continue
+            fields = sorted({field for values in updates.values() for field in values})
+            columns = [model.__table__.c[field] for field in fields]
+            rows = db.execute(select(model.id, *columns).where(model.id.in_(updates))).all()
+            for row in rows:
+                values = updates[row.id]
+                for field, current in zip(fields, row[1:]):
+                    if field in values and values[field] == current:
+                        del values[field]
+                if not values:
+                    del updates[row.id]
+
+    def touched_decks(self) -> Set[int]:
+        """Existing decks whose content the plan changes"""
+        decks = {*self.updates["deck"], *self.deletes["deck"]}
+        decks |= {self.card_decks[key] for key in (*self.inserts["flashcard"], *self.updates["flashcard"], *self.deletes["flashcard"])}
+        return {deck_id for deck_id in decks if deck_id > 0}
+
+    def apply(self, db: Session, owner_id: int) -> Set[int]:
+        """Write the plan in the session's transaction; returns the existing decks it changed"""
+        change_seq = db_models.advance_change_seqs(db, [owner_id])[owner_id]
+        now = datetime.now(timezone.utc)
+        server_ids: Dict[int, int] = {}
+
+        def insert_rows(kind: str, extra: dict) -> None:
+            rows = self.inserts[kind]
+            if not rows:
+                return
+            model = MODELS[kind]
+            params = []
+            for key, values in rows.items():
+                deleted = key in self.deletes[kind]
+                params.append({
+                    **values, **extra, "is_active": not deleted, "deleted_at": now if deleted else None,
+                    "change_seq": change_seq,
+                })
+                if "deck_id" in values:
+                    params[-1]["deck_id"] = server_ids.get(values["deck_id"], values["deck_id"])
+            new_ids = db.execute(
+                insert(model).returning(model.id, sort_by_parameter_order=True), params
+            ).scalars().all()
+            server_ids.update(zip(rows, new_ids))
+
+        touched = self.touched_decks()
+        insert_rows("deck", {"owner_id": owner_id})
+        insert_rows("flashcard", {})
+        for kind, model in MODELS.items():
+            updates = self.updates[kind]
+            if updates:
+                # Bulk UPDATE by primary key; rows setting different fields are grouped by the ORM
+                db.execute(update(model), [
+                    {"id": key, **values, "change_seq": change_seq} for key, values in updates.items()
+                ])
+            deletes = {key for key in self.deletes[kind] if key > 0}
+            if deletes:
+                db.execute(
+                    update(model).where(model.id.in_(deletes))
+                    .values(is_active=False, deleted_at=now, change_seq=change_seq),
+                    execution_options={"synchronize_session": False},
+                )
+        db_models.bump_deck_versions(db, touched)
+
+        for result in self.results:
+            if result.status == "applied":
+                key = self.result_keys[result.index]
+                result.id = server_ids.get(key, key)
+        return touched
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..authenticate import get_current_user
+from ..instrumentation import TimedRoute
+from ..response_cache import deck_cache
+from .. import db_models, schemas
+from .planner import BatchPlan, owned_rows
+
+router = APIRouter(prefix="/batch", tags=["batch"], route_class=TimedRoute)
+
+
+@router.post("/", response_model=schemas.BatchResponse)
+def apply_batch(
+    batch: schemas.BatchRequest,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Create, update and delete decks and cards in one request and one transaction
+
+    Operations apply in order, and later ones can refer to rows created
+    earlier through their temp_id. Ownership of every referenced deck and card
+    is checked up front, and the writes go out as bulk statements. With
+    on_error=abort (the default) any failed operation rejects the whole batch
+    with 422 and the per-operation results; with on_error=skip the valid
+    operations are applied and the failed ones reported.
+    """
+    live_decks, live_cards = owned_rows(db, current_user.id, batch.operations)
+    plan = BatchPlan(live_decks, live_cards)
+    for index, op in enumerate(batch.operations):
+        plan.add(index, op)
+
+    failed = plan.failed
+    if failed and batch.on_error == "abort":
+        for result in plan.results:
+            if result.status == "applied":
+                result.status = "aborted"
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=schemas.BatchResponse(applied=0, failed=failed, results=plan.results).model_dump()
+        )
+
+    touched = set()
+    plan.drop_unchanged(db)
+    if not plan.empty:
+        touched = plan.apply(db, current_user.id)
+        db.commit()
+    for deck_id in touched:
+        deck_cache.invalidate_deck(current_user.id, deck_id)
+    return schemas.BatchResponse(applied=len(plan.results) - failed, failed=failed, results=plan.results)
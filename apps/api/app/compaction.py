@@ -0,0 +1,289 @@
+"""
+Compaction of soft-deleted decks and flashcards.
+
+DELETE /decks/{id} and DELETE /flashcards/{id} only clear is_active, so a
+deletion can be undone with the restore endpoints for SOFT_DELETE_RETENTION_DAYS.
+After that, compaction moves the rows out of the hot tables: into the
+*_archive tables (COMPACTION_MODE=archive) or nowhere (purge).
+
+Work happens in batches of COMPACTION_BATCH_SIZE rows, each in its own short
+transaction, with a pause between batches so locks are never held for long.
+On Postgres the batch rows are picked with SKIP LOCKED, so several workers
+running compaction at once split the work instead of colliding.
+
+A card goes together with its review state (dropped; it only schedules the
+card) and review logs (archived alongside it). A deleted deck goes once all
+of its cards have gone, whether those were deleted or not.
+
+Compacted rows take their tombstones out of GET /sync, so each owner's
+sync_floor is raised to the highest change number removed; a client whose
+watermark is older than that gets a full resync.
+
+Run it from cron with `python compact.py`, or set COMPACTION_INTERVAL to run
+it in the background of every worker.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, false, func, insert, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import db_models
+from .database import SessionLocal
+from .response_cache import deck_cache
+
+logger = logging.getLogger(__name__)
+
+SOFT_DELETE_RETENTION_DAYS = float(os.getenv("SOFT_DELETE_RETENTION_DAYS", "30"))
+COMPACTION_MODE = os.getenv("COMPACTION_MODE", "archive").lower()
+COMPACTION_BATCH_SIZE = int(os.getenv("COMPACTION_BATCH_SIZE", "500"))
+# Seconds to sleep between batches, leaving room for request traffic
+COMPACTION_BATCH_PAUSE = float(os.getenv("COMPACTION_BATCH_PAUSE", "0.05"))
+# Seconds between background runs in each worker; 0 leaves compaction to the CLI
+COMPACTION_INTERVAL = float(os.getenv("COMPACTION_INTERVAL", "0"))
+
+if COMPACTION_MODE not in ("archive", "purge"):
+    raise ValueError(f"COMPACTION_MODE must be 'archive' or 'purge', got {COMPACTION_MODE!r}")
+
+Deck = db_models.Deck.__table__
+Flashcard = db_models.Flashcard.__table__
+ReviewState = db_models.ReviewState.__table__
+ReviewLog = db_models.ReviewLog.__table__
+
+
+def retention_cutoff(retention_days: float = SOFT_DELETE_RETENTION_DAYS) -> datetime:
+    """Rows deleted before this are compacted and can no longer be restored"""
+    return datetime.now(timezone.utc) - timedelta(days=retention_days)
+
+
+def restorable(deleted_at: Optional[datetime]) -> bool:
+    if deleted_at is None:
+        return False
+    if deleted_at.tzinfo is None:
+        # SQLite hands back naive UTC timestamps
+        deleted_at = deleted_at.replace(tzinfo=timezone.utc)
+    return deleted_at >= retention_cutoff()
+
+
+@dataclass
+class CompactionReport:
+    mode: str
+    cutoff: str
+    dry_run: bool = False
+    decks: int = 0
+    flashcards: int = 0
+    review_logs: int = 0
+    review_states: int = 0
+    batches: int = 0
+    errors: int = 0
+    duration_ms: float = 0.0
+    max_batch_ms: float = 0.0
+    finished_at: Optional[str] = None
+
+    @property
+    def rows(self) -> int:
+        return self.decks + self.flashcards + self.review_logs + self.review_states
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "rows": self.rows}
+
+
+def _expired(table, cutoff: datetime):
+    return (table.c.is_active == false()) & (table.c.deleted_at < cutoff)
+
+
+def expired_cards_query(cutoff: datetime, batch_size: int):
+    return select(Flashcard.c.id).where(_expired(Flashcard, cutoff)).order_by(
+        Flashcard.c.deleted_at
+    ).limit(batch_size).with_for_update(skip_locked=True)
+
+
+def expired_decks_query(cutoff: datetime, batch_size: int):
+    return select(Deck.c.id).where(_expired(Deck, cutoff)).order_by(
+        Deck.c.deleted_at
+    ).limit(batch_size).with_for_update(skip_locked=True)
+
+
+def _cards_of_decks_query(deck_ids: List[int], batch_size: int):
+    # Live cards of a deleted deck go with it
+    return select(Flashcard.c.id).where(Flashcard.c.deck_id.in_(deck_ids)).order_by(
+        Flashcard.c.id
+    ).limit(batch_size).with_for_update(skip_locked=True)
+
+
+def _raise_sync_floors(session: Session, floors_query) -> None:
+    """Record per owner the newest change that compaction is about to remove"""
+    users = db_models.User.__table__
+    for owner_id, change_seq in session.execute(floors_query).all():
+        session.execute(
+            update(users).where(users.c.id == owner_id, users.c.sync_floor < change_seq)
+            .values(sync_floor=change_seq, updated_at=users.c.updated_at)
+        )
+
+
+def _move(session: Session, table, archive, where, mode: str) -> int:
+    """Copy matching rows into archive (in archive mode) and delete them from table"""
+    if mode == "archive":
+        columns = [column.name for column in table.c]
+        session.execute(insert(archive).from_select(columns, select(*table.c).where(where)))
+    return session.execute(delete(table).where(where)).rowcount
+
+
+def _compact_cards(session: Session, card_ids: List[int], mode: str, report: CompactionReport) -> Set[Tuple[int, int]]:
+    """Move cards and their review rows; returns (owner_id, deck_id) of live decks that lost cards"""
+    live_decks = set(session.execute(
+        select(Deck.c.owner_id, Deck.c.id).where(
+            Deck.c.id.in_(select(Flashcard.c.deck_id).where(Flashcard.c.id.in_(card_ids))),
+            Deck.c.is_active.is_not(false()),
+        )
+    ).all())
+    _raise_sync_floors(session, select(Deck.c.owner_id, func.max(Flashcard.c.change_seq)).join(
+        Deck, Deck.c.id == Flashcard.c.deck_id
+    ).where(Flashcard.c.id.in_(card_ids)).group_by(Deck.c.owner_id))
+    report.review_states += session.execute(
+        delete(ReviewState).where(ReviewState.c.flashcard_id.in_(card_ids))
+    ).rowcount
+    report.review_logs += _move(
+        session, ReviewLog, db_models.ArchivedReviewLog.__table__, ReviewLog.c.flashcard_id.in_(card_ids), mode
+    )
+    report.flashcards += _move(
+        session, Flashcard, db_models.ArchivedFlashcard.__table__, Flashcard.c.id.in_(card_ids), mode
+    )
+    # GET /decks/{id} lists deleted cards too, so decks that lost some have changed
+    db_models.bump_deck_versions(session, [deck_id for _, deck_id in live_decks])
+    return live_decks
+
+
+class Compactor:
+    def __init__(self, mode: str = COMPACTION_MODE, retention_days: float = SOFT_DELETE_RETENTION_DAYS,
+                 batch_size: int = COMPACTION_BATCH_SIZE, pause: float = COMPACTION_BATCH_PAUSE,
+                 session_factory=SessionLocal):
+        self.mode = mode
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.session_factory = session_factory
+
+    def _batch(self, report: CompactionReport, work) -> bool:
+        """Run work in its own transaction; returns whether it did anything"""
+        started = time.perf_counter()
+        touched_decks: Set[Tuple[int, int]] = set()
+        # Counted separately so a rolled back batch reports nothing
+        moved = CompactionReport(mode=self.mode, cutoff=report.cutoff)
+        with self.session_factory() as session:
+            try:
+                did_work = work(session, moved, touched_decks)
+                session.commit()
+            except Exception:
+                session.rollback()
+                report.errors += 1
+                logger.exception("compaction.batch_failed mode=%s", self.mode)
+                return False
+        for key in ("decks", "flashcards", "review_logs", "review_states"):
+            setattr(report, key, getattr(report, key) + getattr(moved, key))
+        for owner_id, deck_id in touched_decks:
+            deck_cache.invalidate_deck(owner_id, deck_id)
+        if did_work:
+            report.batches += 1
+            report.max_batch_ms = max(report.max_batch_ms, round((time.perf_counter() - started) * 1000, 3))
+            if self.pause:
+                time.sleep(self.pause)
+        return did_work
+
+    def run(self) -> CompactionReport:
+        started = time.perf_counter()
+        cutoff = retention_cutoff(self.retention_days)
+        report = CompactionReport(mode=self.mode, cutoff=cutoff.isoformat())
+
+        def deleted_cards(session, moved, touched_decks):
+            card_ids = session.execute(expired_cards_query(cutoff, self.batch_size)).scalars().all()
+            if card_ids:
+                touched_decks |= _compact_cards(session, card_ids, self.mode, moved)
+            return bool(card_ids)
+
+        def deleted_decks(session, moved, touched_decks):
+            deck_ids = session.execute(expired_decks_query(cutoff, self.batch_size)).scalars().all()
+            if not deck_ids:
+                return False
+            card_ids = session.execute(_cards_of_decks_query(deck_ids, self.batch_size)).scalars().all()
+            if card_ids:
+                # Large decks take several batches; the decks go on the batch that finds no cards left
+                _compact_cards(session, card_ids, self.mode, moved)
+                return True
+            _raise_sync_floors(session, select(Deck.c.owner_id, func.max(Deck.c.change_seq)).where(
+                Deck.c.id.in_(deck_ids)
+            ).group_by(Deck.c.owner_id))
+            moved.decks += _move(session, Deck, db_models.ArchivedDeck.__table__, Deck.c.id.in_(deck_ids), self.mode)
+            return True
+
+        for work in (deleted_cards, deleted_decks):
+            while self._batch(report, work):
+                pass
+
+        report.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        report.finished_at = datetime.now(timezone.utc).isoformat()
+        _record(report)
+        logger.info("compaction.finished %s", " ".join(f"{key}={value}" for key, value in report.as_dict().items()))
+        return report
+
+    def pending(self) -> CompactionReport:
+        """Count what a run would compact, without changing anything"""
+        cutoff = retention_cutoff(self.retention_days)
+        report = CompactionReport(mode=self.mode, cutoff=cutoff.isoformat(), dry_run=True)
+        with self.session_factory() as session:
+            expired_decks = select(Deck.c.id).where(_expired(Deck, cutoff))
+            card_ids = select(Flashcard.c.id).where(
+                _expired(Flashcard, cutoff) | Flashcard.c.deck_id.in_(expired_decks)
+            )
+            report.decks = session.execute(select(func.count()).select_from(expired_decks.subquery())).scalar()
+            report.flashcards = session.execute(select(func.count()).select_from(card_ids.subquery())).scalar()
+            report.review_logs = session.execute(
+                select(func.count()).where(ReviewLog.c.flashcard_id.in_(card_ids))
+            ).scalar()
+            report.review_states = session.execute(
+                select(func.count()).where(ReviewState.c.flashcard_id.in_(card_ids))
+            ).scalar()
+        return report
+
+
+_stats_lock = threading.Lock()
+_totals = {"runs": 0, "decks": 0, "flashcards": 0, "review_logs": 0, "review_states": 0, "errors": 0}
+_last_report: Optional[CompactionReport] = None
+
+
+def _record(report: CompactionReport) -> None:
+    global _last_report
+    with _stats_lock:
+        _totals["runs"] += 1
+        for key in ("decks", "flashcards", "review_logs", "review_states", "errors"):
+            _totals[key] += getattr(report, key)
+        _last_report = report
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            "mode": COMPACTION_MODE,
+            "retention_days": SOFT_DELETE_RETENTION_DAYS,
+            "interval_s": COMPACTION_INTERVAL,
+            "totals": dict(_totals),
+            "last_run": _last_report.as_dict() if _last_report else None,
+        }
+
+
+async def run_periodically(interval: float = COMPACTION_INTERVAL) -> None:
+    """Background loop started by the lifespan handler when COMPACTION_INTERVAL is set"""
+    compactor = Compactor()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(compactor.run)
+        except Exception:
+            logger.exception("compaction.run_failed")
@@ -2,21 +2,33 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from .db_pool import pool_options, pool_stats, recent_wait_ms
+
+
+def normalize_database_url(url: str) -> str:
+    """Convert to use psycopg3 driver"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return url
+
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
-# Convert to use psycopg3 driver
-if DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
+DATABASE_URL = normalize_database_url(DATABASE_URL)
+
+# "sync" serves the routers from the threadpool with Session, "async" serves
+# the core routes from the event loop with AsyncSession
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+if DB_MODE not in ("sync", "async"):
+    raise ValueError(f"DB_MODE must be 'sync' or 'async', got {DB_MODE!r}")
 
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -24,10 +36,81 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create Base class
 Base = declarative_base()
 
-# Dependency to get DB session
+# Dependency to get a read-write DB session on the primary; read-only routes
+# use replicas.get_read_db
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync database URL onto its async driver"""
+    # psycopg3 serves both modes; create_async_engine selects its async dialect
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_engine():
+    """Create the async engine on first use so sync mode never imports async drivers"""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        async_url = async_database_url(DATABASE_URL)
+        _async_engine = create_async_engine(async_url, **pool_options(async_url, use_async=True))
+    return _async_engine
+
+
+def get_async_sessionmaker():
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_sessionmaker = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_sessionmaker
+
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+def engine_pool_stats():
+    """Pool statistics for every engine created so far"""
+    stats = {"sync": pool_stats(engine.pool)}
+    if _async_engine is not None:
+        stats["async"] = pool_stats(_async_engine.sync_engine.pool)
+    return stats
+
+
+def pool_wait_ms() -> float:
+    """Recent connection wait on the primary's pools, in milliseconds"""
+    waits = [recent_wait_ms(engine.pool)]
+    if _async_engine is not None:
+        waits.append(recent_wait_ms(_async_engine.sync_engine.pool))
+    return max(waits)
+
+
+async def dispose_engines():
+    """Close pooled connections on shutdown"""
+    engine.dispose()
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
+def reset_after_fork():
+    """Drop pooled connections inherited from a parent process without closing them for the parent"""
+    engine.dispose(close=False)
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
@@ -1,5 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
+
+from typing import Dict, Iterable
+
+from sqlalchemy import BigInteger, Column, Integer, Float, String, Text, DateTime, Boolean, ForeignKey, Index, UniqueConstraint, false, true
+from sqlalchemy import event, inspect, or_, select, update
+from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -14,6 +19,10 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Last change number handed out to this user's decks and cards; see advance_change_seqs
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Highest change number compaction removed; delta syncs from before it start over
+    sync_floor = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     # Relationships
     decks = relationship("Deck", back_populates="owner")
@@ -27,13 +36,37 @@ class Deck(Base):
     description = Column(Text, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_active = Column(Boolean, default=True)
+    # Bumped on every change to the deck or its cards; feeds ETags
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set when is_active is cleared; compaction archives rows deleted longer ago than the retention window
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # The owner's change number of the last write to this row; GET /sync returns rows above a watermark
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     # Relationships
     owner = relationship("User", back_populates="decks")
     flashcards = relationship("Flashcard", back_populates="deck", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_decks_owner_id", "owner_id"),
+        # Every router query filters on owner_id and is_active and pages by id.
+        # Routers compare is_active to a literal true() so the planner can match
+        # this partial index on both Postgres and SQLite.
+        Index(
+            "ix_decks_active_owner_id", "owner_id", "id",
+            postgresql_where=is_active == true(), sqlite_where=is_active == true()
+        ),
+        # Compaction scans soft-deleted rows by age without touching live ones
+        Index(
+            "ix_decks_deleted_at", "deleted_at",
+            postgresql_where=is_active == false(), sqlite_where=is_active == false()
+        ),
+        # Delta sync pages through a user's changes in change_seq order
+        Index("ix_decks_owner_change_seq", "owner_id", "change_seq", "id"),
+    )
+
 
 class Flashcard(Base):
     __tablename__ = "flashcards"
@@ -45,6 +78,212 @@ class Flashcard(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     # Relationships
     deck = relationship("Deck", back_populates="flashcards")
+
+    __table_args__ = (
+        Index("ix_flashcards_deck_id", "deck_id"),
+        # Card listings filter on deck_id and is_active and page by id
+        Index(
+            "ix_flashcards_active_deck_id", "deck_id", "id",
+            postgresql_where=is_active == true(), sqlite_where=is_active == true()
+        ),
+        Index(
+            "ix_flashcards_deleted_at", "deleted_at",
+            postgresql_where=is_active == false(), sqlite_where=is_active == false()
+        ),
+        Index("ix_flashcards_deck_change_seq", "deck_id", "change_seq", "id"),
+    )
+
+
+class ReviewState(Base):
+    __tablename__ = "review_states"
+
+    # One row per reviewed card; cards without a row have never been studied
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), primary_key=True)
+    # Denormalized from the card's deck so the due queue is a single index range scan
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    ease = Column(Float, nullable=False)
+    interval_days = Column(Float, nullable=False)
+    repetitions = Column(Integer, nullable=False, default=0)
+    lapses = Column(Integer, nullable=False, default=0)
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    last_reviewed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relationships
+    flashcard = relationship("Flashcard")
+
+    __table_args__ = (
+        Index("ix_review_states_user_due", "user_id", "due_at"),
+    )
+
+
+class ReviewLog(Base):
+    __tablename__ = "review_logs"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Client-generated id; makes batch submissions safe to retry
+    review_id = Column(String(64), nullable=False)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), nullable=False)
+    grade = Column(Integer, nullable=False)
+    reviewed_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "review_id", name="uq_review_logs_user_review"),
+    )
+
+
+class ArchivedDeck(Base):
+    """Soft-deleted deck moved out of the hot table by compaction"""
+    __tablename__ = "decks_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    owner_id = Column(Integer, nullable=False, index=True)
+    is_active = Column(Boolean)
+    version = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    deleted_at = Column(DateTime(timezone=True))
+    change_seq = Column(BigInteger)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ArchivedFlashcard(Base):
+    __tablename__ = "flashcards_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    front = Column(Text, nullable=False)
+    back = Column(Text, nullable=False)
+    deck_id = Column(Integer, nullable=False, index=True)
+    is_active = Column(Boolean)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    deleted_at = Column(DateTime(timezone=True))
+    change_seq = Column(BigInteger)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ArchivedReviewLog(Base):
+    """Review history of archived flashcards"""
+    __tablename__ = "review_logs_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)
+    review_id = Column(String(64), nullable=False)
+    flashcard_id = Column(Integer, nullable=False, index=True)
+    grade = Column(Integer, nullable=False)
+    reviewed_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+@event.listens_for(Deck.is_active, "set")
+@event.listens_for(Flashcard.is_active, "set")
+def _stamp_deleted_at(target, value, oldvalue, initiator):
+    """Record when a deck or card was soft-deleted, and forget it again on restore"""
+    if value is False:
+        target.deleted_at = datetime.now(timezone.utc)
+    elif value:
+        target.deleted_at = None
+
+
+def advance_change_seqs(session: Session, owner_ids: Iterable[int] = (), deck_ids: Iterable[int] = ()) -> Dict[int, int]:
+    """Hand the next change number to each owner, and to the owners of deck_ids
+
+    Every transaction that writes decks or cards calls this before stamping
+    them. The UPDATE holds the user row until commit, so a user's change
+    numbers become visible in the order they were handed out and a sync
+    watermark can never skip a slower transaction. Returns {owner_id: number}.
+    """
+    users, decks = User.__table__, Deck.__table__
+    owner_ids, deck_ids = set(owner_ids) - {None}, set(deck_ids) - {None}
+    conditions = []
+    if owner_ids:
+        conditions.append(users.c.id.in_(owner_ids))
+    if deck_ids:
+        conditions.append(users.c.id.in_(select(decks.c.owner_id).where(decks.c.id.in_(deck_ids))))
+    if not conditions:
+        return {}
+    return dict(session.connection().execute(
+        # updated_at is the profile's, not the counter's
+        update(users).where(or_(*conditions))
+        .values(change_seq=users.c.change_seq + 1, updated_at=users.c.updated_at)
+        .returning(users.c.id, users.c.change_seq)
+    ).all())
+
+
+def owner_change_seq(owner_id):
+    """The owner's current change number, as a SQL expression"""
+    users = User.__table__
+    return select(users.c.change_seq).where(users.c.id == owner_id).scalar_subquery()
+
+
+def deck_owner_change_seq(deck_id):
+    users, decks = User.__table__, Deck.__table__
+    return select(users.c.change_seq).join(decks, decks.c.owner_id == users.c.id).where(
+        decks.c.id == deck_id
+    ).scalar_subquery()
+
+
+def bump_deck_versions(session: Session, deck_ids) -> None:
+    """Bump the version of decks changed by statements that bypass the unit of work"""
+    deck_ids = set(deck_ids)
+    if deck_ids:
+        session.connection().execute(
+            update(Deck.__table__).where(Deck.__table__.c.id.in_(deck_ids)).values(version=Deck.__table__.c.version + 1)
+        )
+
+
+def restamp_deck_cards(session: Session, deck_ids) -> None:
+    """Give the cards of restored decks a new change number, so delta syncs send them again"""
+    deck_ids = set(deck_ids)
+    if deck_ids:
+        cards = Flashcard.__table__
+        session.connection().execute(
+            update(cards).where(cards.c.deck_id.in_(deck_ids)).values(change_seq=deck_owner_change_seq(cards.c.deck_id))
+        )
+
+
+def _restored(deck: Deck) -> bool:
+    history = inspect(deck).attrs.is_active.history
+    return bool(history.added and history.added[0]) and history.deleted == [False]
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_versions_on_flush(session, flush_context, instances):
+    """Keep Deck.version and change numbers in step with ORM changes to decks and flashcards"""
+    bumped_decks = set()
+    changed_decks = [obj for obj in session.new if isinstance(obj, Deck)]
+    for obj in session.dirty:
+        if isinstance(obj, Deck) and session.is_modified(obj, include_collections=False):
+            obj.version = Deck.version + 1
+            bumped_decks.add(obj.id)
+            changed_decks.append(obj)
+
+    changed_cards = []
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Flashcard) and (obj in session.new or session.is_modified(obj, include_collections=False)):
+            changed_cards.append(obj)
+    card_decks = {obj.deck_id for obj in changed_cards} - {None}
+    # Cards added through a deck's relationship only get their deck_id during the flush
+    owners = {obj.owner_id for obj in changed_decks} | {
+        obj.deck.owner_id for obj in changed_cards if obj.deck_id is None and obj.deck is not None
+    }
+    if not advance_change_seqs(session, owners, card_decks):
+        return
+
+    for obj in changed_decks:
+        obj.change_seq = owner_change_seq(obj.owner_id)
+    for obj in changed_cards:
+        obj.change_seq = deck_owner_change_seq(obj.deck_id) if obj.deck_id is not None else owner_change_seq(obj.deck.owner_id)
+    bump_deck_versions(session, card_decks - bumped_decks)
+    restamp_deck_cards(session, [obj.id for obj in changed_decks if obj.id is not None and _restored(obj)])
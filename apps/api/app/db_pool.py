@@ -0,0 +1,105 @@
+"""
+Connection pool configuration and instrumentation for the SQLAlchemy engines.
+
+Pool settings come from the environment. When DB_POOL_SIZE/DB_MAX_OVERFLOW are
+unset they are derived from DB_MAX_CONNECTIONS (the connection budget of the
+whole deployment) split across WEB_CONCURRENCY workers, so adding workers does
+not multiply the load on the database.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .metrics import DecayingAverage, Histogram
+
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "20"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+_per_worker_budget = max(2, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(max(1, _per_worker_budget // 2))))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(max(0, _per_worker_budget - DB_POOL_SIZE))))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+class _PoolWaitMixin:
+    """Times how long each checkout waits for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_histogram = Histogram()
+        # Recent waits, for load shedding; the histogram covers the whole process lifetime
+        self.recent_wait_ms = DecayingAverage()
+        self.timeouts = 0
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        with self._waiting_lock:
+            self._waiting += 1
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+            waited_ms = (time.perf_counter() - started) * 1000
+            self.wait_histogram.observe(waited_ms)
+            self.recent_wait_ms.observe(waited_ms)
+
+    def waiting(self) -> int:
+        return self._waiting
+
+
+class InstrumentedQueuePool(_PoolWaitMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_PoolWaitMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url: str, use_async: bool = False) -> Dict[str, Any]:
+    """Engine keyword arguments for the configured pool"""
+    if url.startswith("sqlite") and ":memory:" in url:
+        # In-memory SQLite keeps one connection per thread; there is nothing to size
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if use_async else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def recent_wait_ms(pool) -> float:
+    """Recent checkout wait of an instrumented pool, 0 for any other pool"""
+    return pool.recent_wait_ms.value() if isinstance(pool, _PoolWaitMixin) else 0.0
+
+
+def pool_stats(pool) -> Dict[str, Any]:
+    if not isinstance(pool, _PoolWaitMixin):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "waiting": pool.waiting(),
+        "timeouts": pool.timeouts,
+        "wait_ms": pool.wait_histogram.snapshot(),
+        "recent_wait_ms": round(pool.recent_wait_ms.value(), 3),
+    }
@@ -0,0 +1,174 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
+from ..database import get_async_db
+from ..replicas import get_async_read_db
+from ..authenticate import get_current_user_async
+from ..instrumentation import TimedRoute
+from ..etags import deck_etag, deck_version_query, is_not_modified, not_modified_response, require_if_match_async
+from ..response_cache import deck_cache, json_response
+from ..pagination import paginate, set_next_cursor
+from .. import db_models, schemas
+from .detail import deck_cards_query, deck_row_query, serialize_deck_detail
+from .summaries import (
+    build_summaries, card_stats_query, cards_query, parse_include, preview_query, validate_preview,
+)
+
+# Async twins of the routes in router.py, mounted in their place when DB_MODE=async
+router = APIRouter(prefix="/decks", tags=["decks"], route_class=TimedRoute)
+
+
+def _owned_deck_query(deck_id: int, owner_id: int):
+    return select(db_models.Deck).where(
+        db_models.Deck.id == deck_id,
+        db_models.Deck.owner_id == owner_id,
+        db_models.Deck.is_active == true()
+    )
+
+
+async def _load_deck_with_flashcards(db: AsyncSession, deck_id: int, owner_id: int):
+    # Relationships cannot lazy-load under AsyncSession, so load flashcards up front
+    result = await db.execute(
+        _owned_deck_query(deck_id, owner_id)
+        .options(selectinload(db_models.Deck.flashcards))
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+@router.post("/", response_model=schemas.DeckWithFlashcards)
+async def create_deck(
+    deck: schemas.DeckCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    db_deck = db_models.Deck(
+        name=deck.name,
+        description=deck.description,
+        owner_id=current_user.id
+    )
+    db.add(db_deck)
+    await db.commit()
+    return await _load_deck_with_flashcards(db, db_deck.id, current_user.id)
+
+
+@router.get("/", response_model=List[schemas.DeckSummary])
+async def get_user_decks(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    preview: int = 0,
+    include: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    """List decks as summaries; pass include=flashcards for the full card lists"""
+    include_options = parse_include(include)
+    preview = validate_preview(preview)
+    query = select(db_models.Deck).where(
+        db_models.Deck.owner_id == current_user.id,
+        db_models.Deck.is_active == true()
+    )
+    decks = (await db.execute(paginate(query, db_models.Deck.id, skip, limit, cursor))).scalars().all()
+    set_next_cursor(response, decks, limit)
+    if not decks:
+        return []
+
+    deck_ids = [deck.id for deck in decks]
+    stats_rows = (await db.execute(card_stats_query(deck_ids))).all()
+    preview_rows = (await db.execute(preview_query(deck_ids, preview))).all() if preview else []
+    card_rows = (await db.execute(cards_query(deck_ids))).all() if "flashcards" in include_options else None
+    return build_summaries(decks, stats_rows, preview_rows, card_rows)
+
+
+@router.get("/{deck_id}", response_model=schemas.DeckWithFlashcards)
+async def get_deck(
+    deck_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    # Answer conditional requests from the version alone, before touching cards
+    version = (await db.execute(deck_version_query(deck_id, current_user.id))).scalar()
+    
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+    
+    etag = deck_etag(deck_id, version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    
+    body = deck_cache.get_deck(current_user.id, deck_id, version)
+    if body is None:
+        deck_row = (await db.execute(deck_row_query(deck_id, current_user.id))).first()
+        if deck_row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Deck not found"
+            )
+        card_rows = (await db.execute(deck_cards_query(deck_id))).all()
+        version = deck_row.version
+        body = serialize_deck_detail(deck_row, card_rows)
+        deck_cache.set_deck(current_user.id, deck_id, version, body)
+    
+    return json_response(body, {"ETag": deck_etag(deck_id, version)})
+
+
+@router.put("/{deck_id}", response_model=schemas.DeckWithFlashcards)
+async def update_deck(
+    deck_id: int,
+    deck_update: schemas.DeckUpdate,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    deck = (await db.execute(_owned_deck_query(deck_id, current_user.id))).scalars().first()
+    
+    if not deck:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+    
+    await require_if_match_async(db, request, deck_id, deck.version)
+    
+    update_data = deck_update.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(deck, field, value)
+    
+    await db.commit()
+    deck_cache.invalidate_deck(current_user.id, deck_id)
+    deck = await _load_deck_with_flashcards(db, deck_id, current_user.id)
+    response.headers["ETag"] = deck_etag(deck_id, deck.version)
+    return deck
+
+
+@router.delete("/{deck_id}")
+async def delete_deck(
+    deck_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    deck = (await db.execute(_owned_deck_query(deck_id, current_user.id))).scalars().first()
+    
+    if not deck:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+    
+    await require_if_match_async(db, request, deck_id, deck.version)
+    
+    deck.is_active = False
+    await db.commit()
+    deck_cache.invalidate_deck(current_user.id, deck_id)
+    return {"message": "Deck deleted successfully"}
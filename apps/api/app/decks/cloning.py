@@ -0,0 +1,88 @@
+"""
+Server-side deck cloning and merging.
+
+Cards are copied with a single INSERT ... SELECT, so cloning or merging a
+deck of any size is one statement inside the request's transaction instead
+of a read and a POST per card. The copies are new cards: review history is
+not carried over. Card order is kept by selecting in source id order.
+"""
+from typing import Optional, Sequence
+
+from sqlalchemy import exists, func, insert, literal, select, true, tuple_
+from sqlalchemy.orm import Session, aliased
+
+from .. import db_models, schemas
+from ..flashcards.search import matching_ids_query
+
+COPY_NAME_SUFFIX = " (copy)"
+MAX_NAME_LENGTH = 255
+
+
+def clone_name(source_name: str) -> str:
+    return source_name[:MAX_NAME_LENGTH - len(COPY_NAME_SUFFIX)] + COPY_NAME_SUFFIX
+
+
+def _not_in_target(dialect_name: str, target_deck_id: int):
+    """Condition excluding cards whose (front, back) is already active in the target deck"""
+    Flashcard = db_models.Flashcard
+    existing = aliased(Flashcard)
+    in_target = (existing.deck_id == target_deck_id, existing.is_active == true())
+    if dialect_name == "postgresql":
+        # Planned as a hash anti-join, whatever the size of the target
+        return ~exists().where(*in_target, existing.front == Flashcard.front, existing.back == Flashcard.back)
+    # SQLite would rerun a correlated NOT EXISTS per source card; an uncorrelated
+    # NOT IN is evaluated once into a temporary index
+    return tuple_(Flashcard.front, Flashcard.back).not_in(select(existing.front, existing.back).where(*in_target))
+
+
+def copy_cards_query(
+    dialect_name: str,
+    target_deck_id: int,
+    source_deck_ids: Sequence[int],
+    options: schemas.DeckCopyOptions,
+    match_ids=None,
+    change_seq: int = 0,
+):
+    """SELECT producing (front, back, deck_id, is_active, change_seq) rows for the copies, in source order"""
+    Flashcard = db_models.Flashcard
+    conditions = [Flashcard.deck_id.in_(source_deck_ids)]
+    if not options.include_inactive:
+        conditions.append(Flashcard.is_active == true())
+    if match_ids is not None:
+        conditions.append(Flashcard.id.in_(match_ids))
+    if options.dedupe:
+        # Pairs the target already has are skipped, so repeating a merge copies nothing
+        conditions.append(_not_in_target(dialect_name, target_deck_id))
+
+    columns = (
+        Flashcard.front,
+        Flashcard.back,
+        literal(target_deck_id).label("deck_id"),
+        literal(True).label("is_active"),
+        literal(change_seq).label("change_seq"),
+    )
+    statement = select(*columns).where(*conditions)
+    if options.dedupe:
+        # One copy per pair, placed where its first occurrence was
+        return statement.group_by(Flashcard.front, Flashcard.back).order_by(func.min(Flashcard.id))
+    return statement.order_by(Flashcard.id)
+
+
+def copy_cards(
+    db: Session,
+    owner_id: int,
+    target_deck_id: int,
+    source_deck_ids: Sequence[int],
+    options: schemas.DeckCopyOptions,
+) -> int:
+    """Copy cards from the source decks into the target deck; returns the number copied"""
+    dialect_name = db.get_bind().dialect.name
+    match_ids: Optional[object] = None
+    if options.q is not None:
+        match_ids = matching_ids_query(dialect_name, owner_id, options.q)
+    change_seq = db_models.advance_change_seqs(db, [owner_id])[owner_id]
+    statement = insert(db_models.Flashcard).from_select(
+        ["front", "back", "deck_id", "is_active", "change_seq"],
+        copy_cards_query(dialect_name, target_deck_id, source_deck_ids, options, match_ids, change_seq),
+    )
+    return db.execute(statement).rowcount
@@ -0,0 +1,34 @@
+"""
+Column-level queries for GET /decks/{deck_id}.
+
+The handler serializes these rows with deck_detail_serializer instead of
+loading Deck and Flashcard objects, and caches the resulting bytes.
+"""
+from sqlalchemy import select, true
+
+from .. import db_models
+from ..serialization import deck_detail_serializer, flashcard_list_serializer
+
+
+def deck_row_query(deck_id: int, owner_id: int):
+    # Checks ownership again: the deck may have been deleted since its version was read
+    Deck = db_models.Deck
+    return select(*deck_detail_serializer.columns(Deck.__table__), Deck.version).where(
+        Deck.id == deck_id,
+        Deck.owner_id == owner_id,
+        Deck.is_active == true()
+    )
+
+
+def deck_cards_query(deck_id: int):
+    # Same cards as the Deck.flashcards relationship, which does not filter on is_active
+    Flashcard = db_models.Flashcard
+    return select(*flashcard_list_serializer.columns(Flashcard.__table__)).where(
+        Flashcard.deck_id == deck_id
+    ).order_by(Flashcard.id)
+
+
+def serialize_deck_detail(deck_row, card_rows) -> bytes:
+    return deck_detail_serializer.dump(
+        deck_detail_serializer.record(deck_row, flashcards=flashcard_list_serializer.records(card_rows))
+    )
@@ -0,0 +1,128 @@
+"""
+Streaming deck export.
+
+Exports run one LEFT JOIN over decks and their active cards, ordered by deck
+and card id, through a server-side cursor. Rows are serialized straight from
+the result tuples in partitions, so memory stays constant no matter how large
+the deck is and the first bytes go out as soon as the first partition arrives.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import and_, select, true
+
+from .. import db_models
+from ..database import SessionLocal
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_PARTITION_SIZE = 500
+CSV_COLUMNS = [
+    "deck_id", "deck_name", "deck_description",
+    "flashcard_id", "front", "back", "created_at", "updated_at",
+]
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def export_query(owner_id: int, deck_id: Optional[int] = None):
+    Deck, Flashcard = db_models.Deck, db_models.Flashcard
+    query = select(
+        Deck.id.label("deck_id"),
+        Deck.name.label("deck_name"),
+        Deck.description.label("deck_description"),
+        Deck.created_at.label("deck_created_at"),
+        Deck.updated_at.label("deck_updated_at"),
+        Flashcard.id.label("flashcard_id"),
+        Flashcard.front,
+        Flashcard.back,
+        Flashcard.created_at,
+        Flashcard.updated_at,
+    ).select_from(Deck).outerjoin(
+        Flashcard,
+        and_(Flashcard.deck_id == Deck.id, Flashcard.is_active == true())
+    ).where(
+        Deck.owner_id == owner_id,
+        Deck.is_active == true()
+    ).order_by(Deck.id, Flashcard.id)
+    if deck_id is not None:
+        query = query.where(Deck.id == deck_id)
+    return query
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _ndjson_line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _ndjson_rows(rows: Iterator[Any], state: dict) -> str:
+    lines = []
+    for row in rows:
+        if row.deck_id != state.get("deck_id"):
+            state["deck_id"] = row.deck_id
+            lines.append(_ndjson_line({
+                "type": "deck",
+                "id": row.deck_id,
+                "name": row.deck_name,
+                "description": row.deck_description,
+                "created_at": _isoformat(row.deck_created_at),
+                "updated_at": _isoformat(row.deck_updated_at),
+            }))
+        if row.flashcard_id is not None:
+            lines.append(_ndjson_line({
+                "type": "flashcard",
+                "id": row.flashcard_id,
+                "deck_id": row.deck_id,
+                "front": row.front,
+                "back": row.back,
+                "created_at": _isoformat(row.created_at),
+                "updated_at": _isoformat(row.updated_at),
+            }))
+    return "".join(lines)
+
+
+def _csv_rows(rows: Iterator[Any], state: dict) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if not state.get("header_written"):
+        state["header_written"] = True
+        writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            row.deck_id, row.deck_name, row.deck_description,
+            row.flashcard_id, row.front, row.back,
+            _isoformat(row.created_at), _isoformat(row.updated_at),
+        ])
+    return buffer.getvalue()
+
+
+_SERIALIZERS = {
+    "ndjson": _ndjson_rows,
+    "csv": _csv_rows,
+}
+
+
+def stream_export(statement, export_format: str) -> Iterator[bytes]:
+    """Yield the export in encoded chunks, one per cursor partition
+
+    The generator owns its session: the request's session dependency is
+    closed before a streaming body finishes.
+    """
+    serialize = _SERIALIZERS[export_format]
+    state: dict = {}
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(stream_results=True, yield_per=EXPORT_PARTITION_SIZE))
+        for partition in result.partitions():
+            yield serialize(partition, state).encode("utf-8")
+        if export_format == "csv" and not state.get("header_written"):
+            yield serialize([], state).encode("utf-8")
+    finally:
+        db.close()
@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import false, true
 from sqlalchemy.orm import Session
-from sqlalchemy.orm import joinedload
-from typing import List
+from typing import List, Literal, Optional
 from ..database import get_db
+from ..replicas import get_read_db
 from ..authenticate import get_current_user
+from ..instrumentation import TimedRoute
+from ..compaction import restorable
+from ..etags import deck_etag, deck_version_query, is_not_modified, not_modified_response, require_if_match
+from ..response_cache import deck_cache, json_response
+from ..pagination import paginate, set_next_cursor
 from .. import db_models, schemas
+from .cloning import clone_name, copy_cards
+from .detail import deck_cards_query, deck_row_query, serialize_deck_detail
+from .export import MEDIA_TYPES, export_query, stream_export
+from .summaries import (
+    build_summaries, card_stats_query, cards_query, parse_include, preview_query, validate_preview,
+)
 
-router = APIRouter(prefix="/decks", tags=["decks"])
+router = APIRouter(prefix="/decks", tags=["decks"], route_class=TimedRoute)
 
 
 @router.post("/", response_model=schemas.DeckWithFlashcards)
@@ -26,30 +39,69 @@ def create_deck(
     return db_deck
 
 
-@router.get("/", response_model=List[schemas.DeckWithFlashcards])
+@router.get("/", response_model=List[schemas.DeckSummary])
 def get_user_decks(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    preview: int = 0,
+    include: Optional[str] = None,
+    db: Session = Depends(get_read_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
-    decks = db.query(db_models.Deck).options(joinedload(db_models.Deck.flashcards)).filter(
+    """List decks as summaries; pass include=flashcards for the full card lists"""
+    include_options = parse_include(include)
+    preview = validate_preview(preview)
+    query = db.query(db_models.Deck).filter(
         db_models.Deck.owner_id == current_user.id,
-        db_models.Deck.is_active == True
-    ).offset(skip).limit(limit).all()
-    return decks
+        db_models.Deck.is_active == true()
+    )
+    decks = paginate(query, db_models.Deck.id, skip, limit, cursor).all()
+    set_next_cursor(response, decks, limit)
+    if not decks:
+        return []
 
+    deck_ids = [deck.id for deck in decks]
+    stats_rows = db.execute(card_stats_query(deck_ids)).all()
+    preview_rows = db.execute(preview_query(deck_ids, preview)).all() if preview else []
+    card_rows = db.execute(cards_query(deck_ids)).all() if "flashcards" in include_options else None
+    return build_summaries(decks, stats_rows, preview_rows, card_rows)
 
-@router.get("/{deck_id}", response_model=schemas.DeckWithFlashcards)
-def get_deck(
+
+def _deck_summary(db: Session, deck: db_models.Deck) -> dict:
+    return build_summaries([deck], db.execute(card_stats_query([deck.id])).all())[0]
+
+
+def _export_response(statement, export_format: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_export(statement, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_decks(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Stream every active deck of the current user with its cards"""
+    return _export_response(export_query(current_user.id), format, "decks")
+
+
+@router.get("/{deck_id}/export", response_class=StreamingResponse)
+def export_deck(
     deck_id: int,
+    format: Literal["ndjson", "csv"] = "ndjson",
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
-    deck = db.query(db_models.Deck).options(joinedload(db_models.Deck.flashcards)).filter(
+    """Stream one deck with its cards"""
+    deck = db.query(db_models.Deck.id).filter(
         db_models.Deck.id == deck_id,
         db_models.Deck.owner_id == current_user.id,
-        db_models.Deck.is_active == True
+        db_models.Deck.is_active == true()
     ).first()
     
     if not deck:
@@ -58,20 +110,59 @@ def get_deck(
             detail="Deck not found"
         )
     
-    return deck
+    return _export_response(export_query(current_user.id, deck_id), format, f"deck-{deck_id}")
+
+
+@router.get("/{deck_id}", response_model=schemas.DeckWithFlashcards)
+def get_deck(
+    deck_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    # Answer conditional requests from the version alone, before touching cards
+    version = db.execute(deck_version_query(deck_id, current_user.id)).scalar()
+    
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+    
+    etag = deck_etag(deck_id, version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    
+    body = deck_cache.get_deck(current_user.id, deck_id, version)
+    if body is None:
+        deck_row = db.execute(deck_row_query(deck_id, current_user.id)).first()
+        if deck_row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Deck not found"
+            )
+        card_rows = db.execute(deck_cards_query(deck_id)).all()
+        version = deck_row.version
+        body = serialize_deck_detail(deck_row, card_rows)
+        deck_cache.set_deck(current_user.id, deck_id, version, body)
+    
+    return json_response(body, {"ETag": deck_etag(deck_id, version)})
 
 
 @router.put("/{deck_id}", response_model=schemas.DeckWithFlashcards)
 def update_deck(
     deck_id: int,
     deck_update: schemas.DeckUpdate,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     deck = db.query(db_models.Deck).filter(
         db_models.Deck.id == deck_id,
         db_models.Deck.owner_id == current_user.id,
-        db_models.Deck.is_active == True
+        db_models.Deck.is_active == true()
     ).first()
     
     if not deck:
@@ -80,25 +171,30 @@ def update_deck(
             detail="Deck not found"
         )
     
+    require_if_match(db, request, deck_id, deck.version)
+    
     update_data = deck_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(deck, field, value)
     
     db.commit()
+    deck_cache.invalidate_deck(current_user.id, deck_id)
     db.refresh(deck)
+    response.headers["ETag"] = deck_etag(deck_id, deck.version)
     return deck
 
 
 @router.delete("/{deck_id}")
 def delete_deck(
     deck_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     deck = db.query(db_models.Deck).filter(
         db_models.Deck.id == deck_id,
         db_models.Deck.owner_id == current_user.id,
-        db_models.Deck.is_active == True
+        db_models.Deck.is_active == true()
     ).first()
     
     if not deck:
@@ -107,6 +203,128 @@ def delete_deck(
             detail="Deck not found"
         )
     
+    require_if_match(db, request, deck_id, deck.version)
+    
     deck.is_active = False
     db.commit()
+    deck_cache.invalidate_deck(current_user.id, deck_id)
     return {"message": "Deck deleted successfully"}
+
+
+@router.post("/{deck_id}/restore", response_model=schemas.DeckWithFlashcards)
+def restore_deck(
+    deck_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Undo a deck deletion within the retention window"""
+    deck = db.query(db_models.Deck).filter(
+        db_models.Deck.id == deck_id,
+        db_models.Deck.owner_id == current_user.id,
+        db_models.Deck.is_active == false()
+    ).first()
+    
+    if not deck:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+    
+    if not restorable(deck.deleted_at):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Deck can no longer be restored"
+        )
+    
+    require_if_match(db, request, deck_id, deck.version)
+    
+    deck.is_active = True
+    db.commit()
+    deck_cache.invalidate_deck(current_user.id, deck_id)
+    db.refresh(deck)
+    response.headers["ETag"] = deck_etag(deck_id, deck.version)
+    return deck
+
+
+@router.post("/{deck_id}/clone", response_model=schemas.DeckSummary)
+def clone_deck(
+    deck_id: int,
+    clone: schemas.DeckCloneRequest,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Copy a deck and its cards in one transaction, filtered and deduplicated on request"""
+    source = db.query(db_models.Deck).filter(
+        db_models.Deck.id == deck_id,
+        db_models.Deck.owner_id == current_user.id,
+        db_models.Deck.is_active == true()
+    ).first()
+    
+    if not source:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+    
+    deck = db_models.Deck(
+        name=clone.name or clone_name(source.name),
+        description=clone.description if clone.description is not None else source.description,
+        owner_id=current_user.id
+    )
+    db.add(deck)
+    db.flush()
+    copy_cards(db, current_user.id, deck.id, [source.id], clone)
+    db.commit()
+    db.refresh(deck)
+    response.headers["ETag"] = deck_etag(deck.id, deck.version)
+    return _deck_summary(db, deck)
+
+
+@router.post("/{deck_id}/merge", response_model=schemas.DeckSummary)
+def merge_decks(
+    deck_id: int,
+    merge: schemas.DeckMergeRequest,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Copy the cards of source_deck_ids into this deck in one transaction"""
+    source_ids = set(merge.source_deck_ids)
+    if deck_id in source_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A deck cannot be merged into itself"
+        )
+    
+    decks = db.query(db_models.Deck).filter(
+        db_models.Deck.id.in_(source_ids | {deck_id}),
+        db_models.Deck.owner_id == current_user.id,
+        db_models.Deck.is_active == true()
+    ).all()
+    decks_by_id = {deck.id: deck for deck in decks}
+    
+    if len(decks_by_id) != len(source_ids) + 1:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+    
+    target = decks_by_id[deck_id]
+    require_if_match(db, request, deck_id, target.version)
+    
+    copied = copy_cards(db, current_user.id, deck_id, sorted(source_ids), merge)
+    if copied:
+        db_models.bump_deck_versions(db, [deck_id])
+    if merge.delete_sources:
+        for source_id in source_ids:
+            decks_by_id[source_id].is_active = False
+    db.commit()
+    for changed_id in (deck_id, *(source_ids if merge.delete_sources else ())):
+        deck_cache.invalidate_deck(current_user.id, changed_id)
+    db.refresh(target)
+    response.headers["ETag"] = deck_etag(deck_id, target.version)
+    return _deck_summary(db, target)
@@ -0,0 +1,110 @@
+"""
+Deck summaries for list views.
+
+Instead of eager-loading every card of every deck, the listing fetches a page
+of decks and then answers per-deck questions with set queries over that page:
+one GROUP BY for counts and modification times, an optional ROW_NUMBER()
+window for the first N cards, and the full card set only when the client asks
+for include=flashcards. The statements are plain select()s so the sync and
+async routers can both execute them.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func, select, true
+
+from .. import db_models
+
+MAX_PREVIEW = 20
+INCLUDE_OPTIONS = {"flashcards"}
+
+
+def parse_include(include: Optional[str]) -> Set[str]:
+    requested = {part.strip() for part in (include or "").split(",") if part.strip()}
+    unknown = requested - INCLUDE_OPTIONS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown include option(s): {', '.join(sorted(unknown))}"
+        )
+    return requested
+
+
+def validate_preview(preview: int) -> int:
+    if preview < 0 or preview > MAX_PREVIEW:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"preview must be between 0 and {MAX_PREVIEW}"
+        )
+    return preview
+
+
+def card_stats_query(deck_ids: Sequence[int]):
+    """Active card count and latest card modification per deck"""
+    Flashcard = db_models.Flashcard
+    return select(
+        Flashcard.deck_id,
+        func.sum(case((Flashcard.is_active == true(), 1), else_=0)).label("card_count"),
+        func.max(func.coalesce(Flashcard.updated_at, Flashcard.created_at)).label("cards_modified_at"),
+    ).where(Flashcard.deck_id.in_(deck_ids)).group_by(Flashcard.deck_id)
+
+
+def preview_query(deck_ids: Sequence[int], preview: int):
+    """First `preview` active cards of each deck, by id"""
+    Flashcard = db_models.Flashcard
+    ranked = select(
+        Flashcard,
+        func.row_number().over(partition_by=Flashcard.deck_id, order_by=Flashcard.id).label("position"),
+    ).where(
+        Flashcard.deck_id.in_(deck_ids),
+        Flashcard.is_active == true()
+    ).subquery()
+    return select(ranked).where(ranked.c.position <= preview).order_by(ranked.c.deck_id, ranked.c.position)
+
+
+def cards_query(deck_ids: Sequence[int]):
+    Flashcard = db_models.Flashcard
+    return select(Flashcard.__table__).where(
+        Flashcard.deck_id.in_(deck_ids),
+        Flashcard.is_active == true()
+    ).order_by(Flashcard.deck_id, Flashcard.id)
+
+
+def _group_cards(rows: Iterable) -> Dict[int, List[Dict[str, Any]]]:
+    grouped: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        card = dict(row._mapping)
+        card.pop("position", None)
+        grouped.setdefault(card["deck_id"], []).append(card)
+    return grouped
+
+
+def build_summaries(
+    decks: Sequence[db_models.Deck],
+    stats_rows: Iterable,
+    preview_rows: Iterable = (),
+    card_rows: Optional[Iterable] = None,
+) -> List[Dict[str, Any]]:
+    stats = {row.deck_id: row for row in stats_rows}
+    previews = _group_cards(preview_rows)
+    cards = _group_cards(card_rows) if card_rows is not None else None
+
+    summaries = []
+    for deck in decks:
+        deck_stats = stats.get(deck.id)
+        deck_modified = deck.updated_at or deck.created_at
+        cards_modified = deck_stats.cards_modified_at if deck_stats else None
+        summaries.append({
+            "id": deck.id,
+            "name": deck.name,
+            "description": deck.description,
+            "owner_id": deck.owner_id,
+            "is_active": deck.is_active,
+            "created_at": deck.created_at,
+            "updated_at": deck.updated_at,
+            "card_count": int(deck_stats.card_count or 0) if deck_stats else 0,
+            "last_modified_at": max(filter(None, [deck_modified, cards_modified]), default=deck_modified),
+            "preview": previews.get(deck.id, []),
+            "flashcards": cards.get(deck.id, []) if cards is not None else None,
+        })
+    return summaries
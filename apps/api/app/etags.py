@@ -0,0 +1,111 @@
+"""
+ETag / conditional request helpers for deck-scoped resources.
+
+Every deck carries a `version` counter that is bumped whenever the deck or
+any of its cards changes (see db_models). ETags are derived from it, so a
+conditional GET only needs the version lookup to answer 304, and If-Match can
+guard writes against lost updates: require_if_match repeats the check inside
+the write's transaction, so two writers holding the same ETag cannot both
+succeed.
+"""
+import hashlib
+import re
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import select, true, update
+
+from . import db_models
+
+# If-Match uses strong comparison, so weak tags never match
+_ETAG_VERSION = re.compile(r'^"deck-(\d+)-v(\d+)(?:-[0-9a-f]+)?"$')
+
+
+def deck_version_query(deck_id: int, owner_id: int):
+    return select(db_models.Deck.version).where(
+        db_models.Deck.id == deck_id,
+        db_models.Deck.owner_id == owner_id,
+        db_models.Deck.is_active == true()
+    )
+
+
+def deck_etag(deck_id: int, version: int, request: Optional[Request] = None) -> str:
+    """Strong ETag for a deck representation
+
+    Pass the request for representations that vary with the query string
+    (e.g. paginated card listings) so each variant gets its own tag.
+    """
+    tag = f"deck-{deck_id}-v{version}"
+    if request is not None and request.url.query:
+        tag += "-" + hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:12]
+    return f'"{tag}"'
+
+
+def _header_tags(value: str):
+    return [tag.strip() for tag in value.split(",") if tag.strip()]
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = _header_tags(header)
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def if_match_requested(request: Request) -> bool:
+    return bool(request.headers.get("if-match"))
+
+
+def _precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Deck has changed since it was fetched"
+    )
+
+
+def check_if_match(request: Request, deck_id: int, version: Optional[int]) -> Optional[int]:
+    """Raise 412 when If-Match is present and names a different deck version
+
+    Returns the version a write has to find still in place, or None when
+    there is no If-Match header or it is "*".
+    """
+    header = request.headers.get("if-match")
+    if not header or version is None:
+        return None
+    for tag in _header_tags(header):
+        if tag == "*":
+            return None
+        match = _ETAG_VERSION.match(tag)
+        if match and int(match.group(1)) == deck_id and int(match.group(2)) == version:
+            return version
+    raise _precondition_failed()
+
+
+def version_guard(deck_id: int, version: int):
+    """UPDATE that matches only while the deck is still at version
+
+    It changes nothing, but holds the deck's row lock until commit; a writer
+    that read the same version blocks on it and then matches no row.
+    """
+    decks = db_models.Deck.__table__
+    return update(decks).where(decks.c.id == deck_id, decks.c.version == version).values(
+        version=decks.c.version, updated_at=decks.c.updated_at
+    )
+
+
+def require_if_match(db, request: Request, deck_id: int, version: Optional[int]) -> None:
+    """check_if_match, made part of the write's transaction"""
+    expected = check_if_match(request, deck_id, version)
+    if expected is not None and db.execute(version_guard(deck_id, expected)).rowcount == 0:
+        raise _precondition_failed()
+
+
+async def require_if_match_async(db, request: Request, deck_id: int, version: Optional[int]) -> None:
+    expected = check_if_match(request, deck_id, version)
+    if expected is not None and (await db.execute(version_guard(deck_id, expected))).rowcount == 0:
+        raise _precondition_failed()
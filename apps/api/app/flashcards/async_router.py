@@ -0,0 +1,155 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ..database import get_async_db
+from ..replicas import get_async_read_db
+from ..authenticate import get_current_user_async
+from ..instrumentation import TimedRoute
+from ..etags import (
+    deck_etag, deck_version_query, if_match_requested, is_not_modified, not_modified_response, require_if_match_async,
+)
+from ..response_cache import deck_cache, json_response
+from ..serialization import flashcard_list_serializer
+from ..pagination import paginate, set_next_cursor
+from .. import db_models, schemas
+
+# Async twins of the routes in router.py, mounted in their place when DB_MODE=async
+router = APIRouter(prefix="/flashcards", tags=["flashcards"], route_class=TimedRoute)
+
+
+async def _get_owned_deck_version(db: AsyncSession, deck_id: int, owner_id: int) -> int:
+    version = (await db.execute(deck_version_query(deck_id, owner_id))).scalar()
+    
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+    
+    return version
+
+
+async def _check_flashcard_if_match(db: AsyncSession, request: Request, flashcard) -> None:
+    if not if_match_requested(request):
+        return
+    version = (await db.execute(
+        select(db_models.Deck.version).where(db_models.Deck.id == flashcard.deck_id)
+    )).scalar()
+    await require_if_match_async(db, request, flashcard.deck_id, version)
+
+
+async def _get_owned_flashcard(db: AsyncSession, flashcard_id: int, owner_id: int):
+    result = await db.execute(select(db_models.Flashcard).join(db_models.Deck).where(
+        db_models.Flashcard.id == flashcard_id,
+        db_models.Deck.owner_id == owner_id,
+        db_models.Flashcard.is_active == true()
+    ))
+    flashcard = result.scalars().first()
+    
+    if not flashcard:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+    
+    return flashcard
+
+
+@router.post("/deck/{deck_id}", response_model=schemas.Flashcard)
+async def create_flashcard(
+    deck_id: int,
+    flashcard: schemas.FlashcardCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    # Verify the deck belongs to the current user
+    version = await _get_owned_deck_version(db, deck_id, current_user.id)
+    await require_if_match_async(db, request, deck_id, version)
+    
+    db_flashcard = db_models.Flashcard(
+        front=flashcard.front,
+        back=flashcard.back,
+        deck_id=deck_id
+    )
+    db.add(db_flashcard)
+    await db.commit()
+    deck_cache.invalidate_deck(current_user.id, deck_id)
+    await db.refresh(db_flashcard)
+    return db_flashcard
+
+
+@router.get("/deck/{deck_id}", response_model=List[schemas.Flashcard])
+async def get_deck_flashcards(
+    deck_id: int,
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    # Verify the deck belongs to the current user
+    version = await _get_owned_deck_version(db, deck_id, current_user.id)
+    
+    etag = deck_etag(deck_id, version, request)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    
+    query = select(*flashcard_list_serializer.columns(db_models.Flashcard.__table__)).where(
+        db_models.Flashcard.deck_id == deck_id,
+        db_models.Flashcard.is_active == true()
+    )
+    rows = (await db.execute(paginate(query, db_models.Flashcard.id, skip, limit, cursor))).all()
+    set_next_cursor(response, rows, limit)
+    
+    return json_response(flashcard_list_serializer.dump(flashcard_list_serializer.records(rows)), response.headers)
+
+
+@router.get("/{flashcard_id}", response_model=schemas.Flashcard)
+async def get_flashcard(
+    flashcard_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    return await _get_owned_flashcard(db, flashcard_id, current_user.id)
+
+
+@router.put("/{flashcard_id}", response_model=schemas.Flashcard)
+async def update_flashcard(
+    flashcard_id: int,
+    flashcard_update: schemas.FlashcardUpdate,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    flashcard = await _get_owned_flashcard(db, flashcard_id, current_user.id)
+    await _check_flashcard_if_match(db, request, flashcard)
+    
+    update_data = flashcard_update.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(flashcard, field, value)
+    
+    await db.commit()
+    deck_cache.invalidate_deck(current_user.id, flashcard.deck_id)
+    await db.refresh(flashcard)
+    return flashcard
+
+
+@router.delete("/{flashcard_id}")
+async def delete_flashcard(
+    flashcard_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: db_models.User = Depends(get_current_user_async)
+):
+    flashcard = await _get_owned_flashcard(db, flashcard_id, current_user.id)
+    await _check_flashcard_if_match(db, request, flashcard)
+    
+    flashcard.is_active = False
+    await db.commit()
+    deck_cache.invalidate_deck(current_user.id, flashcard.deck_id)
+    return {"message": "Flashcard deleted successfully"}
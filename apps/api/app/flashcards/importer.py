@@ -0,0 +1,173 @@
+"""
+Incremental parsers and batch writer for the bulk flashcard import.
+
+Each parser consumes the request body as an async stream of byte chunks and
+yields (row_number, record) pairs as soon as a record is complete, so only the
+current chunk and one partial record are ever held in memory. Records that
+cannot be parsed are yielded as ImportRowError so they can be reported next to
+validation failures instead of aborting the whole import.
+"""
+import codecs
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Tuple, Union
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .. import db_models
+
+IMPORT_FORMATS = ("csv", "jsonl", "json")
+# Largest single record we are willing to buffer while waiting for its end
+MAX_RECORD_BYTES = 1024 * 1024
+
+_CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/json": "json",
+}
+
+
+class ImportRowError(Exception):
+    pass
+
+
+Record = Union[Dict[str, Any], ImportRowError]
+
+
+def format_from_content_type(content_type: str):
+    return _CONTENT_TYPE_FORMATS.get(content_type.split(";")[0].strip().lower())
+
+
+async def _iter_text(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in stream:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    pending = ""
+    async for text in _iter_text(stream):
+        pending += text
+        if len(pending) > MAX_RECORD_BYTES and "\n" not in pending:
+            raise ImportRowError("Line exceeds the maximum record size")
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+async def parse_jsonl(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Record]]:
+    row = 0
+    async for line in _iter_lines(stream):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row, ImportRowError(f"Invalid JSON: {e.msg}")
+
+
+async def parse_csv(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Record]]:
+    header = None
+    row = 0
+    record_text = ""
+    async for line in _iter_lines(stream):
+        record_text += line + "\n"
+        # A quoted field may span lines; wait until the quotes are balanced
+        if record_text.count('"') % 2:
+            if len(record_text) > MAX_RECORD_BYTES:
+                raise ImportRowError("Quoted field exceeds the maximum record size")
+            continue
+        values = next(csv.reader(io.StringIO(record_text)), [])
+        record_text = ""
+        if not values:
+            continue
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            if "front" not in header or "back" not in header:
+                raise ImportRowError("CSV header must include 'front' and 'back' columns")
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, ImportRowError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield row, dict(zip(header, values))
+    if record_text.strip():
+        yield row + 1, ImportRowError("Unterminated quoted field")
+
+
+async def parse_json_array(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Record]]:
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = finished = False
+    row = 0
+    async for text in _iter_text(stream):
+        buffer += text
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != "[":
+                    raise ImportRowError("Expected a JSON array")
+                started = True
+                buffer = buffer[1:]
+                continue
+            if finished or not buffer:
+                break
+            if buffer[0] == "]":
+                finished = True
+                buffer = buffer[1:]
+                break
+            if buffer[0] == ",":
+                buffer = buffer[1:]
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Most likely an element split across chunks; wait for more data
+                if len(buffer) > MAX_RECORD_BYTES:
+                    raise ImportRowError("Array element exceeds the maximum record size")
+                break
+            row += 1
+            yield row, value
+            buffer = buffer[end:]
+    if not started or not finished or buffer.strip():
+        raise ImportRowError("Malformed JSON array")
+
+
+PARSERS = {
+    "csv": parse_csv,
+    "jsonl": parse_jsonl,
+    "json": parse_json_array,
+}
+
+
+def insert_batch(db: Session, deck_id: int, cards: List[Dict[str, str]], change_seq: int) -> None:
+    """Insert validated cards inside the session's open transaction, stamped with change_seq"""
+    if not cards:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        # COPY streams the batch in one round trip without per-row statements
+        driver_connection = db.connection().connection.driver_connection
+        with driver_connection.cursor() as cursor:
+            with cursor.copy("COPY flashcards (front, back, deck_id, is_active, change_seq) FROM STDIN") as copy:
+                for card in cards:
+                    copy.write_row((card["front"], card["back"], deck_id, True, change_seq))
+        return
+    db.execute(
+        insert(db_models.Flashcard),
+        [{"front": card["front"], "back": card["back"], "deck_id": deck_id, "is_active": True, "change_seq": change_seq}
+         for card in cards],
+    )
@@ -1,17 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import false, true
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 from ..database import get_db
+from ..replicas import get_read_db
 from ..authenticate import get_current_user
+from ..instrumentation import TimedRoute
+from ..compaction import restorable
+from ..etags import (
+    deck_etag, deck_version_query, if_match_requested, is_not_modified, not_modified_response, require_if_match,
+)
+from ..response_cache import deck_cache, json_response
+from ..serialization import flashcard_list_serializer, search_results_serializer
+from ..pagination import paginate, set_next_cursor
 from .. import db_models, schemas
+from .search import search_query
+from .importer import IMPORT_FORMATS, PARSERS, ImportRowError, format_from_content_type, insert_batch
+
+IMPORT_BATCH_SIZE = 1000
+# Validated cards stay in memory up to this size, then spill to a temporary file
+IMPORT_SPOOL_MEMORY = 8 * 1024 * 1024
+MAX_REPORTED_IMPORT_ERRORS = 100
 
-router = APIRouter(prefix="/flashcards", tags=["flashcards"])
+router = APIRouter(prefix="/flashcards", tags=["flashcards"], route_class=TimedRoute)
 
 
 @router.post("/deck/{deck_id}", response_model=schemas.Flashcard)
 def create_flashcard(
     deck_id: int,
     flashcard: schemas.FlashcardCreate,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
@@ -19,7 +42,7 @@ def create_flashcard(
     deck = db.query(db_models.Deck).filter(
         db_models.Deck.id == deck_id,
         db_models.Deck.owner_id == current_user.id,
-        db_models.Deck.is_active == True
+        db_models.Deck.is_active == true()
     ).first()
     
     if not deck:
@@ -28,6 +51,8 @@ def create_flashcard(
             detail="Deck not found"
         )
     
+    require_if_match(db, request, deck_id, deck.version)
+    
     db_flashcard = db_models.Flashcard(
         front=flashcard.front,
         back=flashcard.back,
@@ -35,49 +60,190 @@ def create_flashcard(
     )
     db.add(db_flashcard)
     db.commit()
+    deck_cache.invalidate_deck(current_user.id, deck_id)
     db.refresh(db_flashcard)
     return db_flashcard
 
 
+def _require_deck(db: Session, deck_id: int, owner_id: int) -> None:
+    deck = db.query(db_models.Deck.id).filter(
+        db_models.Deck.id == deck_id,
+        db_models.Deck.owner_id == owner_id,
+        db_models.Deck.is_active == true()
+    ).first()
+
+    if not deck:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+
+
+@router.post("/deck/{deck_id}/import", response_model=schemas.FlashcardImportResult)
+async def import_flashcards(
+    deck_id: int,
+    request: Request,
+    format: Optional[Literal["csv", "jsonl", "json"]] = None,
+    dry_run: bool = False,
+    on_error: Literal["skip", "abort"] = "skip",
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Bulk import cards from a streamed CSV, JSONL or JSON array body
+
+    Rows are parsed and validated with FlashcardCreate as they arrive, and the
+    valid ones spooled to a temporary file. No database connection is held
+    while the client uploads: the deck check releases its connection before
+    the body is read, and the cards are inserted in batches in one transaction
+    once the upload is complete. Invalid rows are reported and skipped, or
+    reject the whole import with on_error=abort. dry_run only validates.
+    """
+    import_format = format or format_from_content_type(request.headers.get("content-type", ""))
+    if import_format not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Pass format=csv|jsonl|json or a matching Content-Type"
+        )
+
+    def check_deck():
+        try:
+            _require_deck(db, deck_id, current_user.id)
+        finally:
+            # Ending the transaction returns the connection to the pool for the upload
+            db.rollback()
+
+    # Fail fast on a missing deck before reading the upload
+    await run_in_threadpool(check_deck)
+
+    result = schemas.FlashcardImportResult(
+        deck_id=deck_id, format=import_format, dry_run=dry_run, received=0, imported=0, failed=0
+    )
+
+    def report(row: int, error: str):
+        result.failed += 1
+        if len(result.errors) < MAX_REPORTED_IMPORT_ERRORS:
+            result.errors.append(schemas.FlashcardImportError(row=row, error=error))
+        else:
+            result.errors_truncated = True
+
+    def write(spool):
+        # One thread and one transaction for the whole write; the deck may have been deleted during the upload
+        spool.seek(0)
+        try:
+            _require_deck(db, deck_id, current_user.id)
+            change_seq = db_models.advance_change_seqs(db, [current_user.id])[current_user.id]
+            batch = []
+            for line in spool:
+                batch.append(json.loads(line))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    insert_batch(db, deck_id, batch, change_seq)
+                    batch = []
+            insert_batch(db, deck_id, batch, change_seq)
+            # Batched inserts bypass the unit of work, so bump the deck version here
+            db_models.bump_deck_versions(db, [deck_id])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MEMORY, mode="w+", encoding="utf-8") as spool:
+        try:
+            async for row, record in PARSERS[import_format](request.stream()):
+                result.received += 1
+                if isinstance(record, ImportRowError):
+                    report(row, str(record))
+                else:
+                    try:
+                        card = schemas.FlashcardCreate.model_validate(record)
+                    except ValidationError as e:
+                        report(row, "; ".join(
+                            f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+                            for error in e.errors()
+                        ))
+                    else:
+                        spool.write(json.dumps(card.model_dump()) + "\n")
+                        result.imported += 1
+                if on_error == "abort" and result.failed:
+                    break
+        except ImportRowError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Could not parse import: {e}"
+            )
+
+        if on_error == "abort" and result.failed:
+            result.imported = 0
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=result.model_dump()
+            )
+
+        if result.imported and not dry_run:
+            await run_in_threadpool(write, spool)
+            deck_cache.invalidate_deck(current_user.id, deck_id)
+    return result
+
+
 @router.get("/deck/{deck_id}", response_model=List[schemas.Flashcard])
 def get_deck_flashcards(
     deck_id: int,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     # Verify the deck belongs to the current user
-    deck = db.query(db_models.Deck).filter(
-        db_models.Deck.id == deck_id,
-        db_models.Deck.owner_id == current_user.id,
-        db_models.Deck.is_active == True
-    ).first()
+    version = db.execute(deck_version_query(deck_id, current_user.id)).scalar()
     
-    if not deck:
+    if version is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Deck not found"
         )
     
-    flashcards = db.query(db_models.Flashcard).filter(
+    etag = deck_etag(deck_id, version, request)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    
+    query = db.query(*flashcard_list_serializer.columns(db_models.Flashcard.__table__)).filter(
         db_models.Flashcard.deck_id == deck_id,
-        db_models.Flashcard.is_active == True
-    ).offset(skip).limit(limit).all()
+        db_models.Flashcard.is_active == true()
+    )
+    rows = paginate(query, db_models.Flashcard.id, skip, limit, cursor).all()
+    set_next_cursor(response, rows, limit)
     
-    return flashcards
+    return json_response(flashcard_list_serializer.dump(flashcard_list_serializer.records(rows)), response.headers)
+
+
+@router.get("/search", response_model=List[schemas.FlashcardSearchResult])
+def search_flashcards(
+    q: str,
+    skip: int = 0,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Ranked full-text search over the fronts and backs of the user's active cards"""
+    limit = max(1, min(limit, 100))
+    statement = search_query(db.get_bind().dialect.name, current_user.id, q, max(0, skip), limit)
+    rows = db.execute(statement).all()
+    return json_response(search_results_serializer.dump(search_results_serializer.records(rows)))
 
 
 @router.get("/{flashcard_id}", response_model=schemas.Flashcard)
 def get_flashcard(
     flashcard_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     flashcard = db.query(db_models.Flashcard).join(db_models.Deck).filter(
         db_models.Flashcard.id == flashcard_id,
         db_models.Deck.owner_id == current_user.id,
-        db_models.Flashcard.is_active == True
+        db_models.Flashcard.is_active == true()
     ).first()
     
     if not flashcard:
@@ -93,13 +259,14 @@ def get_flashcard(
 def update_flashcard(
     flashcard_id: int,
     flashcard_update: schemas.FlashcardUpdate,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     flashcard = db.query(db_models.Flashcard).join(db_models.Deck).filter(
         db_models.Flashcard.id == flashcard_id,
         db_models.Deck.owner_id == current_user.id,
-        db_models.Flashcard.is_active == True
+        db_models.Flashcard.is_active == true()
     ).first()
     
     if not flashcard:
@@ -108,11 +275,15 @@ def update_flashcard(
             detail="Flashcard not found"
         )
     
+    if if_match_requested(request):
+        require_if_match(db, request, flashcard.deck_id, flashcard.deck.version)
+    
     update_data = flashcard_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(flashcard, field, value)
     
     db.commit()
+    deck_cache.invalidate_deck(current_user.id, flashcard.deck_id)
     db.refresh(flashcard)
     return flashcard
 
@@ -120,13 +291,14 @@ def update_flashcard(
 @router.delete("/{flashcard_id}")
 def delete_flashcard(
     flashcard_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     flashcard = db.query(db_models.Flashcard).join(db_models.Deck).filter(
         db_models.Flashcard.id == flashcard_id,
         db_models.Deck.owner_id == current_user.id,
-        db_models.Flashcard.is_active == True
+        db_models.Flashcard.is_active == true()
     ).first()
     
     if not flashcard:
@@ -135,6 +307,52 @@ def delete_flashcard(
             detail="Flashcard not found"
         )
     
+    if if_match_requested(request):
+        require_if_match(db, request, flashcard.deck_id, flashcard.deck.version)
+    
     flashcard.is_active = False
     db.commit()
+    deck_cache.invalidate_deck(current_user.id, flashcard.deck_id)
     return {"message": "Flashcard deleted successfully"}
+
+
+@router.post("/{flashcard_id}/restore", response_model=schemas.Flashcard)
+def restore_flashcard(
+    flashcard_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Undo a flashcard deletion within the retention window"""
+    flashcard = db.query(db_models.Flashcard).join(db_models.Deck).filter(
+        db_models.Flashcard.id == flashcard_id,
+        db_models.Deck.owner_id == current_user.id,
+        db_models.Flashcard.is_active == false()
+    ).first()
+    
+    if not flashcard:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+    
+    if not restorable(flashcard.deleted_at):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Flashcard can no longer be restored"
+        )
+    
+    if not flashcard.deck.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Deck is deleted; restore the deck first"
+        )
+    
+    if if_match_requested(request):
+        require_if_match(db, request, flashcard.deck_id, flashcard.deck.version)
+    
+    flashcard.is_active = True
+    db.commit()
+    deck_cache.invalidate_deck(current_user.id, flashcard.deck_id)
+    db.refresh(flashcard)
+    return flashcard
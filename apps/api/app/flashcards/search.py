@@ -0,0 +1,80 @@
+"""
+Dialect-specific full-text search over a user's active flashcards.
+
+Postgres matches the generated `search_vector` column (GIN indexed) with
+websearch_to_tsquery and ranks with ts_rank. SQLite matches the FTS5 table
+`flashcards_fts` and ranks with bm25. Both are created by migration 0005.
+"""
+from fastapi import HTTPException, status
+from sqlalchemy import column, func, literal_column, select, table, true
+
+from .. import db_models
+
+SEARCH_LANGUAGE = "english"
+MAX_QUERY_LENGTH = 256
+
+_fts = table("flashcards_fts", column("rowid"))
+
+
+def _fts5_query(q: str) -> str:
+    """Quote each term so user input cannot use FTS5 query syntax"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+def _validate_query(q: str) -> str:
+    q = q.strip()
+    if not q or len(q) > MAX_QUERY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"q must be between 1 and {MAX_QUERY_LENGTH} characters"
+        )
+    return q
+
+
+def _search_statement(dialect_name: str, owner_id: int, q: str):
+    """(statement selecting matching cards, rank expression) for the dialect"""
+    Flashcard, Deck = db_models.Flashcard, db_models.Deck
+    scope = (
+        Deck.owner_id == owner_id,
+        Deck.is_active == true(),
+        Flashcard.is_active == true(),
+    )
+
+    if dialect_name == "postgresql":
+        search_vector = literal_column("flashcards.search_vector")
+        tsquery = func.websearch_to_tsquery(SEARCH_LANGUAGE, q)
+        rank = func.ts_rank(search_vector, tsquery).label("rank")
+        statement = select().select_from(Flashcard).join(
+            Deck, Deck.id == Flashcard.deck_id
+        ).where(search_vector.op("@@")(tsquery), *scope)
+        return statement, rank
+
+    if dialect_name == "sqlite":
+        # bm25() is lower-is-better; negate it so both dialects rank descending
+        rank = (-func.bm25(literal_column("flashcards_fts"))).label("rank")
+        statement = select().select_from(_fts).join(
+            Flashcard, Flashcard.id == _fts.c.rowid
+        ).join(
+            Deck, Deck.id == Flashcard.deck_id
+        ).where(literal_column("flashcards_fts").op("MATCH")(_fts5_query(q)), *scope)
+        return statement, rank
+
+    raise HTTPException(
+        status_code=status.HTTP_501_NOT_IMPLEMENTED,
+        detail="Search is not available on this database"
+    )
+
+
+def search_query(dialect_name: str, owner_id: int, q: str, skip: int, limit: int):
+    """Ranked search statement returning flashcard columns plus `rank`, best first"""
+    Flashcard = db_models.Flashcard
+    statement, rank = _search_statement(dialect_name, owner_id, _validate_query(q))
+    return statement.add_columns(Flashcard.__table__, rank).order_by(
+        rank.desc(), Flashcard.id
+    ).offset(skip).limit(limit)
+
+
+def matching_ids_query(dialect_name: str, owner_id: int, q: str):
+    """Ids of the user's active cards matching q, for filtering other statements"""
+    statement, _ = _search_statement(dialect_name, owner_id, _validate_query(q))
+    return statement.add_columns(db_models.Flashcard.id)
@@ -0,0 +1,297 @@
+"""
+Google ID token verification with cached signing certificates.
+
+google.oauth2.id_token.verify_oauth2_token downloads Google's certificates
+on every call. Here they are fetched through a shared, pooled HTTP session
+and kept for as long as the response's Cache-Control max-age allows:
+
+- a refresh starts in the background REFRESH_AHEAD_FRACTION of the max-age
+  before expiry, so requests keep using the current certificates meanwhile
+- only one fetch runs at a time; callers that need certificates while it is
+  running wait for it instead of fetching themselves
+- a token signed with a key id that is not cached forces one refresh, which
+  picks up Google's key rotation without waiting for expiry
+- when a refresh fails, the previous certificates are served for up to
+  GOOGLE_CERTS_STALE_GRACE seconds past their expiry
+
+Once the certificates are cached, verifying a token is CPU work only.
+Certificate sources are pluggable (see StaticCertSource) so verification can
+run against a local key set.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+# Used when the certificate response carries no usable max-age
+GOOGLE_CERTS_DEFAULT_TTL = float(os.getenv("GOOGLE_CERTS_DEFAULT_TTL", "3600"))
+GOOGLE_CERTS_STALE_GRACE = float(os.getenv("GOOGLE_CERTS_STALE_GRACE", "3600"))
+GOOGLE_CERTS_TIMEOUT = float(os.getenv("GOOGLE_CERTS_TIMEOUT", "5"))
+GOOGLE_TOKEN_CLOCK_SKEW = int(os.getenv("GOOGLE_TOKEN_CLOCK_SKEW", "10"))
+REFRESH_AHEAD_FRACTION = 0.1
+# Lower bound between forced refreshes for unknown key ids, so forged kids cannot hammer Google
+MIN_FORCED_REFRESH_INTERVAL = 30.0
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+Certs = Dict[str, str]
+
+
+class CertSourceError(Exception):
+    """The certificate source could not be read"""
+
+
+def cache_lifetime(cache_control: Optional[str], age: Optional[str] = None) -> Optional[float]:
+    """Seconds a response may be cached for, from its Cache-Control and Age headers"""
+    if not cache_control or "no-store" in cache_control or "no-cache" in cache_control:
+        return None
+    match = _MAX_AGE.search(cache_control)
+    if match is None:
+        return None
+    lifetime = float(match.group(1))
+    if age and age.isdigit():
+        lifetime -= float(age)
+    return max(lifetime, 0.0)
+
+
+class CertSource(ABC):
+    """Somewhere to load a {key id: PEM certificate} mapping from"""
+
+    @abstractmethod
+    def fetch(self) -> Tuple[Certs, Optional[float]]:
+        """Return the certificates and how many seconds they may be cached"""
+
+
+class HttpCertSource(CertSource):
+    """Google's certificate endpoint, read through one pooled requests session"""
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL, timeout: float = GOOGLE_CERTS_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self._session = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    # requests is only needed here, so keep it off the import path
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=1))
+                    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=1))
+                    self._session = session
+        return self._session
+
+    def fetch(self) -> Tuple[Certs, Optional[float]]:
+        import requests
+
+        try:
+            response = self.session().get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            certs = response.json()
+        except (requests.RequestException, ValueError) as exc:
+            raise CertSourceError(f"Could not fetch certificates from {self.url}: {exc}") from exc
+        if not isinstance(certs, dict):
+            raise CertSourceError(f"Unexpected certificate payload from {self.url}")
+        return certs, cache_lifetime(response.headers.get("Cache-Control"), response.headers.get("Age"))
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class StaticCertSource(CertSource):
+    """A fixed key set, e.g. locally generated certificates for tests and benchmarks"""
+
+    def __init__(self, certs: Mapping[str, str], max_age: Optional[float] = None):
+        self.certs = dict(certs)
+        self.max_age = max_age
+        self.fetches = 0
+
+    @classmethod
+    def from_file(cls, path: str, max_age: Optional[float] = None) -> "StaticCertSource":
+        with open(path) as f:
+            return cls(json.load(f), max_age)
+
+    def fetch(self) -> Tuple[Certs, Optional[float]]:
+        self.fetches += 1
+        return dict(self.certs), self.max_age
+
+
+class CertCache:
+    """Certificates from a CertSource, refreshed ahead of expiry with one fetch at a time"""
+
+    def __init__(self, source: CertSource, default_ttl: float = GOOGLE_CERTS_DEFAULT_TTL,
+                 stale_grace: float = GOOGLE_CERTS_STALE_GRACE):
+        self.source = source
+        self.default_ttl = default_ttl
+        self.stale_grace = stale_grace
+        self._certs: Optional[Certs] = None
+        self._fetched_at = 0.0
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._lock = threading.Lock()
+        self._fetching: Optional[threading.Event] = None
+        self._last_error: Optional[str] = None
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.background_refreshes = 0
+        self.forced_refreshes = 0
+
+    def get(self) -> Certs:
+        """Current certificates; only blocks when none are cached or they are past their grace period"""
+        now = time.monotonic()
+        certs = self._certs
+        if certs is None or now >= self._expires_at + self.stale_grace:
+            return self.refresh()
+        # Also reached past expiry, within the grace period, when a refresh failed or the
+        # process sat idle: Google publishes keys well before signing with them
+        if now >= self._refresh_at:
+            self._refresh_in_background()
+        return certs
+
+    def refresh(self, force: bool = False) -> Certs:
+        """Fetch now, or wait for the fetch another caller already started"""
+        with self._lock:
+            if force and self._certs is not None and time.monotonic() - self._fetched_at < MIN_FORCED_REFRESH_INTERVAL:
+                return self._certs
+            event = self._fetching
+            leader = event is None
+            if leader:
+                event = self._fetching = threading.Event()
+                if force:
+                    self.forced_refreshes += 1
+        if leader:
+            self._fetch(event)
+        else:
+            event.wait(GOOGLE_CERTS_TIMEOUT * 2)
+        return self._usable()
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._fetching is not None:
+                return
+            event = self._fetching = threading.Event()
+            self.background_refreshes += 1
+        threading.Thread(target=self._fetch, args=(event,), name="google-certs-refresh", daemon=True).start()
+
+    def _fetch(self, event: threading.Event) -> None:
+        try:
+            certs, max_age = self.source.fetch()
+        except Exception as exc:
+            with self._lock:
+                self.fetch_errors += 1
+                self._last_error = str(exc)
+                # Retry on a later call rather than immediately
+                self._refresh_at = time.monotonic() + min(MIN_FORCED_REFRESH_INTERVAL, self.default_ttl)
+            logger.warning("google_certs.fetch_failed error=%s", exc)
+        else:
+            ttl = self.default_ttl if max_age is None else max_age
+            now = time.monotonic()
+            with self._lock:
+                self._certs = certs
+                self._fetched_at = now
+                self._expires_at = now + ttl
+                self._refresh_at = now + ttl * (1 - REFRESH_AHEAD_FRACTION)
+                self._last_error = None
+                self.fetches += 1
+        finally:
+            with self._lock:
+                self._fetching = None
+            event.set()
+
+    def _usable(self) -> Certs:
+        certs = self._certs
+        if certs is None or time.monotonic() >= self._expires_at + self.stale_grace:
+            raise CertSourceError(self._last_error or "Google certificates are unavailable")
+        return certs
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "keys": len(self._certs or {}),
+            "expires_in_s": round(self._expires_at - now, 1) if self._certs is not None else None,
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+            "background_refreshes": self.background_refreshes,
+            "forced_refreshes": self.forced_refreshes,
+            "last_error": self._last_error,
+        }
+
+
+def _key_id(token: str) -> Optional[str]:
+    from google.auth import jwt
+
+    try:
+        header = jwt.decode_header(token)
+    except (ValueError, TypeError):
+        return None
+    return header.get("kid") if isinstance(header, dict) else None
+
+
+class GoogleTokenVerifier:
+    """Verifies Google ID tokens against a CertCache"""
+
+    def __init__(self, certs: CertCache, audience: Optional[str]):
+        self.certs = certs
+        self.audience = audience
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Decoded claims of a valid token; ValueError for an invalid one, CertSourceError without certificates"""
+        # google-auth is only needed here, so keep it off the import path
+        from google.auth import jwt
+
+        certs = self.certs.get()
+        key_id = _key_id(token)
+        if key_id is not None and key_id not in certs:
+            certs = self.certs.refresh(force=True)
+        idinfo = jwt.decode(token, certs=certs, audience=self.audience,
+                            clock_skew_in_seconds=GOOGLE_TOKEN_CLOCK_SKEW)
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError("Wrong issuer.")
+        return idinfo
+
+    def warm_up(self) -> None:
+        """Import the JWT stack and load the certificates"""
+        from google.auth import jwt  # noqa: F401
+
+        self.certs.get()
+
+
+_verifier: Optional[GoogleTokenVerifier] = None
+_verifier_lock = threading.Lock()
+
+
+def configure(source: Optional[CertSource] = None, audience: Optional[str] = None) -> GoogleTokenVerifier:
+    """Replace the shared verifier, e.g. with a StaticCertSource in tests
+
+    Without arguments this only creates the default verifier if there is none yet.
+    """
+    global _verifier
+    with _verifier_lock:
+        if source is None and audience is None and _verifier is not None:
+            return _verifier
+        _verifier = GoogleTokenVerifier(CertCache(source or HttpCertSource()),
+                                        audience or os.getenv("GOOGLE_CLIENT_ID"))
+    return _verifier
+
+
+def verifier() -> GoogleTokenVerifier:
+    return _verifier or configure()
+
+
+def stats() -> Optional[Dict[str, Any]]:
+    return _verifier.certs.stats() if _verifier is not None else None
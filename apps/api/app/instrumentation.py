@@ -0,0 +1,254 @@
+"""
+Per-request SQL and timing instrumentation.
+
+RequestMetricsMiddleware opens a RequestStats for every HTTP request and keeps
+it in a context variable. Context variables are copied into the threadpool
+that runs sync endpoints and dependencies, so the SQLAlchemy cursor hooks and
+the `timed()` blocks in auth and serialization all add to the same object.
+
+Each request gets:
+
+- a Server-Timing header (db, auth, serialize and total app time)
+- a sampled `request.timing` log line
+- a `request.n_plus_one` warning when one statement runs N_PLUS_ONE_THRESHOLD
+  or more times, which usually means rows are being loaded one at a time
+- an entry in per-route histograms served from /internal/metrics
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from fastapi.routing import APIRoute, request_response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .logs import log_sampled
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+REQUEST_METRICS = os.getenv("REQUEST_METRICS", "1") != "0"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") != "0"
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+N_PLUS_ONE_LOG_SAMPLE_RATE = float(os.getenv("N_PLUS_ONE_LOG_SAMPLE_RATE", "0.1"))
+# Longest statement text kept for the slowest-statement and N+1 reports
+MAX_STATEMENT_LENGTH = 300
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record_query(self, statement: str, duration_ms: float) -> None:
+        with self._lock:
+            self.query_count += 1
+            self.db_ms += duration_ms
+            self.statements[statement] += 1
+            if duration_ms > self.slowest_ms:
+                self.slowest_ms = duration_ms
+                self.slowest_statement = statement
+
+    def add_timing(self, name: str, duration_ms: float) -> None:
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + duration_ms
+
+    def repeated_statement(self):
+        """(statement, count) of the most repeated statement when it looks like N+1"""
+        if not self.statements:
+            return None
+        statement, count = self.statements.most_common(1)[0]
+        return (statement, count) if count >= N_PLUS_ONE_THRESHOLD else None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        entries = [f'db;dur={self.db_ms:.1f};desc="{self.query_count} queries"']
+        for name, duration_ms in self.timings.items():
+            entries.append(f"{name};dur={duration_ms:.1f}")
+        repeated = self.repeated_statement()
+        if repeated:
+            entries.append(f'n_plus_one;desc="statement repeated {repeated[1]}x"')
+        entries.append(f"app;dur={self.elapsed_ms():.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Add the duration of the block to the current request's `name` timing"""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_timing(name, (time.perf_counter() - started) * 1000)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.record_query(statement[:MAX_STATEMENT_LENGTH], (time.perf_counter() - started.pop()) * 1000)
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.duration = Histogram()
+        self.db_time = Histogram()
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.n_plus_one = 0
+
+    @staticmethod
+    def _counts(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        # Histogram reports milliseconds; this one observes query counts
+        snapshot["sum"] = snapshot.pop("sum_ms")
+        snapshot["max"] = snapshot.pop("max_ms")
+        return snapshot
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.duration.count,
+            "duration_ms": {**self.duration.snapshot(), "p50": self.duration.quantile(0.5),
+                            "p95": self.duration.quantile(0.95), "p99": self.duration.quantile(0.99)},
+            "db_ms": self.db_time.snapshot(),
+            "queries": self._counts(self.queries.snapshot()),
+            "n_plus_one": self.n_plus_one,
+        }
+
+
+_routes: Dict[str, RouteMetrics] = {}
+_routes_lock = threading.Lock()
+
+
+def _route_metrics(key: str) -> RouteMetrics:
+    metrics = _routes.get(key)
+    if metrics is None:
+        with _routes_lock:
+            metrics = _routes.setdefault(key, RouteMetrics())
+    return metrics
+
+
+def record_request(method: str, route: str, status_code: int, stats: RequestStats) -> None:
+    duration_ms = stats.elapsed_ms()
+    metrics = _route_metrics(f"{method} {route}")
+    metrics.duration.observe(duration_ms)
+    metrics.db_time.observe(stats.db_ms)
+    metrics.queries.observe(stats.query_count)
+
+    repeated = stats.repeated_statement()
+    if repeated:
+        metrics.n_plus_one += 1
+        log_sampled(logger, N_PLUS_ONE_LOG_SAMPLE_RATE, "request.n_plus_one", level=logging.WARNING,
+                    method=method, route=route, repeats=repeated[1], statement=repeated[0])
+    log_sampled(
+        logger, REQUEST_LOG_SAMPLE_RATE, "request.timing",
+        method=method, route=route, status=status_code, duration_ms=round(duration_ms, 3),
+        queries=stats.query_count, db_ms=round(stats.db_ms, 3), slowest_ms=round(stats.slowest_ms, 3),
+        slowest_statement=stats.slowest_statement,
+        **{f"{name}_ms": round(value, 3) for name, value in stats.timings.items()},
+    )
+
+
+def route_stats() -> Dict[str, Any]:
+    with _routes_lock:
+        routes = dict(_routes)
+    return {key: metrics.snapshot() for key, metrics in sorted(routes.items())}
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware, so the context variable reaches streaming bodies too"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REQUEST_METRICS:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SERVER_TIMING:
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"server-timing", stats.server_timing().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            record_request(scope["method"], route.path if route is not None else "unmatched", status_code, stats)
+
+
+class _TimedResponseField:
+    """A route's response field, timing validation and serialization of its responses"""
+
+    def __init__(self, field):
+        self._field = field
+
+    def __getattr__(self, name):
+        return getattr(self._field, name)
+
+    def validate(self, *args, **kwargs):
+        with timed("serialize"):
+            return self._field.validate(*args, **kwargs)
+
+    def serialize(self, *args, **kwargs):
+        with timed("serialize"):
+            return self._field.serialize(*args, **kwargs)
+
+
+class TimedRoute(APIRoute):
+    """Route class that adds response_model serialization to the serialize timing
+
+    Only this route's response field is wrapped, so nothing outside the app is
+    affected; routes that return a Response themselves time their own
+    serialization with timed().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.secure_cloned_response_field is not None:
+            self.secure_cloned_response_field = _TimedResponseField(self.secure_cloned_response_field)
+            self.app = request_response(self.get_route_handler())
+
+
+def install(app) -> None:
+    """Add the middleware; routers opt into serialization timing with route_class=TimedRoute"""
+    app.add_middleware(RequestMetricsMiddleware)
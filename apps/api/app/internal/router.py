@@ -0,0 +1,52 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from .. import (
+    auth_cache, compaction, google_certs, instrumentation, rate_limit, replicas, response_cache, startup,
+)
+from ..database import engine_pool_stats
+
+# Operational endpoints, kept out of the public OpenAPI schema
+router = APIRouter(prefix="/internal", tags=["internal"], include_in_schema=False, route_class=instrumentation.TimedRoute)
+
+# Metrics are only served to callers presenting this token; unset, they are not served at all
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def require_metrics_token(x_metrics_token: Optional[str] = Header(default=None)):
+    """404 unless the request carries METRICS_TOKEN, so the endpoint fails closed"""
+    if not METRICS_TOKEN or not hmac.compare_digest((x_metrics_token or "").encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not found"
+        )
+
+
+@router.get("/ready")
+def get_ready():
+    """Readiness probe; 503 until the lifespan startup has finished"""
+    process = startup.process_stats()
+    if not process["ready"]:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Starting"
+        )
+    return {"status": "ready", "pid": process["pid"]}
+
+
+@router.get("/metrics", dependencies=[Depends(require_metrics_token)])
+def get_metrics():
+    return {
+        "process": startup.process_stats(),
+        "auth_cache": auth_cache.stats(),
+        "google_certs": google_certs.stats(),
+        "db_pool": engine_pool_stats(),
+        "replicas": replicas.stats(),
+        "rate_limit": rate_limit.stats(),
+        "response_cache": response_cache.stats(),
+        "compaction": compaction.stats(),
+        "routes": instrumentation.route_stats(),
+    }
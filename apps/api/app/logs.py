@@ -0,0 +1,28 @@
+"""
+Structured, sampled logging helpers.
+
+Hot paths (auth, per-request timing) should not log every request. log_sampled
+emits a single `event key=value ...` line for a fraction of calls.
+"""
+import logging
+import random
+from typing import Any
+
+
+def format_fields(**fields: Any) -> str:
+    return " ".join(f"{key}={value}" for key, value in fields.items() if value is not None)
+
+
+def log_sampled(
+    logger: logging.Logger,
+    rate: float,
+    event: str,
+    level: int = logging.INFO,
+    **fields: Any
+) -> None:
+    """Log `event` with fields for roughly `rate` (0.0-1.0) of calls"""
+    if rate <= 0 or not logger.isEnabledFor(level):
+        return
+    if rate < 1 and random.random() >= rate:
+        return
+    logger.log(level, "%s %s", event, format_fields(**fields), extra={"event": event, "fields": fields})
@@ -0,0 +1,89 @@
+"""
+Small in-process metric primitives served from /internal/metrics.
+"""
+import threading
+import time
+from typing import Any, Dict, Sequence
+
+# Millisecond bucket bounds suited to DB and request latencies
+DEFAULT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observations in milliseconds"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += value_ms
+            self.max = max(self.max, value_ms)
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound below which a fraction q of observations fall"""
+        with self._lock:
+            target = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self._counts):
+                seen += count
+                if count and seen >= target:
+                    return bound
+            return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[f"le_{bound}"] = cumulative
+            buckets["le_inf"] = self.count
+            return {
+                "count": self.count,
+                "sum_ms": round(self.total, 3),
+                "max_ms": round(self.max, 3),
+                "buckets": buckets,
+            }
+
+
+class DecayingAverage:
+    """Exponentially weighted average that decays toward zero while nothing is observed
+
+    Suits signals such as pool wait time, which are only observed while there
+    is traffic: once load (or shedding) stops the observations, the value
+    falls back instead of staying at its last level.
+    """
+
+    def __init__(self, half_life: float = 5.0, alpha: float = 0.2):
+        self.half_life = half_life
+        self.alpha = alpha
+        self._value = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _decayed(self, now: float) -> float:
+        return self._value * 0.5 ** ((now - self._updated) / self.half_life)
+
+    def observe(self, value: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            current = self._decayed(now)
+            self._value = current + self.alpha * (value - current)
+            self._updated = now
+
+    def value(self) -> float:
+        with self._lock:
+            return self._decayed(time.monotonic())
@@ -0,0 +1,460 @@
+"""
+Per-user rate limiting and adaptive load shedding.
+
+Rate limits are token buckets keyed on the user get_current_user resolved:
+one bucket per user across all routes (RATE_LIMIT_USER_RATE requests per
+second, bursting to RATE_LIMIT_USER_BURST) and one per user and route
+(RATE_LIMIT_ROUTE_RATE/RATE_LIMIT_ROUTE_BURST, overridable per route with
+RATE_LIMIT_ROUTES). A request that finds either bucket empty gets a 429
+before its handler runs, so a client polling in a tight loop stops costing
+database connections and threadpool slots. Every limited response carries
+RateLimit-Limit, RateLimit-Remaining and RateLimit-Reset for the tighter of
+the two buckets, plus Retry-After on a 429.
+
+Buckets live in a pluggable store:
+
+- memory (default): per process, so each worker enforces the limits alone
+- redis: one bucket per key across every worker, updated atomically by a
+  script; needs the optional `redis` package
+- local: the shared-store adapter over an in-process stand-in, to exercise
+  that path without a server
+- off: disables rate limiting
+
+If the store fails, requests are let through rather than failed.
+
+Load shedding runs before any of that, in LoadShedMiddleware: when the
+worker already has SHED_MAX_IN_FLIGHT requests in progress, or the primary's
+recent pool wait passes SHED_POOL_WAIT_MS, new requests get a 503 with
+Retry-After instead of queueing behind the backlog. Past the pool wait
+threshold a growing share of requests is shed, all of them at twice the
+threshold. Health, readiness and metrics endpoints are never shed.
+"""
+import logging
+import math
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from . import database
+from .logs import log_sampled
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_USER_RATE = float(os.getenv("RATE_LIMIT_USER_RATE", "20"))
+RATE_LIMIT_USER_BURST = int(os.getenv("RATE_LIMIT_USER_BURST", "60"))
+RATE_LIMIT_ROUTE_RATE = float(os.getenv("RATE_LIMIT_ROUTE_RATE", "10"))
+RATE_LIMIT_ROUTE_BURST = int(os.getenv("RATE_LIMIT_ROUTE_BURST", "30"))
+# Comma-separated "METHOD /path/template=rate/burst" overrides of the per-route limit
+RATE_LIMIT_ROUTES = os.getenv("RATE_LIMIT_ROUTES", "")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0"))
+RATE_LIMIT_LOG_SAMPLE_RATE = float(os.getenv("RATE_LIMIT_LOG_SAMPLE_RATE", "0.01"))
+
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "200"))
+SHED_POOL_WAIT_MS = float(os.getenv("SHED_POOL_WAIT_MS", "250"))
+SHED_RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", "1"))
+# Readiness and monitoring stay answerable under overload
+SHED_EXEMPT_PATHS = ("/internal/ready", "/internal/metrics")
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float
+    burst: int
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.burst > 0
+
+
+@dataclass(frozen=True)
+class BucketResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the bucket is full again, and until the next token when empty
+    reset: float
+    retry_after: float
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def refill(tokens: float, updated: float, now: float, limit: Limit) -> float:
+    return min(float(limit.burst), tokens + max(0.0, now - updated) * limit.rate)
+
+
+def take_token(tokens: float, limit: Limit) -> Tuple[BucketResult, float]:
+    """Spend one token from a refilled bucket; returns the result and the tokens left"""
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    result = BucketResult(
+        allowed=allowed,
+        limit=limit.burst,
+        remaining=int(tokens),
+        reset=(limit.burst - tokens) / limit.rate,
+        retry_after=0.0 if allowed else (1 - tokens) / limit.rate,
+    )
+    return result, tokens
+
+
+def bucket_ttl(limit: Limit) -> int:
+    """Seconds after which an untouched bucket is full again and can be forgotten"""
+    return math.ceil(limit.burst / limit.rate) + 1
+
+
+class BucketStore(ABC):
+    """Holds token bucket state; take() must be atomic per key"""
+    name = "base"
+
+    @abstractmethod
+    def take(self, key: str, limit: Limit) -> BucketResult:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class NullBucketStore(BucketStore):
+    name = "off"
+
+    def take(self, key: str, limit: Limit) -> BucketResult:
+        return BucketResult(True, limit.burst, limit.burst, 0.0, 0.0)
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryBucketStore(BucketStore):
+    """Per-process buckets, least recently used dropped beyond max_keys"""
+    name = "memory"
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def take(self, key: str, limit: Limit) -> BucketResult:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(limit.burst), now))
+            result, tokens = take_token(refill(tokens, updated, now, limit), limit)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"keys": len(self._buckets), "max_keys": self.max_keys, "evictions": self.evictions}
+
+
+# KEYS[1] bucket; ARGV rate, burst, ttl. Uses the server clock so every worker
+# refills the same way. Returns {allowed, tokens left * 1000}
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {allowed, math.floor(tokens * 1000)}
+"""
+
+
+class SharedBucketStore(BucketStore):
+    """Adapter for a shared store with a redis-style register_script client"""
+    name = "shared"
+
+    def __init__(self, client, prefix: str = "promptly:ratelimit:"):
+        self.prefix = prefix
+        self.client = client
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    def take(self, key: str, limit: Limit) -> BucketResult:
+        allowed, milli_tokens = self._take(keys=[self.prefix + key], args=[limit.rate, limit.burst, bucket_ttl(limit)])
+        tokens = int(milli_tokens) / 1000
+        return BucketResult(
+            allowed=bool(int(allowed)),
+            limit=limit.burst,
+            remaining=int(tokens),
+            reset=(limit.burst - tokens) / limit.rate,
+            retry_after=0.0 if int(allowed) else (1 - tokens) / limit.rate,
+        )
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"prefix": self.prefix}
+
+
+class LocalScriptClient:
+    """In-process stand-in for a shared store client running TAKE_SCRIPT"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def register_script(self, script: str):
+        def run(keys: List[str], args: List[Any]):
+            limit = Limit(float(args[0]), int(args[1]))
+            now = time.time()
+            with self._lock:
+                tokens, updated = self._data.get(keys[0], (float(limit.burst), now))
+                result, tokens = take_token(refill(tokens, updated, now, limit), limit)
+                self._data[keys[0]] = (tokens, now)
+            return [int(result.allowed), math.floor(tokens * 1000)]
+        return run
+
+    def scan_iter(self, match: str = "*"):
+        prefix = match.rstrip("*")
+        with self._lock:
+            return [key for key in self._data if key.startswith(prefix)]
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+def create_store(name: str = RATE_LIMIT_BACKEND) -> BucketStore:
+    if name == "off":
+        return NullBucketStore()
+    if name == "memory":
+        return MemoryBucketStore(RATE_LIMIT_MAX_KEYS)
+    if name == "local":
+        return SharedBucketStore(LocalScriptClient())
+    if name == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from e
+        return SharedBucketStore(redis.Redis.from_url(RATE_LIMIT_REDIS_URL))
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND {name!r}; expected memory, redis, local or off")
+
+
+def parse_route_limits(spec: str) -> Dict[str, Limit]:
+    """Parse "GET /decks/=2/10,POST /flashcards/deck/{deck_id}/import=0.1/2" """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, values = entry.rpartition("=")
+        rate, _, burst = values.partition("/")
+        try:
+            limits[" ".join(route.split())] = Limit(float(rate), int(burst))
+        except ValueError:
+            raise ValueError(f"RATE_LIMIT_ROUTES entry {entry!r} is not 'METHOD /path=rate/burst'") from None
+    return limits
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        store: BucketStore,
+        user_limit: Limit = Limit(RATE_LIMIT_USER_RATE, RATE_LIMIT_USER_BURST),
+        route_limit: Limit = Limit(RATE_LIMIT_ROUTE_RATE, RATE_LIMIT_ROUTE_BURST),
+        route_limits: Optional[Dict[str, Limit]] = None,
+    ):
+        self.store = store
+        self.user_limit = user_limit
+        self.route_limit = route_limit
+        self.route_limits = parse_route_limits(RATE_LIMIT_ROUTES) if route_limits is None else route_limits
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited: Dict[str, int] = {}
+        self.store_errors = 0
+
+    def _buckets(self, user_id: int, route: str) -> List[Tuple[str, Limit]]:
+        buckets = [(f"user:{user_id}", self.user_limit),
+                   (f"route:{user_id}:{route}", self.route_limits.get(route, self.route_limit))]
+        return [(key, limit) for key, limit in buckets if limit.enabled]
+
+    def check(self, user_id: int, route: str) -> Optional[BucketResult]:
+        """Take a token from each of the user's buckets; returns the tightest result"""
+        tightest: Optional[BucketResult] = None
+        try:
+            for key, limit in self._buckets(user_id, route):
+                result = self.store.take(key, limit)
+                if tightest is None or not result.allowed or (
+                    tightest.allowed and result.remaining / result.limit < tightest.remaining / tightest.limit
+                ):
+                    tightest = result
+                if not result.allowed:
+                    break
+        except Exception as exc:
+            with self._lock:
+                self.store_errors += 1
+            log_sampled(logger, RATE_LIMIT_LOG_SAMPLE_RATE, "rate_limit.store_failed", level=logging.WARNING, error=exc)
+            return None
+        with self._lock:
+            if tightest is None or tightest.allowed:
+                self.allowed += 1
+            else:
+                self.limited[route] = self.limited.get(route, 0) + 1
+        return tightest
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {"allowed": self.allowed, "limited": dict(self.limited), "store_errors": self.store_errors}
+        return {
+            "backend": self.store.name,
+            "user_limit": vars(self.user_limit),
+            "route_limit": vars(self.route_limit),
+            "route_overrides": {route: vars(limit) for route, limit in self.route_limits.items()},
+            **counters,
+            **self.store.stats(),
+        }
+
+
+limiter = RateLimiter(create_store())
+
+
+def _route_key(request: Request) -> str:
+    route = request.scope.get("route")
+    return f"{request.method} {route.path if route is not None else request.url.path}"
+
+
+def enforce(request: Request, user_id: int) -> None:
+    """Called once the user is known; raises 429 when a bucket is empty"""
+    route = _route_key(request)
+    result = limiter.check(user_id, route)
+    if result is None:
+        return
+    if not result.allowed:
+        log_sampled(logger, RATE_LIMIT_LOG_SAMPLE_RATE, "rate_limit.limited", level=logging.WARNING,
+                    user_id=user_id, route=route, retry_after=result.headers()["Retry-After"])
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers=result.headers(),
+        )
+    # LoadShedMiddleware adds the headers to the response
+    request.state.rate_limit = result
+
+
+class LoadShedder:
+    def __init__(self, max_in_flight: int = SHED_MAX_IN_FLIGHT, pool_wait_ms: float = SHED_POOL_WAIT_MS):
+        self.max_in_flight = max_in_flight
+        self.pool_wait_ms = pool_wait_ms
+        # Only touched from the event loop
+        self.in_flight = 0
+        self.shed: Dict[str, int] = {"in_flight": 0, "pool_wait": 0}
+
+    def reason(self) -> Optional[str]:
+        """Why the next request should be shed, or None to serve it"""
+        if self.max_in_flight > 0 and self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if self.pool_wait_ms > 0:
+            overload = (database.pool_wait_ms() - self.pool_wait_ms) / self.pool_wait_ms
+            if overload > 0 and random.random() < overload:
+                return "pool_wait"
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "pool_wait_threshold_ms": self.pool_wait_ms,
+            "pool_wait_ms": round(database.pool_wait_ms(), 3),
+            "shed": dict(self.shed),
+        }
+
+
+shedder = LoadShedder()
+
+
+def _exempt(path: str) -> bool:
+    return path in SHED_EXEMPT_PATHS
+
+
+async def _send_shed(send) -> None:
+    body = b'{"detail":"Server overloaded, retry shortly"}'
+    await send({
+        "type": "http.response.start",
+        "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(SHED_RETRY_AFTER).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class LoadShedMiddleware:
+    """Sheds load before routing and adds rate limit headers to responses"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _exempt(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        reason = shedder.reason()
+        if reason is not None:
+            shedder.shed[reason] += 1
+            log_sampled(logger, RATE_LIMIT_LOG_SAMPLE_RATE, "load.shed", level=logging.WARNING, reason=reason,
+                        in_flight=shedder.in_flight, path=scope["path"])
+            await _send_shed(send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                result = scope.get("state", {}).get("rate_limit")
+                if result is not None:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        *((name.lower().encode(), value.encode()) for name, value in result.headers().items()),
+                    ]
+            await send(message)
+
+        shedder.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            shedder.in_flight -= 1
+
+
+def install(app) -> None:
+    app.add_middleware(LoadShedMiddleware)
+
+
+def stats() -> Dict[str, Any]:
+    return {"limiter": limiter.stats(), "shedding": shedder.stats()}
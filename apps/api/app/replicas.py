@@ -0,0 +1,403 @@
+"""
+Read/write splitting across the primary and read replicas.
+
+get_db stays the read-write dependency and always uses the primary.
+get_read_db (and get_async_read_db in DB_MODE=async) is the read-only
+dependency for the hot read routes. It hands out a session on one of the
+READ_REPLICA_URLS, picked round-robin or by fewest sessions in use
+(REPLICA_SELECTION), and falls back to the primary when:
+
+- the user wrote within READ_YOUR_WRITES_WINDOW seconds, so their reads see
+  their own writes (stickiness follows the user, not the token, so it holds
+  across token refreshes and devices)
+- no replica is healthy: each is checked every REPLICA_HEALTH_INTERVAL
+  seconds in the background and skipped while unreachable or more than
+  REPLICA_MAX_LAG seconds behind
+- the chosen replica refuses the connection, which also marks it down
+
+Writes are recorded by a middleware for every POST/PUT/PATCH/DELETE that
+authenticated a user, before the response goes out. The marks live in a
+response_cache backend: per process by default, shared between workers with
+REPLICA_STICKY_BACKEND=redis.
+
+Without READ_REPLICA_URLS the read dependencies simply use the primary.
+Replica lag is measured on Postgres; SQLite files (handy for trying this
+locally) always report no lag.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import Depends
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from .auth_cache import AuthenticatedUser
+from .authenticate import get_current_user, get_current_user_async
+from .database import SessionLocal, async_database_url, get_async_sessionmaker, normalize_database_url
+from .db_pool import pool_options, pool_stats
+from .response_cache import RESPONSE_CACHE_BACKEND, CacheBackend, create_backend
+
+logger = logging.getLogger(__name__)
+
+READ_REPLICA_URLS = [
+    normalize_database_url(url.strip()) for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()
+]
+REPLICA_SELECTION = os.getenv("REPLICA_SELECTION", "round_robin").lower()
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "5"))
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_HEALTH_TIMEOUT = float(os.getenv("REPLICA_HEALTH_TIMEOUT", "2"))
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "10"))
+REPLICA_STICKY_BACKEND = os.getenv(
+    "REPLICA_STICKY_BACKEND", "redis" if RESPONSE_CACHE_BACKEND == "redis" else "memory"
+).lower()
+
+if REPLICA_SELECTION not in ("round_robin", "least_connections"):
+    raise ValueError(f"REPLICA_SELECTION must be 'round_robin' or 'least_connections', got {REPLICA_SELECTION!r}")
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+# Seconds the replica is behind the primary; 0 when it has replayed all it received
+POSTGRES_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def _connect_args(url: str) -> Dict[str, Any]:
+    if url.startswith("postgresql"):
+        return {"connect_timeout": max(1, int(REPLICA_HEALTH_TIMEOUT))}
+    return {}
+
+
+class Replica:
+    """One read replica: its engines, health and the sessions currently using it"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_engine(url, connect_args=_connect_args(url), **pool_options(url))
+        self.sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self._async_engine = None
+        self._async_sessionmaker = None
+        self._lock = threading.Lock()
+        # Optimistic until the first check: a dead replica is marked down by its first failed connection
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.in_use = 0
+        self.selected = 0
+        self.failures = 0
+        self.checked_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def get_async_sessionmaker(self):
+        if self._async_sessionmaker is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+            async_url = async_database_url(self.url)
+            self._async_engine = create_async_engine(async_url, **pool_options(async_url, use_async=True))
+            self._async_sessionmaker = async_sessionmaker(
+                bind=self._async_engine, autoflush=False, expire_on_commit=False
+            )
+        return self._async_sessionmaker
+
+    def acquire(self) -> None:
+        with self._lock:
+            self.in_use += 1
+            self.selected += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def mark_down(self, error: Exception) -> None:
+        with self._lock:
+            self.healthy = False
+            self.failures += 1
+            self.last_error = str(error).splitlines()[0] if str(error) else type(error).__name__
+        logger.warning("replicas.down replica=%s error=%s", self.name, self.last_error)
+
+    def check(self) -> bool:
+        """Probe the replica and record whether it can serve reads"""
+        try:
+            with self.engine.connect() as connection:
+                if self.engine.dialect.name == "postgresql":
+                    lag = float(connection.execute(POSTGRES_LAG_QUERY).scalar() or 0)
+                else:
+                    connection.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as exc:
+            self.mark_down(exc)
+        else:
+            with self._lock:
+                was_healthy = self.healthy
+                self.lag = round(lag, 3)
+                self.healthy = lag <= REPLICA_MAX_LAG
+                if not self.healthy:
+                    self.last_error = f"lag {self.lag}s exceeds {REPLICA_MAX_LAG}s"
+            if self.healthy != was_healthy:
+                logger.info("replicas.%s replica=%s lag=%s", "up" if self.healthy else "lagging", self.name, self.lag)
+        self.checked_at = time.time()
+        return self.healthy
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "healthy": self.healthy,
+                "lag_s": self.lag,
+                "in_use": self.in_use,
+                "selected": self.selected,
+                "failures": self.failures,
+                "checked_at": self.checked_at,
+                "last_error": self.last_error,
+                "pool": pool_stats(self.engine.pool),
+            }
+
+    def dispose(self, close: bool = True) -> None:
+        self.engine.dispose(close=close)
+        if self._async_engine is not None:
+            # Async connections cannot be closed from here; drop them with the pool
+            self._async_engine.sync_engine.dispose(close=False)
+
+    async def dispose_async(self) -> None:
+        self.engine.dispose()
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
+
+
+class ReplicaRouter:
+    """Chooses where each read goes"""
+
+    def __init__(
+        self,
+        replicas: List[Replica],
+        selection: str = REPLICA_SELECTION,
+        sticky_window: float = READ_YOUR_WRITES_WINDOW,
+        sticky_backend: Optional[CacheBackend] = None,
+        health_interval: float = REPLICA_HEALTH_INTERVAL,
+    ):
+        self.replicas = replicas
+        self.selection = selection
+        self.sticky_window = sticky_window
+        self.sticky = sticky_backend if sticky_backend is not None else create_backend(REPLICA_STICKY_BACKEND)
+        self.health_interval = health_interval
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+        self._checking = False
+        self._next_check = 0.0
+        self.reads = {"replica": 0, "primary_sticky": 0, "primary_unhealthy": 0, "primary_failover": 0}
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.reads[outcome] += 1
+
+    @staticmethod
+    def _sticky_key(user_id: int) -> str:
+        return f"replicas:wrote:{user_id}"
+
+    def record_write(self, user_id: int) -> None:
+        self.sticky.set(self._sticky_key(user_id), b"%.3f" % (time.time() + self.sticky_window))
+
+    def recently_wrote(self, user_id: int) -> bool:
+        until = self.sticky.get(self._sticky_key(user_id))
+        return until is not None and float(until) > time.time()
+
+    def check_all(self) -> None:
+        for replica in self.replicas:
+            replica.check()
+
+    def _check_in_background(self) -> None:
+        with self._lock:
+            if self._checking or time.monotonic() < self._next_check:
+                return
+            self._checking = True
+        threading.Thread(target=self._run_checks, name="replica-health", daemon=True).start()
+
+    def _run_checks(self) -> None:
+        try:
+            self.check_all()
+        finally:
+            with self._lock:
+                self._checking = False
+                self._next_check = time.monotonic() + self.health_interval
+
+    def choose(self, user_id: Optional[int]) -> Optional[Replica]:
+        """Replica to read from, or None for the primary"""
+        if not self.replicas:
+            return None
+        self._check_in_background()
+        if user_id is not None and self.recently_wrote(user_id):
+            self._count("primary_sticky")
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            self._count("primary_unhealthy")
+            return None
+        if self.selection == "least_connections":
+            # Ties go round-robin so an idle pool spreads over every replica
+            offset = next(self._round_robin)
+            replica = min(
+                (healthy[(offset + i) % len(healthy)] for i in range(len(healthy))), key=lambda r: r.in_use
+            )
+        else:
+            replica = healthy[next(self._round_robin) % len(healthy)]
+        self._count("replica")
+        return replica
+
+    def failed_over(self, replica: Replica, error: Exception) -> None:
+        replica.mark_down(error)
+        with self._lock:
+            self.reads["replica"] -= 1
+            self.reads["primary_failover"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            reads = dict(self.reads)
+        return {
+            "selection": self.selection,
+            "sticky_window_s": self.sticky_window,
+            "sticky_backend": self.sticky.name,
+            "max_lag_s": REPLICA_MAX_LAG,
+            "reads": reads,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
+
+_router: Optional[ReplicaRouter] = None
+_router_lock = threading.Lock()
+
+
+def _build(urls: List[str], **kwargs) -> ReplicaRouter:
+    return ReplicaRouter([Replica(normalize_database_url(url)) for url in urls], **kwargs)
+
+
+def configure(urls: Optional[List[str]] = None, **kwargs) -> ReplicaRouter:
+    """Replace the router, e.g. to point benchmarks at their own replica files"""
+    global _router
+    replacement = _build(READ_REPLICA_URLS if urls is None else urls, **kwargs)
+    with _router_lock:
+        previous, _router = _router, replacement
+    if previous is not None:
+        for replica in previous.replicas:
+            replica.dispose()
+    return replacement
+
+
+def replica_router() -> ReplicaRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = _build(READ_REPLICA_URLS)
+    return _router
+
+
+def _replica_session(replica: Replica) -> Optional[Session]:
+    db = replica.sessionmaker()
+    try:
+        # Check the connection out now so a dead replica fails over instead of failing the request
+        db.connection()
+    except DBAPIError as exc:
+        db.close()
+        replica_router().failed_over(replica, exc)
+        return None
+    return db
+
+
+def get_read_db(current_user: AuthenticatedUser = Depends(get_current_user)):
+    """Read-only session: a replica when one is usable, otherwise the primary"""
+    replica = replica_router().choose(current_user.id)
+    db = _replica_session(replica) if replica is not None else None
+    if db is None:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    replica.acquire()
+    try:
+        yield db
+    finally:
+        db.close()
+        replica.release()
+
+
+async def get_async_read_db(current_user: AuthenticatedUser = Depends(get_current_user_async)):
+    """Async counterpart of get_read_db"""
+    replica = replica_router().choose(current_user.id)
+    if replica is not None:
+        db: AsyncSession = replica.get_async_sessionmaker()()
+        try:
+            await db.connection()
+        except DBAPIError as exc:
+            await db.close()
+            replica_router().failed_over(replica, exc)
+            replica = None
+    if replica is None:
+        async with get_async_sessionmaker()() as db:
+            yield db
+        return
+    replica.acquire()
+    try:
+        yield db
+    finally:
+        await db.close()
+        replica.release()
+
+
+class WriteTrackingMiddleware:
+    """Records a write for the authenticated user of every unsafe request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_after_recording(message):
+            if message["type"] == "http.response.start":
+                # get_current_user leaves the user on request.state
+                user = scope.get("state", {}).get("user")
+                if user is not None and replica_router().replicas:
+                    replica_router().record_write(user.id)
+            await send(message)
+
+        await self.app(scope, receive, send_after_recording)
+
+
+def install(app) -> None:
+    app.add_middleware(WriteTrackingMiddleware)
+
+
+def warm_up() -> None:
+    """Check every replica once so a dead one is skipped from the first request"""
+    if READ_REPLICA_URLS:
+        replica_router().check_all()
+
+
+def stats() -> Dict[str, Any]:
+    return replica_router().stats()
+
+
+async def dispose() -> None:
+    if _router is not None:
+        for replica in _router.replicas:
+            await replica.dispose_async()
+
+
+def reset_after_fork() -> None:
+    if _router is not None:
+        for replica in _router.replicas:
+            replica.dispose(close=False)
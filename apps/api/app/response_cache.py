@@ -0,0 +1,267 @@
+"""
+Read-through cache for serialized deck responses.
+
+Building DeckWithFlashcards from ORM rows and dumping it to JSON is the bulk of
+the CPU cost of GET /decks/{deck_id}, while decks are read far more often than
+they change. Responses are cached as JSON bytes under (owner, deck, version):
+each deck has one slot, and an entry is only served when its stored version
+matches the version just read from the database, so a stale entry can never be
+returned even if an invalidation is missed (e.g. a write on another worker).
+Write handlers still call invalidate_deck so dead entries do not hold memory.
+
+The backend is pluggable:
+
+- memory (default): per-process LRU bounded by entry count and total bytes
+- redis: a shared store, for several workers to share one cache; needs the
+  optional `redis` package
+- local: the shared-store adapter over an in-process stand-in, to exercise
+  that path without a server
+- off: disables caching
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from fastapi import Response
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+# Only used by shared backends, which cannot see local memory pressure
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+
+class CacheBackend(ABC):
+    """Byte-string key/value store used by ResponseCache"""
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class NullBackend(CacheBackend):
+    name = "off"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """LRU bounded by both entry count and the total size of stored values"""
+    name = "memory"
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._data[key] = value
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes or len(self._data) > self.max_entries:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            value = self._data.pop(key, None)
+            if value is not None:
+                self._bytes -= len(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class KeyValueBackend(CacheBackend):
+    """Adapter for a shared store with a redis-style get/set(ex=)/delete client
+
+    Memory and eviction are managed by the store itself; entries expire after
+    `ttl` seconds so decks nobody reads again do not linger forever.
+    """
+    name = "shared"
+
+    def __init__(self, client, ttl: int, prefix: str = "promptly:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ttl": self.ttl, "prefix": self.prefix}
+
+
+class LocalKeyValueStore:
+    """In-process stand-in for a shared store client, for development and benchmarks"""
+
+    def __init__(self):
+        self._data: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None) -> None:
+        with self._lock:
+            self._data[key] = value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def scan_iter(self, match: str = "*"):
+        prefix = match.rstrip("*")
+        with self._lock:
+            return [key for key in self._data if key.startswith(prefix)]
+
+
+def _deck_key(owner_id: int, deck_id: int) -> str:
+    return f"deck:{owner_id}:{deck_id}"
+
+
+class ResponseCache:
+    """Versioned deck response cache on top of a CacheBackend"""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidations = 0
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_deck(self, owner_id: int, deck_id: int, version: int) -> Optional[bytes]:
+        entry = self.backend.get(_deck_key(owner_id, deck_id))
+        if entry is None:
+            self._count("misses")
+            return None
+        stored_version, _, body = entry.partition(b"\n")
+        if int(stored_version) != version:
+            self._count("stale")
+            self._count("misses")
+            return None
+        self._count("hits")
+        return body
+
+    def set_deck(self, owner_id: int, deck_id: int, version: int, body: bytes) -> None:
+        self.backend.set(_deck_key(owner_id, deck_id), b"%d\n" % version + body)
+
+    def invalidate_deck(self, owner_id: int, deck_id: int) -> None:
+        self.backend.delete(_deck_key(owner_id, deck_id))
+        self._count("invalidations")
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            counters = {
+                "backend": self.backend.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "invalidations": self.invalidations,
+            }
+        return {**counters, **self.backend.stats()}
+
+
+def create_backend(name: str = RESPONSE_CACHE_BACKEND) -> CacheBackend:
+    if name == "off":
+        return NullBackend()
+    if name == "memory":
+        return MemoryBackend(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRIES)
+    if name == "local":
+        return KeyValueBackend(LocalKeyValueStore(), RESPONSE_CACHE_TTL)
+    if name == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the 'redis' package") from e
+        return KeyValueBackend(redis.Redis.from_url(RESPONSE_CACHE_REDIS_URL), RESPONSE_CACHE_TTL)
+    raise RuntimeError(f"Unknown RESPONSE_CACHE_BACKEND {name!r}; expected memory, redis, local or off")
+
+
+deck_cache = ResponseCache(create_backend())
+
+
+def json_response(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def stats() -> Dict[str, Any]:
+    return {"deck_cache": deck_cache.stats()}
@@ -0,0 +1,250 @@
+import uuid
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, select, true, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..database import get_db
+from ..authenticate import get_current_user
+from ..instrumentation import TimedRoute
+from .. import db_models, schemas
+from .scheduler import (
+    DEFAULT_PARAMS, STATE_FIELDS, rescale_intervals, schedule_review_sequences,
+)
+
+router = APIRouter(prefix="/reviews", tags=["reviews"], route_class=TimedRoute)
+
+MAX_DUE_LIMIT = 200
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+@router.get("/due", response_model=List[schemas.DueCard])
+def get_due_cards(
+    limit: int = 20,
+    deck_id: Optional[int] = None,
+    include_new: int = 0,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Next cards due for review across the user's decks, most overdue first
+
+    Due cards come from the (user_id, due_at) index. include_new appends up to
+    that many never-reviewed cards after the due ones.
+    """
+    limit = max(1, min(limit, MAX_DUE_LIMIT))
+    include_new = max(0, min(include_new, MAX_DUE_LIMIT))
+    ReviewState, Flashcard, Deck = db_models.ReviewState, db_models.Flashcard, db_models.Deck
+
+    due_query = select(ReviewState, Flashcard).join(
+        Flashcard, Flashcard.id == ReviewState.flashcard_id
+    ).join(Deck, Deck.id == Flashcard.deck_id).where(
+        ReviewState.user_id == current_user.id,
+        ReviewState.due_at <= utcnow(),
+        Flashcard.is_active == true(),
+        Deck.is_active == true()
+    ).order_by(ReviewState.due_at).limit(limit)
+    if deck_id is not None:
+        due_query = due_query.where(Flashcard.deck_id == deck_id)
+    due = [{"flashcard": card, "review": state} for state, card in db.execute(due_query).all()]
+
+    if include_new:
+        new_query = select(Flashcard).join(Deck, Deck.id == Flashcard.deck_id).outerjoin(
+            ReviewState, ReviewState.flashcard_id == Flashcard.id
+        ).where(
+            Deck.owner_id == current_user.id,
+            Deck.is_active == true(),
+            Flashcard.is_active == true(),
+            ReviewState.flashcard_id.is_(None)
+        ).order_by(Flashcard.id).limit(include_new)
+        if deck_id is not None:
+            new_query = new_query.where(Flashcard.deck_id == deck_id)
+        due.extend({"flashcard": card, "review": None} for card in db.execute(new_query).scalars().all())
+
+    return due
+
+
+def apply_reviews(db: Session, user_id: int, reviews: List[schemas.ReviewBatchItem]):
+    """Record reviews and reschedule their cards in one transaction
+
+    Ownership of every card is checked with one joined query, reviews whose
+    review_id was already recorded are skipped, and all new schedules are
+    written with one bulk UPDATE (plus one bulk INSERT for first reviews).
+    Returns the per-review results and the new states of the cards.
+    """
+    ReviewState, ReviewLog = db_models.ReviewState, db_models.ReviewLog
+    flashcard_ids = {item.flashcard_id for item in reviews}
+    review_ids = {item.review_id for item in reviews}
+
+    owned_ids = set(db.execute(
+        select(db_models.Flashcard.id).join(db_models.Deck).where(
+            db_models.Flashcard.id.in_(flashcard_ids),
+            db_models.Deck.owner_id == user_id,
+            db_models.Flashcard.is_active == true()
+        )
+    ).scalars().all()) if flashcard_ids else set()
+    seen_ids = set(db.execute(
+        select(ReviewLog.review_id).where(
+            ReviewLog.user_id == user_id,
+            ReviewLog.review_id.in_(review_ids)
+        )
+    ).scalars().all()) if review_ids else set()
+
+    results, accepted = [], []
+    for item in reviews:
+        if item.review_id in seen_ids:
+            item_status = "duplicate"
+        elif item.flashcard_id not in owned_ids:
+            item_status = "not_found"
+        else:
+            item_status = "applied"
+            seen_ids.add(item.review_id)
+            accepted.append(item)
+        results.append(schemas.ReviewBatchItemResult(
+            review_id=item.review_id, flashcard_id=item.flashcard_id, status=item_status
+        ))
+
+    states = []
+    if accepted:
+        touched_ids = {item.flashcard_id for item in accepted}
+        existing = {
+            state.flashcard_id: state
+            for state in db.execute(select(ReviewState).where(ReviewState.flashcard_id.in_(touched_ids))).scalars()
+        }
+        current = {
+            flashcard_id: (
+                {field: getattr(existing[flashcard_id], field) for field in STATE_FIELDS}
+                if flashcard_id in existing
+                else {"ease": DEFAULT_PARAMS.initial_ease, "interval_days": 0.0, "repetitions": 0, "lapses": 0}
+            )
+            for flashcard_id in touched_ids
+        }
+        scheduled = schedule_review_sequences(
+            current, [(item.flashcard_id, item.grade, as_utc(item.reviewed_at)) for item in accepted]
+        )
+
+        updates = [{"flashcard_id": flashcard_id, **scheduled[flashcard_id]} for flashcard_id in touched_ids if flashcard_id in existing]
+        inserts = [
+            {"flashcard_id": flashcard_id, "user_id": user_id, **scheduled[flashcard_id]}
+            for flashcard_id in touched_ids if flashcard_id not in existing
+        ]
+        try:
+            db.execute(insert(ReviewLog), [
+                {
+                    "user_id": user_id,
+                    "review_id": item.review_id,
+                    "flashcard_id": item.flashcard_id,
+                    "grade": item.grade,
+                    "reviewed_at": as_utc(item.reviewed_at),
+                }
+                for item in accepted
+            ])
+            if updates:
+                db.execute(update(ReviewState), updates)
+            if inserts:
+                db.execute(insert(ReviewState), inserts)
+            db.commit()
+        except IntegrityError:
+            # A concurrent retry of the same reviews got there first
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Reviews are already being applied; retry to get their results"
+            )
+        states = [{"flashcard_id": flashcard_id, **scheduled[flashcard_id]} for flashcard_id in sorted(touched_ids)]
+
+    return results, states
+
+
+@router.post("/batch", response_model=schemas.ReviewBatchResponse)
+def submit_review_batch(
+    batch: schemas.ReviewBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Apply a batch of offline reviews in one transaction"""
+    results, states = apply_reviews(db, current_user.id, batch.reviews)
+    return schemas.ReviewBatchResponse(
+        applied=sum(result.status == "applied" for result in results),
+        duplicates=sum(result.status == "duplicate" for result in results),
+        not_found=sum(result.status == "not_found" for result in results),
+        results=results,
+        states=states,
+    )
+
+
+@router.post("/{flashcard_id}", response_model=schemas.ReviewStateResponse)
+def review_flashcard(
+    flashcard_id: int,
+    review: schemas.ReviewCreate,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Record one review and reschedule the card
+
+    Goes through the same path as /reviews/batch, so the review is logged and
+    a retry with the same review_id returns the card's state unchanged.
+    """
+    item = schemas.ReviewBatchItem(
+        review_id=review.review_id or uuid.uuid4().hex,
+        flashcard_id=flashcard_id,
+        grade=review.grade,
+        reviewed_at=review.reviewed_at or utcnow(),
+    )
+    results, states = apply_reviews(db, current_user.id, [item])
+    if states:
+        return states[0]
+    
+    state = db.get(db_models.ReviewState, flashcard_id) if results[0].status == "duplicate" else None
+    if state is None or state.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+    
+    return state
+
+
+@router.post("/deck/{deck_id}/reschedule")
+def reschedule_deck(
+    deck_id: int,
+    reschedule: schemas.RescheduleRequest,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Scale every scheduled interval in a deck in one batch"""
+    deck = db.query(db_models.Deck.id).filter(
+        db_models.Deck.id == deck_id,
+        db_models.Deck.owner_id == current_user.id,
+        db_models.Deck.is_active == true()
+    ).first()
+    
+    if not deck:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deck not found"
+        )
+    
+    ReviewState = db_models.ReviewState
+    rows = db.execute(
+        select(ReviewState.flashcard_id, ReviewState.interval_days, ReviewState.last_reviewed_at, ReviewState.due_at)
+        .join(db_models.Flashcard, db_models.Flashcard.id == ReviewState.flashcard_id)
+        .where(db_models.Flashcard.deck_id == deck_id, ReviewState.user_id == current_user.id)
+    ).all()
+    if rows:
+        flashcard_ids, intervals, reviewed, due = zip(*rows)
+        rescaled = rescale_intervals(intervals, reviewed, due, reschedule.interval_modifier)
+        # ORM bulk UPDATE by primary key: one executemany for the whole deck
+        db.execute(update(ReviewState), [
+            {"flashcard_id": flashcard_id, "interval_days": interval, "due_at": due_at}
+            for flashcard_id, interval, due_at in zip(flashcard_ids, rescaled["interval_days"], rescaled["due_at"])
+        ])
+        db.commit()
+    return {"message": "Deck rescheduled", "rescheduled": len(rows)}
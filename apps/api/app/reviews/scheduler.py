@@ -0,0 +1,130 @@
+"""
+SM-2 style spaced-repetition scheduler.
+
+The scheduler is a pure function over columns: every input is a sequence with
+one entry per card and every output is a list in the same order. Reviewing one
+card and recomputing a whole deck go through the same code, so batch callers
+never fall back to a per-card loop of queries.
+
+Grades follow SM-2: 0-2 are failed recalls (a lapse), 3 is correct with
+difficulty, 4 correct, 5 perfect.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+MIN_GRADE = 0
+MAX_GRADE = 5
+PASSING_GRADE = 3
+
+
+@dataclass(frozen=True)
+class SchedulerParams:
+    initial_ease: float = 2.5
+    min_ease: float = 1.3
+    # First two successful intervals, in days
+    first_interval: float = 1.0
+    second_interval: float = 6.0
+    # Interval after a lapse, in days
+    lapse_interval: float = 1.0
+    # Global multiplier applied to every computed interval
+    interval_modifier: float = 1.0
+    max_interval: float = 36500.0
+
+
+DEFAULT_PARAMS = SchedulerParams()
+
+
+def schedule_reviews(
+    ease: Sequence[float],
+    interval_days: Sequence[float],
+    repetitions: Sequence[int],
+    lapses: Sequence[int],
+    grades: Sequence[int],
+    reviewed_at: Sequence[datetime],
+    params: SchedulerParams = DEFAULT_PARAMS,
+) -> Dict[str, List]:
+    """Apply one review per card and return the new state columns"""
+    new_ease, new_interval, new_repetitions, new_lapses, due_at = [], [], [], [], []
+    for card_ease, card_interval, card_reps, card_lapses, grade, at in zip(
+        ease, interval_days, repetitions, lapses, grades, reviewed_at
+    ):
+        miss = MAX_GRADE - grade
+        updated_ease = max(params.min_ease, card_ease + 0.1 - miss * (0.08 + miss * 0.02))
+        if grade < PASSING_GRADE:
+            reps = 0
+            interval = params.lapse_interval
+            card_lapses += 1
+        else:
+            reps = card_reps + 1
+            if reps == 1:
+                interval = params.first_interval
+            elif reps == 2:
+                interval = params.second_interval
+            else:
+                interval = card_interval * updated_ease
+            interval = min(params.max_interval, interval * params.interval_modifier)
+        new_ease.append(updated_ease)
+        new_interval.append(interval)
+        new_repetitions.append(reps)
+        new_lapses.append(card_lapses)
+        due_at.append(at + timedelta(days=interval))
+    return {
+        "ease": new_ease,
+        "interval_days": new_interval,
+        "repetitions": new_repetitions,
+        "lapses": new_lapses,
+        "due_at": due_at,
+        "last_reviewed_at": list(reviewed_at),
+    }
+
+
+STATE_FIELDS = ("ease", "interval_days", "repetitions", "lapses")
+
+
+def schedule_review_sequences(
+    states: Dict[int, Dict],
+    reviews: Sequence[Tuple[int, int, datetime]],
+    params: SchedulerParams = DEFAULT_PARAMS,
+) -> Dict[int, Dict]:
+    """Apply (flashcard_id, grade, reviewed_at) reviews to per-card states
+
+    A card reviewed several times is updated in reviewed_at order. Round k
+    applies the k-th review of every card in one schedule_reviews call, so the
+    number of passes is the largest per-card review count, not the batch size.
+    """
+    sequences: Dict[int, List[Tuple[int, datetime]]] = {}
+    for flashcard_id, grade, reviewed_at in sorted(reviews, key=lambda review: review[2]):
+        sequences.setdefault(flashcard_id, []).append((grade, reviewed_at))
+
+    states = {flashcard_id: dict(state) for flashcard_id, state in states.items()}
+    depth = max((len(sequence) for sequence in sequences.values()), default=0)
+    for round_index in range(depth):
+        ids = [flashcard_id for flashcard_id, sequence in sequences.items() if len(sequence) > round_index]
+        columns = {field: [states[flashcard_id][field] for flashcard_id in ids] for field in STATE_FIELDS}
+        scheduled = schedule_reviews(
+            columns["ease"], columns["interval_days"], columns["repetitions"], columns["lapses"],
+            [sequences[flashcard_id][round_index][0] for flashcard_id in ids],
+            [sequences[flashcard_id][round_index][1] for flashcard_id in ids],
+            params,
+        )
+        for position, flashcard_id in enumerate(ids):
+            for field, values in scheduled.items():
+                states[flashcard_id][field] = values[position]
+    return states
+
+
+def rescale_intervals(
+    interval_days: Sequence[float],
+    last_reviewed_at: Sequence[Optional[datetime]],
+    due_at: Sequence[datetime],
+    factor: float,
+    params: SchedulerParams = DEFAULT_PARAMS,
+) -> Dict[str, List]:
+    """Scale existing intervals, e.g. after changing interval_modifier, keeping review history"""
+    new_interval, new_due = [], []
+    for interval, reviewed, due in zip(interval_days, last_reviewed_at, due_at):
+        scaled = min(params.max_interval, interval * factor)
+        new_interval.append(scaled)
+        new_due.append(reviewed + timedelta(days=scaled) if reviewed is not None else due)
+    return {"interval_days": new_interval, "due_at": new_due}
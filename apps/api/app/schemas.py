@@ -1,6 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional, Union
 
 
 class FlashcardBase(BaseModel):
@@ -17,6 +17,22 @@ class FlashcardUpdate(BaseModel):
     back: Optional[str] = None
 
 
+class FlashcardImportError(BaseModel):
+    row: int
+    error: str
+
+
+class FlashcardImportResult(BaseModel):
+    deck_id: int
+    format: str
+    dry_run: bool
+    received: int
+    imported: int
+    failed: int
+    errors: List[FlashcardImportError] = []
+    errors_truncated: bool = False
+
+
 class DeckBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -31,6 +47,27 @@ class DeckUpdate(BaseModel):
     description: Optional[str] = None
 
 
+class DeckCopyOptions(BaseModel):
+    # Copy deleted cards too; by default only active cards are copied
+    include_inactive: bool = False
+    # Only copy active cards matching this full-text query
+    q: Optional[str] = None
+    # Copy each (front, back) pair once, and skip pairs the target already has
+    dedupe: bool = False
+
+
+class DeckCloneRequest(DeckCopyOptions):
+    # Defaults to "<source name> (copy)" and the source description
+    name: Optional[str] = Field(default=None, max_length=255)
+    description: Optional[str] = None
+
+
+class DeckMergeRequest(DeckCopyOptions):
+    source_deck_ids: List[int] = Field(min_length=1, max_length=100)
+    # Soft-delete the source decks once their cards are merged
+    delete_sources: bool = False
+
+
 class UserBase(BaseModel):
     email: str
     name: str
@@ -51,6 +88,10 @@ class FlashcardResponse(FlashcardBase):
     updated_at: Optional[datetime] = None
 
 
+class FlashcardSearchResult(FlashcardResponse):
+    rank: float
+
+
 class DeckResponse(DeckBase):
     model_config = ConfigDict(from_attributes=True)
     
@@ -71,15 +112,145 @@ class UserResponse(UserBase):
     updated_at: Optional[datetime] = None
 
 
+class ReviewCreate(BaseModel):
+    grade: int = Field(ge=0, le=5)
+    reviewed_at: Optional[datetime] = None
+    # Client-generated id, as in batches; resubmitting the same id is a no-op
+    review_id: Optional[str] = Field(default=None, min_length=1, max_length=64)
+
+
+class RescheduleRequest(BaseModel):
+    interval_modifier: float = Field(gt=0)
+
+
+class ReviewStateResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    flashcard_id: int
+    ease: float
+    interval_days: float
+    repetitions: int
+    lapses: int
+    due_at: datetime
+    last_reviewed_at: Optional[datetime] = None
+
+
+class ReviewBatchItem(BaseModel):
+    # Client-generated id; resubmitting the same id is a no-op
+    review_id: str = Field(min_length=1, max_length=64)
+    flashcard_id: int
+    grade: int = Field(ge=0, le=5)
+    reviewed_at: datetime
+
+
+class ReviewBatchRequest(BaseModel):
+    reviews: List[ReviewBatchItem] = Field(max_length=1000)
+
+
+class ReviewBatchItemResult(BaseModel):
+    review_id: str
+    flashcard_id: int
+    # "applied", "duplicate" (already submitted) or "not_found"
+    status: str
+
+
+class ReviewBatchResponse(BaseModel):
+    applied: int
+    duplicates: int
+    not_found: int
+    results: List[ReviewBatchItemResult]
+    states: List[ReviewStateResponse]
+
+
+class DueCard(BaseModel):
+    flashcard: FlashcardResponse
+    # None for cards that have never been reviewed
+    review: Optional[ReviewStateResponse] = None
+
+
 # Complex schemas with relationships (for when you need them)
 class DeckWithFlashcards(DeckResponse):
     flashcards: List[FlashcardResponse] = []
 
 
+class DeckSummary(DeckResponse):
+    card_count: int = 0
+    last_modified_at: datetime
+    preview: List[FlashcardResponse] = []
+    # Only populated when the client asks for include=flashcards
+    flashcards: Optional[List[FlashcardResponse]] = None
+
+
 class UserWithDecks(UserResponse):
     decks: List[DeckResponse] = []
 
 
+class SyncDeck(DeckResponse):
+    change_seq: int
+
+
+class SyncFlashcard(FlashcardResponse):
+    change_seq: int
+
+
+class SyncTombstone(BaseModel):
+    """A deck or card deleted since the client's watermark"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    # Set for cards only
+    deck_id: Optional[int] = None
+    change_seq: int
+    deleted_at: Optional[datetime] = None
+
+
+class SyncResponse(BaseModel):
+    # Only non-empty fields are sent, so an idle sync is just the watermark
+    decks: List[SyncDeck] = []
+    flashcards: List[SyncFlashcard] = []
+    deleted_decks: List[SyncTombstone] = []
+    deleted_flashcards: List[SyncTombstone] = []
+    # The watermark predates compacted deletions; drop local state and apply this sync from scratch
+    reset: bool = False
+    # Set on the last page only; pass it as `since` next time
+    watermark: Optional[int] = None
+
+
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    type: Literal["deck", "flashcard"]
+    # update/delete: a server id, or the temp_id of a row created earlier in the batch
+    id: Optional[Union[int, str]] = None
+    # create: a client id that later operations use in place of the server id
+    temp_id: Optional[str] = Field(default=None, min_length=1, max_length=64)
+    # flashcard create: the card's deck, as a server id or a deck temp_id
+    deck_id: Optional[Union[int, str]] = None
+    # Fields of DeckCreate/DeckUpdate or FlashcardCreate/FlashcardUpdate
+    data: Dict[str, Any] = {}
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1, max_length=1000)
+    # "abort" applies nothing if any operation fails, "skip" applies the rest
+    on_error: Literal["abort", "skip"] = "abort"
+
+
+class BatchOperationResult(BaseModel):
+    index: int
+    # "applied", "not_found", "invalid", or "aborted" for valid operations of an aborted batch
+    status: str
+    # Server id of the row the operation wrote
+    id: Optional[int] = None
+    temp_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    applied: int
+    failed: int
+    results: List[BatchOperationResult]
+
+
 # Keep the original names for backward compatibility
 Flashcard = FlashcardResponse
 Deck = DeckResponse  
@@ -0,0 +1,82 @@
+"""
+Fast JSON serialization for read-heavy endpoints.
+
+The default response path builds ORM objects, validates them into Pydantic
+models with from_attributes and then dumps them, re-checking data that just
+came out of our own database. Endpoints that opt in instead select plain
+columns and hand the row mappings to a precompiled TypeAdapter over TypedDict
+mirrors of the response schemas, which serializes them straight to JSON bytes
+with no model instances in between.
+
+Routes keep their response_model, so the OpenAPI schema does not change; the
+output matches what the default path produces, including key order.
+Set FAST_SERIALIZATION=0 to validate rows through the real models again.
+"""
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import Table
+from typing_extensions import TypedDict
+
+from . import schemas
+from .instrumentation import timed
+
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "1") != "0"
+
+
+def _row_annotation(annotation):
+    """Replace response models inside an annotation with their TypedDict mirrors"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return row_type(annotation)
+    args = get_args(annotation)
+    if not args:
+        return annotation
+    origin = get_origin(annotation)
+    if origin is Union:
+        return Union[tuple(_row_annotation(arg) for arg in args)]
+    if origin is list:
+        return List[_row_annotation(args[0])]
+    return annotation
+
+
+@lru_cache(maxsize=None)
+def row_type(model: Type[BaseModel]):
+    """TypedDict with the same fields, in the same order, as `model`"""
+    return TypedDict(f"{model.__name__}Row", {
+        name: _row_annotation(field.annotation) for name, field in model.model_fields.items()
+    })
+
+
+class RowSerializer:
+    """Serialize row mappings shaped like `model` (or a list of them) to JSON bytes"""
+
+    def __init__(self, model: Type[BaseModel], many: bool = False):
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        self._fast = TypeAdapter(List[row_type(model)] if many else row_type(model))
+        self._validated = TypeAdapter(List[model] if many else model)
+
+    def columns(self, table: Table) -> list:
+        """The table's columns that appear in the schema, in schema order"""
+        return [table.c[name] for name in self.fields if name in table.c]
+
+    def record(self, row: Any, **extra: Any) -> Dict[str, Any]:
+        """Project a Row or mapping onto the schema fields, in schema order"""
+        mapping: Mapping = getattr(row, "_mapping", row)
+        return {name: extra[name] if name in extra else mapping[name] for name in self.fields}
+
+    def records(self, rows: Iterable[Any]) -> List[Dict[str, Any]]:
+        return [self.record(row) for row in rows]
+
+    def dump(self, data: Any) -> bytes:
+        with timed("serialize"):
+            if FAST_SERIALIZATION:
+                return self._fast.dump_json(data)
+            return self._validated.dump_json(self._validated.validate_python(data))
+
+
+flashcard_list_serializer = RowSerializer(schemas.FlashcardResponse, many=True)
+search_results_serializer = RowSerializer(schemas.FlashcardSearchResult, many=True)
+deck_detail_serializer = RowSerializer(schemas.DeckWithFlashcards)
@@ -0,0 +1,91 @@
+"""
+Application lifespan and process readiness.
+
+Importing main only defines the app: no database connections are opened and
+heavy libraries (jose, google-auth) load lazily. The lifespan handler below
+does the startup work instead, once per worker process, and records how long
+the process took to become ready and how much memory it holds so both can be
+tracked (see /internal/metrics and benchmarks/startup_profile.py).
+"""
+import asyncio
+import logging
+import os
+import resource
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from . import authenticate, compaction, database, replicas
+
+logger = logging.getLogger(__name__)
+
+# Open a connection during startup so a bad DATABASE_URL fails the deploy, not the first request
+STARTUP_DB_CHECK = os.getenv("STARTUP_DB_CHECK", "1") != "0"
+
+_process_started = time.perf_counter()
+_ready_ms: Optional[float] = None
+
+
+def mark_process_start() -> None:
+    """Restart the readiness clock, e.g. in a worker forked from a preloaded master"""
+    global _process_started, _ready_ms
+    _process_started = time.perf_counter()
+    _ready_ms = None
+
+
+def rss_mb() -> float:
+    """Current resident set size, falling back to the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def process_stats() -> Dict[str, Any]:
+    return {
+        "pid": os.getpid(),
+        "ready": _ready_ms is not None,
+        "ready_ms": _ready_ms,
+        "uptime_s": round(time.perf_counter() - _process_started, 1),
+        "rss_mb": rss_mb(),
+    }
+
+
+def _warm_up_sync() -> None:
+    authenticate.warm_up()
+    if STARTUP_DB_CHECK and database.DB_MODE == "sync":
+        with database.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    if STARTUP_DB_CHECK:
+        # A replica that is down only gets skipped; it does not fail startup
+        replicas.warm_up()
+
+
+async def _warm_up_async() -> None:
+    if STARTUP_DB_CHECK and database.DB_MODE == "async":
+        async with database.get_async_engine().connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global _ready_ms
+    await run_in_threadpool(_warm_up_sync)
+    await _warm_up_async()
+    _ready_ms = round((time.perf_counter() - _process_started) * 1000, 1)
+    logger.info("startup.ready pid=%s ready_ms=%s rss_mb=%s", os.getpid(), _ready_ms, rss_mb())
+    compaction_task = None
+    if compaction.COMPACTION_INTERVAL > 0:
+        compaction_task = asyncio.create_task(compaction.run_periodically())
+    yield
+    if compaction_task is not None:
+        compaction_task.cancel()
+    await database.dispose_engines()
+    await replicas.dispose()
+    logger.info("shutdown.complete pid=%s", os.getpid())
@@ -0,0 +1,161 @@
+"""
+Delta sync: the decks and cards a client is missing since its last sync.
+
+Every write to a user's decks and cards stamps the row with the user's next
+change number (db_models.advance_change_seqs), so GET /sync/?since=N returns
+exactly the rows written after change N: live rows in full and soft-deleted
+ones as tombstones. Cards of deleted decks are left out, since the deck's
+tombstone covers them. The last page carries the new watermark; a user with
+no changes gets back only the watermark.
+
+Pages run over decks first and then cards, each in (change_seq, id) order,
+and stop at the user's change number when the first page was served, so
+writes made while a client pages through land in its next sync instead. The
+X-Next-Cursor header continues a sync, as on the list endpoints.
+"""
+import base64
+import binascii
+from contextlib import ExitStack
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select, true, tuple_
+from sqlalchemy.orm import Session
+
+from ..authenticate import get_current_user
+from ..instrumentation import TimedRoute
+from ..database import SessionLocal, engine
+from ..pagination import NEXT_CURSOR_HEADER
+from ..replicas import get_read_db
+from .. import db_models, schemas
+
+router = APIRouter(prefix="/sync", tags=["sync"], route_class=TimedRoute)
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 1000
+_CURSOR_PREFIX = "v1:"
+PHASES = ("decks", "flashcards")
+
+# since, target, phase, last change_seq, last id
+SyncPosition = Tuple[int, int, int, int, int]
+
+
+def encode_cursor(position: SyncPosition) -> str:
+    raw = _CURSOR_PREFIX + ":".join(str(part) for part in position)
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> SyncPosition:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii")
+        if not raw.startswith(_CURSOR_PREFIX):
+            raise ValueError(raw)
+        since, target, phase, last_seq, last_id = (int(part) for part in raw[len(_CURSOR_PREFIX):].split(":"))
+        if phase not in range(len(PHASES)):
+            raise ValueError(raw)
+        return since, target, phase, last_seq, last_id
+    except (ValueError, UnicodeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _user_seqs(db: Session, user_id: int) -> Tuple[int, int]:
+    # Read fresh: the authenticated user may come from the auth cache
+    User = db_models.User
+    return tuple(db.execute(select(User.change_seq, User.sync_floor).where(User.id == user_id)).one())
+
+
+def _changes_query(phase: int, user_id: int, target: int, last_seq: int, last_id: Optional[int], limit: int):
+    """The next changes of a phase after (last_seq, last_id), or after change last_seq when last_id is None"""
+    Deck, Flashcard = db_models.Deck, db_models.Flashcard
+    model = Deck if phase == 0 else Flashcard
+    query = select(model)
+    if model is Deck:
+        query = query.where(Deck.owner_id == user_id)
+    else:
+        query = query.join(Deck, Deck.id == Flashcard.deck_id).where(
+            Deck.owner_id == user_id,
+            Deck.is_active == true()
+        )
+    if last_id is None:
+        query = query.where(model.change_seq > last_seq)
+    else:
+        query = query.where(tuple_(model.change_seq, model.id) > tuple_(last_seq, last_id))
+    return query.where(model.change_seq <= target).order_by(model.change_seq, model.id).limit(limit)
+
+
+@router.get("/", response_model=schemas.SyncResponse, response_model_exclude_unset=True)
+def sync_changes(
+    response: Response,
+    since: int = 0,
+    limit: int = DEFAULT_SYNC_LIMIT,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Decks and cards created, updated or deleted after change number `since`
+
+    Start with since=0 for a full sync and keep the returned watermark for
+    the next one. `reset` means the watermark was too old to replay (its
+    tombstones were compacted away): replace local state with this sync.
+    """
+    limit = max(1, min(limit, MAX_SYNC_LIMIT))
+    position = decode_cursor(cursor) if cursor else None
+    needed = position[1] if position else since
+
+    with ExitStack() as stack:
+        change_seq, sync_floor = _user_seqs(db, current_user.id)
+        if change_seq < needed and db.get_bind() is not engine:
+            # The replica has not caught up with what this client has seen
+            db = stack.enter_context(SessionLocal())
+            change_seq, sync_floor = _user_seqs(db, current_user.id)
+
+        result = schemas.SyncResponse()
+        if position is not None:
+            since, target, phase, last_seq, last_id = position
+        else:
+            target, phase, last_seq, last_id = change_seq, 0, since, None
+        if since > change_seq or 0 < since < sync_floor:
+            result.reset = True
+            since = 0
+            target, phase, last_seq, last_id = change_seq, 0, 0, None
+        if since == change_seq:
+            result.watermark = change_seq
+            return result
+
+        changes = {field: [] for field in ("decks", "flashcards", "deleted_decks", "deleted_flashcards")}
+        remaining = limit
+        while phase < len(PHASES):
+            rows = db.execute(_changes_query(phase, current_user.id, target, last_seq, last_id, remaining)).scalars().all()
+            for row in rows:
+                _add_change(changes, row)
+            if rows:
+                last_seq, last_id = rows[-1].change_seq, rows[-1].id
+                remaining -= len(rows)
+            if remaining == 0:
+                break
+            phase, last_seq, last_id = phase + 1, since, None
+
+        # Leave empty lists unset so response_model_exclude_unset drops them
+        for field, items in changes.items():
+            if items:
+                setattr(result, field, items)
+        if phase < len(PHASES):
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor((since, target, phase, last_seq, last_id))
+        else:
+            result.watermark = target
+        return result
+
+
+def _add_change(changes: dict, row) -> None:
+    if isinstance(row, db_models.Deck):
+        live_schema, field = schemas.SyncDeck, "decks"
+    else:
+        live_schema, field = schemas.SyncFlashcard, "flashcards"
+    if row.is_active:
+        changes[field].append(live_schema.model_validate(row))
+    else:
+        changes["deleted_" + field].append(schemas.SyncTombstone.model_validate(row))
@@ -0,0 +1 @@
+# Offline benchmarks for the API. Run from apps/api, e.g. `python -m benchmarks.bench_auth`
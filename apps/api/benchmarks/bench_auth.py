@@ -0,0 +1,70 @@
+"""
+Per-request authentication cost, before and after the auth cache.
+
+"uncached" replays the original get_current_user work on every call: HKDF
+expansion, JWE decrypt and a User lookup. "cached" calls get_current_user,
+which pays that cost once per token and then serves from the token cache.
+
+    python -m benchmarks.bench_auth --iterations 2000
+"""
+import argparse
+import json
+
+from benchmarks.common import (
+    create_schema, mint_token, seed_user, summarize, time_calls,
+)
+from hkdf import Hkdf
+from jose import jwe
+from starlette.requests import Request
+
+from app import auth_cache
+from app.authenticate import NEXTAUTH_SECRET, get_current_user
+from app.database import SessionLocal
+from app.db_models import User
+
+
+def uncached_auth(token: str, db):
+    key = Hkdf("", bytes(NEXTAUTH_SECRET, "utf-8")).expand(b"NextAuth.js Generated Encryption Key", 32)
+    payload = json.loads(jwe.decrypt(token, key))
+    return db.query(User).filter(User.google_id == payload["id"]).first()
+
+
+def make_request(token: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user()
+    token = mint_token(user.google_id)
+    request = make_request(token)
+
+    db = SessionLocal()
+    try:
+        auth_cache.token_cache.clear()
+        uncached = time_calls(lambda: uncached_auth(token, db), args.iterations)
+        cached = time_calls(lambda: get_current_user(request, db), args.iterations)
+    finally:
+        db.close()
+
+    before, after = summarize(uncached), summarize(cached)
+    print(json.dumps({
+        "benchmark": "auth",
+        "uncached": before,
+        "cached": after,
+        "speedup_p50": round(before["p50_ms"] / after["p50_ms"], 1) if after["p50_ms"] else None,
+        "auth_cache": auth_cache.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+A deck editing burst sent as individual requests versus one POST /batch/.
+
+Each round creates --creates cards, updates --updates and deletes --deletes
+existing ones in a deck, first one request per change through the flashcard
+routes and then as a single batch. Reports the latency of a whole round and
+the statements it runs.
+
+    python -m benchmarks.bench_batch --rounds 20
+"""
+import argparse
+import json
+
+from benchmarks.bench_pagination import seed_deck
+from benchmarks.bench_user_sync import StatementCounter
+from benchmarks.common import auth_headers, create_schema, seed_user, summarize, time_calls
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--creates", type=int, default=20)
+    parser.add_argument("--updates", type=int, default=20)
+    parser.add_argument("--deletes", type=int, default=10)
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user("batch-user")
+    headers = auth_headers(user.google_id)
+    client = TestClient(app)
+    # Enough cards for every round to update and delete its own
+    deck_id = seed_deck(user.id, 2 * args.rounds * (args.updates + args.deletes) + 10)
+    card_ids = iter(card["id"] for card in client.get(
+        f"/flashcards/deck/{deck_id}", params={"limit": 100000}, headers=headers
+    ).json())
+
+    def next_round():
+        return [next(card_ids) for _ in range(args.updates)], [next(card_ids) for _ in range(args.deletes)]
+
+    def individual():
+        updates, deletes = next_round()
+        for i in range(args.creates):
+            client.post(f"/flashcards/deck/{deck_id}", json={"front": f"new {i}", "back": "b"},
+                        headers=headers).raise_for_status()
+        for card_id in updates:
+            client.put(f"/flashcards/{card_id}", json={"back": "edited"}, headers=headers).raise_for_status()
+        for card_id in deletes:
+            client.delete(f"/flashcards/{card_id}", headers=headers).raise_for_status()
+
+    def batched():
+        updates, deletes = next_round()
+        operations = [
+            {"op": "create", "type": "flashcard", "deck_id": deck_id, "data": {"front": f"new {i}", "back": "b"}}
+            for i in range(args.creates)
+        ]
+        operations += [{"op": "update", "type": "flashcard", "id": card_id, "data": {"back": "edited"}}
+                       for card_id in updates]
+        operations += [{"op": "delete", "type": "flashcard", "id": card_id} for card_id in deletes]
+        response = client.post("/batch/", json={"operations": operations}, headers=headers)
+        response.raise_for_status()
+        assert response.json()["failed"] == 0
+
+    counter = StatementCounter()
+    results = {}
+    for name, fn in (("individual", individual), ("batch", batched)):
+        results[name] = {**summarize(time_calls(fn, args.rounds - 1)), "statements_per_round": counter.per_call(fn, 1)}
+
+    print(json.dumps({
+        "benchmark": "batch",
+        "operations_per_round": args.creates + args.updates + args.deletes,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
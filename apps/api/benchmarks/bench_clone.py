@@ -0,0 +1,70 @@
+"""
+Cloning and merging a large deck server-side versus re-posting every card.
+
+"client_copy" times --sample cards read from GET /flashcards/deck/{deck_id}
+and re-created one POST at a time, then extrapolates to the whole deck (the
+only way to copy a deck before the clone endpoint). The server-side rows each
+time one request: a plain clone, a deduplicated clone, and a deduplicated
+merge of the deck into its own clone (every card is a duplicate, so this is
+the worst case for the anti-join).
+
+    python -m benchmarks.bench_clone --cards 50000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.bench_pagination import seed_deck
+from benchmarks.common import auth_headers, create_schema, seed_user
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+def timed_request(send) -> dict:
+    started = time.perf_counter()
+    response = send()
+    response.raise_for_status()
+    return {"ms": round((time.perf_counter() - started) * 1000, 1), "card_count": response.json()["card_count"],
+            "deck_id": response.json()["id"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, default=50000)
+    parser.add_argument("--sample", type=int, default=200, help="cards re-posted to estimate the client-side copy")
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user("clone-user")
+    deck_id = seed_deck(user.id, args.cards)
+    headers = auth_headers(user.google_id)
+    client = TestClient(app)
+
+    target = client.post("/decks/", json={"name": "client copy"}, headers=headers).json()["id"]
+    started = time.perf_counter()
+    cards = client.get(f"/flashcards/deck/{deck_id}", params={"limit": args.sample}, headers=headers).json()
+    for card in cards:
+        client.post(f"/flashcards/deck/{target}", json={"front": card["front"], "back": card["back"]},
+                    headers=headers).raise_for_status()
+    per_card_ms = (time.perf_counter() - started) * 1000 / len(cards)
+
+    clone = timed_request(lambda: client.post(f"/decks/{deck_id}/clone", json={}, headers=headers))
+    dedupe = timed_request(lambda: client.post(f"/decks/{deck_id}/clone", json={"dedupe": True}, headers=headers))
+    merge = timed_request(lambda: client.post(
+        f"/decks/{clone['deck_id']}/merge", json={"source_deck_ids": [deck_id], "dedupe": True}, headers=headers
+    ))
+
+    print(json.dumps({
+        "benchmark": "clone",
+        "cards": args.cards,
+        "client_copy": {"requests": args.cards + 1, "estimated_ms": round(per_card_ms * args.cards, 1),
+                        "per_card_ms": round(per_card_ms, 3)},
+        "clone": clone,
+        "clone_dedupe": dedupe,
+        "merge_dedupe_all_duplicates": merge,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Hot-path latency as deletion history grows, before and after compaction.
+
+Seeds a deck with --live cards plus --deleted cards soft-deleted beyond the
+retention window, times the deck and card listing endpoints, runs
+compaction and times them again. GET /decks/{deck_id} still returns deleted
+cards, so it carries the whole history until compaction moves it out. The
+response cache is turned off so every call reaches the database.
+
+    python -m benchmarks.bench_compaction --live 1000 --deleted 50000
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+
+from benchmarks.common import auth_headers, create_schema, seed_user, summarize, time_calls  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app import compaction  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.db_models import Deck, Flashcard  # noqa: E402
+from main import app  # noqa: E402
+
+
+def seed_deck(owner_id: int, live: int, deleted: int) -> int:
+    deleted_at = datetime.now(timezone.utc) - timedelta(days=compaction.SOFT_DELETE_RETENTION_DAYS + 1)
+    db = SessionLocal()
+    try:
+        deck = Deck(name="compaction benchmark", owner_id=owner_id)
+        db.add(deck)
+        db.commit()
+        rows = [
+            {"front": f"front {i}", "back": f"back {i}", "deck_id": deck.id, "is_active": i < live,
+             "deleted_at": None if i < live else deleted_at}
+            for i in range(live + deleted)
+        ]
+        for start in range(0, len(rows), 10000):
+            db.execute(insert(Flashcard), rows[start:start + 10000])
+        db.commit()
+        return deck.id
+    finally:
+        db.close()
+
+
+def flashcard_rows() -> int:
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).select_from(Flashcard)).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", type=int, default=1000)
+    parser.add_argument("--deleted", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=compaction.COMPACTION_BATCH_SIZE)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user("compaction-user")
+    deck_id = seed_deck(user.id, args.live, args.deleted)
+    headers = auth_headers(user.google_id)
+    client = TestClient(app)
+
+    def measure():
+        return {
+            "deck_detail": summarize(time_calls(
+                lambda: client.get(f"/decks/{deck_id}", headers=headers).raise_for_status(), args.iterations
+            )),
+            "card_listing": summarize(time_calls(
+                lambda: client.get(f"/flashcards/deck/{deck_id}", headers=headers).raise_for_status(), args.iterations
+            )),
+        }
+
+    rows_before = flashcard_rows()
+    before = measure()
+    # No pause between batches: this measures the work, not the pacing
+    report = compaction.Compactor(batch_size=args.batch_size, pause=0).run()
+    after = measure()
+
+    print(json.dumps({
+        "benchmark": "compaction",
+        "live_cards": args.live,
+        "deleted_cards": args.deleted,
+        "flashcard_rows": {"before": rows_before, "after": flashcard_rows()},
+        "before": before,
+        "after": after,
+        "deck_detail_speedup_p50": round(before["deck_detail"]["p50_ms"] / after["deck_detail"]["p50_ms"], 1),
+        "compaction": report.as_dict(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
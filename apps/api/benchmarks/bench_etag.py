@@ -0,0 +1,46 @@
+"""
+Latency of a full GET /decks/{deck_id} and GET /flashcards/deck/{deck_id}
+against the same requests revalidated with If-None-Match (304).
+
+    python -m benchmarks.bench_etag --cards 5000 --iterations 50
+"""
+import argparse
+import json
+
+from benchmarks.common import auth_headers, create_schema, seed_user, summarize, time_calls
+from benchmarks.bench_pagination import seed_deck
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user("etag-user")
+    deck_id = seed_deck(user.id, args.cards)
+    headers = auth_headers(user.google_id)
+    client = TestClient(app)
+
+    results = {}
+    for name, url in (("deck", f"/decks/{deck_id}"), ("cards", f"/flashcards/deck/{deck_id}?limit=1000")):
+        full = client.get(url, headers=headers)
+        full.raise_for_status()
+        conditional = {**headers, "If-None-Match": full.headers["ETag"]}
+
+        def revalidate():
+            response = client.get(url, headers=conditional)
+            assert response.status_code == 304, response.status_code
+
+        results[f"{name}_full"] = summarize(time_calls(lambda: client.get(url, headers=headers).raise_for_status(), args.iterations))
+        results[f"{name}_full"]["bytes"] = len(full.content)
+        results[f"{name}_not_modified"] = summarize(time_calls(revalidate, args.iterations))
+    print(json.dumps({"benchmark": "etag", "cards": args.cards, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Google ID token verification, before and after the certificate cache.
+
+Tokens are signed with a locally generated key whose certificate is served
+by a local HTTP server (with Cache-Control: max-age, like Google's endpoint).
+"uncached" replays the original verify_google_token: a fresh transport and a
+certificate download on every call. "cached" goes through google_certs,
+which downloads once. A burst of concurrent cold verifications checks that
+only one download happens.
+
+    python -m benchmarks.bench_google_verify --iterations 2000
+"""
+import argparse
+import datetime
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.common import summarize, time_calls
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
+
+from app import google_certs
+
+AUDIENCE = "bench-client-id.apps.googleusercontent.com"
+KEY_ID = "bench-key"
+
+
+def generate_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+    return private_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def mint_id_token(private_pem: bytes) -> str:
+    signer = crypt.RSASigner.from_string(private_pem, key_id=KEY_ID)
+    now = int(time.time())
+    payload = {"iss": "https://accounts.google.com", "aud": AUDIENCE, "sub": "bench-google-id",
+               "email": "bench@example.com", "iat": now, "exp": now + 3600}
+    return jwt.encode(signer, payload).decode()
+
+
+def serve_certs(certs: dict):
+    body = json.dumps(certs).encode()
+    fetches = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            fetches.append(time.monotonic())
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "public, max-age=21600, must-revalidate")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/certs", fetches
+
+
+def uncached_verify(token: str, url: str):
+    return id_token.verify_token(token, google_requests.Request(), AUDIENCE, certs_url=url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    private_pem, cert_pem = generate_key()
+    token = mint_id_token(private_pem)
+    server, url, fetches = serve_certs({KEY_ID: cert_pem})
+    try:
+        uncached = time_calls(lambda: uncached_verify(token, url), args.iterations)
+        uncached_fetches = len(fetches)
+
+        # Cold cache hit by a burst of concurrent requests: one fetch, everyone else waits for it
+        fetches.clear()
+        verifier = google_certs.configure(google_certs.HttpCertSource(url), audience=AUDIENCE)
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(lambda _: verifier.verify(token), range(args.concurrency)))
+        cold_burst_fetches = len(fetches)
+
+        cached = time_calls(lambda: verifier.verify(token), args.iterations)
+        cached_fetches = len(fetches)
+    finally:
+        server.shutdown()
+
+    before, after = summarize(uncached), summarize(cached)
+    print(json.dumps({
+        "benchmark": "google_verify",
+        "uncached": {**before, "cert_fetches": uncached_fetches},
+        "cached": {**after, "cert_fetches": cached_fetches},
+        "cold_burst": {"concurrent_verifications": args.concurrency, "cert_fetches": cold_burst_fetches},
+        "speedup_p50": round(before["p50_ms"] / after["p50_ms"], 1) if after["p50_ms"] else None,
+        "google_certs": google_certs.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
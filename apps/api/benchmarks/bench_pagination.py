@@ -0,0 +1,73 @@
+"""
+Latency of GET /flashcards/deck/{deck_id} at page 1 and page 1000 of a
+100k-card deck, with skip/limit and with cursor pagination.
+
+    python -m benchmarks.bench_pagination --cards 100000 --iterations 20
+"""
+import argparse
+import json
+
+from benchmarks.common import auth_headers, create_schema, seed_user, summarize, time_calls
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.db_models import Deck, Flashcard
+from app.pagination import encode_cursor
+from main import app
+
+
+def seed_deck(owner_id: int, cards: int) -> int:
+    db = SessionLocal()
+    try:
+        deck = Deck(name="pagination benchmark", owner_id=owner_id)
+        db.add(deck)
+        db.commit()
+        rows = [{"front": f"front {i}", "back": f"back {i}", "deck_id": deck.id, "is_active": True} for i in range(cards)]
+        for start in range(0, cards, 10000):
+            db.execute(insert(Flashcard), rows[start:start + 10000])
+        db.commit()
+        return deck.id
+    finally:
+        db.close()
+
+
+def id_at_offset(deck_id: int, offset: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Flashcard.id).filter(Flashcard.deck_id == deck_id).order_by(Flashcard.id).offset(offset).limit(1).scalar()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--deep-page", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user("pagination-user")
+    deck_id = seed_deck(user.id, args.cards)
+    headers = auth_headers(user.google_id)
+    client = TestClient(app)
+    url = f"/flashcards/deck/{deck_id}"
+    deep_offset = (args.deep_page - 1) * args.page_size
+    deep_cursor = encode_cursor(id_at_offset(deck_id, deep_offset - 1))
+
+    def fetch(params):
+        return lambda: client.get(url, params={"limit": args.page_size, **params}, headers=headers).raise_for_status()
+
+    results = {
+        "offset_page_1": summarize(time_calls(fetch({"skip": 0}), args.iterations)),
+        f"offset_page_{args.deep_page}": summarize(time_calls(fetch({"skip": deep_offset}), args.iterations)),
+        "cursor_page_1": summarize(time_calls(fetch({}), args.iterations)),
+        f"cursor_page_{args.deep_page}": summarize(time_calls(fetch({"cursor": deep_cursor}), args.iterations)),
+    }
+    print(json.dumps({"benchmark": "pagination", "cards": args.cards, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Rate limiter overhead per request, and a noisy client with and without it.
+
+"overhead" times limiter.check() alone for each store, then GET /decks/
+end to end with the limiter off and on (limits high enough that nothing is
+rejected). "noisy_neighbour" has one user poll GET /decks/ from --threads
+threads while another user makes --quiet-requests reads paced under the
+limits, first without a limiter and then with the default limits, and
+reports the quiet user's latency and how many of the noisy user's requests
+were served.
+
+    python -m benchmarks.bench_rate_limit --requests 1000
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import auth_headers, create_schema, seed_user, summarize, time_calls
+from fastapi.testclient import TestClient
+
+from app import rate_limit
+from app.rate_limit import Limit, RateLimiter, create_store
+from main import app
+
+UNLIMITED = {"user_limit": Limit(1e9, 10 ** 9), "route_limit": Limit(1e9, 10 ** 9), "route_limits": {}}
+# Under the default per-route limit of 10 requests per second
+QUIET_PAUSE = 0.15
+
+
+def noisy_neighbour(client, quiet_headers, noisy_headers, requests: int, threads: int) -> dict:
+    stop = threading.Event()
+    noisy_codes = []
+
+    def poll():
+        while not stop.is_set():
+            noisy_codes.append(client.get("/decks/", headers=noisy_headers).status_code)
+
+    samples = []
+    with ThreadPoolExecutor(threads) as pool:
+        for _ in range(threads):
+            pool.submit(poll)
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                client.get("/decks/", headers=quiet_headers).raise_for_status()
+                samples.append(time.perf_counter() - started)
+                time.sleep(QUIET_PAUSE)
+        finally:
+            stop.set()
+    return {
+        "quiet_user": summarize(samples),
+        "noisy_requests": len(noisy_codes),
+        "noisy_served": noisy_codes.count(200),
+        "noisy_limited": noisy_codes.count(429),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--quiet-requests", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    create_schema()
+    quiet_headers = auth_headers(seed_user("quiet-user").google_id)
+    noisy_headers = auth_headers(seed_user("noisy-user").google_id)
+    client = TestClient(app)
+
+    overhead = {}
+    for backend in ("off", "memory", "local"):
+        rate_limit.limiter = RateLimiter(create_store(backend), **UNLIMITED)
+        check = summarize(time_calls(lambda: rate_limit.limiter.check(1, "GET /decks/"), args.requests * 10))
+        request = summarize(time_calls(lambda: client.get("/decks/", headers=quiet_headers).raise_for_status(),
+                                       args.requests))
+        overhead[backend] = {"check": check, "request": request}
+
+    rate_limit.limiter = RateLimiter(create_store("off"))
+    unlimited = noisy_neighbour(client, quiet_headers, noisy_headers, args.quiet_requests, args.threads)
+    rate_limit.limiter = RateLimiter(create_store("memory"))
+    limited = noisy_neighbour(client, quiet_headers, noisy_headers, args.quiet_requests, args.threads)
+
+    print(json.dumps({
+        "benchmark": "rate_limit",
+        "overhead": overhead,
+        "noisy_neighbour": {"no_limit": unlimited, "default_limits": limited},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
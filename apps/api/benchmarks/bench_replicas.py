@@ -0,0 +1,98 @@
+"""
+Read routing across two replica files: spread, overhead and stickiness.
+
+The replicas are SQLite copies of the benchmark database, so this measures
+the routing itself rather than any offload: how reads spread over the
+replicas with each selection policy, what the routing costs per request
+against reading from the primary, and how many reads stickiness keeps on
+the primary when --write-ratio of the users' requests are writes. --users
+users each read one deck from --threads threads. The response cache is off
+so every read reaches a database.
+
+    python -m benchmarks.bench_replicas --requests 2000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+
+from benchmarks.bench_pagination import seed_deck  # noqa: E402
+from benchmarks.common import auth_headers, create_schema, seed_user, summarize, time_calls  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import replicas  # noqa: E402
+from app.database import engine  # noqa: E402
+from main import app  # noqa: E402
+
+
+def copy_database(path: str) -> str:
+    source, target = sqlite3.connect(engine.url.database), sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    target.close()
+    return f"sqlite:///{path}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    create_schema()
+    users = []
+    for i in range(args.users):
+        user = seed_user(f"replica-user-{i}")
+        users.append((auth_headers(user.google_id), seed_deck(user.id, args.cards)))
+    directory = os.path.dirname(engine.url.database)
+    replica_urls = [copy_database(os.path.join(directory, f"replica-{i}.db")) for i in range(2)]
+    client = TestClient(app)
+
+    def read(rng=random):
+        headers, deck_id = rng.choice(users)
+        client.get(f"/flashcards/deck/{deck_id}", headers=headers).raise_for_status()
+
+    def mixed(_):
+        headers, deck_id = random.choice(users)
+        if random.random() < args.write_ratio:
+            client.post(f"/flashcards/deck/{deck_id}", json={"front": "f", "back": "b"},
+                        headers=headers).raise_for_status()
+        else:
+            client.get(f"/flashcards/deck/{deck_id}", headers=headers).raise_for_status()
+
+    results = {}
+    for name, urls, selection in (
+        ("primary_only", [], "round_robin"),
+        ("round_robin", replica_urls, "round_robin"),
+        ("least_connections", replica_urls, "least_connections"),
+    ):
+        replicas.configure(urls, selection=selection)
+        latency = summarize(time_calls(read, args.requests // 4))
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(lambda _: read(), range(args.requests)))
+        stats = replicas.stats()
+        results[name] = {
+            "latency": latency,
+            "reads": stats["reads"],
+            "per_replica": [replica["selected"] for replica in stats["replicas"]],
+        }
+
+    replicas.configure(replica_urls)
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(mixed, range(args.requests)))
+    results["with_writes"] = {"write_ratio": args.write_ratio, "reads": replicas.stats()["reads"]}
+    replicas.configure([])
+
+    print(json.dumps({"benchmark": "replicas", "users": args.users, "cards": args.cards, "results": results},
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
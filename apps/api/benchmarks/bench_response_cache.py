@@ -0,0 +1,43 @@
+"""
+Latency of GET /decks/{deck_id} for a large deck with the response cache
+cold (cleared before every request) and warm.
+
+    python -m benchmarks.bench_response_cache --cards 5000 --iterations 50
+"""
+import argparse
+import json
+
+from benchmarks.common import auth_headers, create_schema, seed_user, summarize, time_calls
+from benchmarks.bench_pagination import seed_deck
+from fastapi.testclient import TestClient
+
+from app.response_cache import deck_cache
+from main import app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user("response-cache-user")
+    deck_id = seed_deck(user.id, args.cards)
+    headers = auth_headers(user.google_id)
+    client = TestClient(app)
+    url = f"/decks/{deck_id}"
+
+    def cold():
+        deck_cache.clear()
+        client.get(url, headers=headers).raise_for_status()
+
+    results = {
+        "cold": summarize(time_calls(cold, args.iterations)),
+        "warm": summarize(time_calls(lambda: client.get(url, headers=headers).raise_for_status(), args.iterations)),
+    }
+    print(json.dumps({"benchmark": "response_cache", "cards": args.cards, "results": results, "cache": deck_cache.stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
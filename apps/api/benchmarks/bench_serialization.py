@@ -0,0 +1,92 @@
+"""
+Per-endpoint cost of building the JSON body: the default path (ORM objects
+validated through the response model with from_attributes, then encoded the
+way FastAPI does) against the column-select + RowSerializer fast path.
+
+    python -m benchmarks.bench_serialization --cards 5000 --iterations 20
+"""
+import argparse
+import json
+from typing import List
+
+from benchmarks.common import create_schema, seed_user, summarize, time_calls
+from benchmarks.bench_pagination import seed_deck
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from app import db_models, schemas
+from app.database import SessionLocal
+from app.decks.detail import deck_cards_query, deck_row_query, serialize_deck_detail
+from app.flashcards.search import search_query
+from app.serialization import flashcard_list_serializer, search_results_serializer
+
+
+def default_path(model, data) -> bytes:
+    adapter = TypeAdapter(model)
+    content = jsonable_encoder(adapter.dump_python(adapter.validate_python(data, from_attributes=True), mode="json"))
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user("serialization-user")
+    deck_id = seed_deck(user.id, args.cards)
+    db = SessionLocal()
+    Flashcard = db_models.Flashcard
+    dialect = db.get_bind().dialect.name
+
+    def list_default():
+        cards = db.query(Flashcard).filter(Flashcard.deck_id == deck_id).order_by(Flashcard.id).limit(args.page_size).all()
+        return default_path(List[schemas.FlashcardResponse], cards)
+
+    def list_fast():
+        rows = db.execute(
+            select(*flashcard_list_serializer.columns(Flashcard.__table__))
+            .where(Flashcard.deck_id == deck_id).order_by(Flashcard.id).limit(args.page_size)
+        ).all()
+        return flashcard_list_serializer.dump(flashcard_list_serializer.records(rows))
+
+    def deck_default():
+        deck = db.query(db_models.Deck).options(joinedload(db_models.Deck.flashcards)).filter(
+            db_models.Deck.id == deck_id
+        ).first()
+        return default_path(schemas.DeckWithFlashcards, deck)
+
+    def deck_fast():
+        return serialize_deck_detail(db.execute(deck_row_query(deck_id)).first(), db.execute(deck_cards_query(deck_id)).all())
+
+    search = search_query(dialect, user.id, "front", 0, 100)
+
+    def search_default():
+        return default_path(List[schemas.FlashcardSearchResult], [row._mapping for row in db.execute(search).all()])
+
+    def search_fast():
+        return search_results_serializer.dump(search_results_serializer.records(db.execute(search).all()))
+
+    endpoints = {
+        "GET /flashcards/deck/{deck_id}": (list_default, list_fast),
+        "GET /decks/{deck_id}": (deck_default, deck_fast),
+        "GET /flashcards/search": (search_default, search_fast),
+    }
+    results = {}
+    for endpoint, (default, fast) in endpoints.items():
+        assert json.loads(default()) == json.loads(fast()), endpoint
+        # Evict loaded objects between runs so the ORM path pays for identity-map population
+        results[endpoint] = {
+            "default": summarize(time_calls(lambda: (default(), db.expunge_all()), args.iterations)),
+            "fast": summarize(time_calls(lambda: (fast(), db.expunge_all()), args.iterations)),
+        }
+    db.close()
+    print(json.dumps({"benchmark": "serialization", "cards": args.cards, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
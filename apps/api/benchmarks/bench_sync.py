@@ -0,0 +1,107 @@
+"""
+Refreshing a client with GET /sync/ versus re-downloading every deck.
+
+"full_download" is GET /decks/?include=flashcards for --decks decks of
+--cards cards each, the only way to refresh before delta sync. "initial_sync"
+pages GET /sync/ from since=0 with the default page size, "idle" syncs from
+the current watermark with nothing changed, and "one_card_changed" syncs
+after editing a single card. Each reports the response bytes and latency.
+
+    python -m benchmarks.bench_sync --decks 20 --cards 500
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import auth_headers, create_schema, seed_user, summarize, time_calls
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.db_models import Deck, Flashcard, advance_change_seqs
+from main import app
+
+
+def seed_decks(owner_id: int, decks: int, cards: int) -> list:
+    db = SessionLocal()
+    try:
+        deck_ids = []
+        for d in range(decks):
+            deck = Deck(name=f"sync benchmark {d}", owner_id=owner_id)
+            db.add(deck)
+            db.flush()
+            # Stamp the cards like the importer does
+            change_seq = advance_change_seqs(db, [owner_id])[owner_id]
+            db.execute(insert(Flashcard), [
+                {"front": f"front {i}", "back": f"back {i}", "deck_id": deck.id, "is_active": True,
+                 "change_seq": change_seq}
+                for i in range(cards)
+            ])
+            deck_ids.append(deck.id)
+        db.commit()
+        return deck_ids
+    finally:
+        db.close()
+
+
+def sync_all(client, headers, since: int = 0):
+    """Follow X-Next-Cursor to the end; returns (watermark, total bytes, pages)"""
+    response = client.get("/sync/", params={"since": since}, headers=headers)
+    size, pages = len(response.content), 1
+    while "X-Next-Cursor" in response.headers:
+        response = client.get("/sync/", params={"cursor": response.headers["X-Next-Cursor"]}, headers=headers)
+        size, pages = size + len(response.content), pages + 1
+    response.raise_for_status()
+    return response.json()["watermark"], size, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--decks", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user("sync-bench-user")
+    deck_ids = seed_decks(user.id, args.decks, args.cards)
+    headers = auth_headers(user.google_id)
+    client = TestClient(app)
+
+    def full_download():
+        response = client.get("/decks/", params={"include": "flashcards"}, headers=headers)
+        response.raise_for_status()
+        return response
+
+    full_bytes = len(full_download().content)
+    full = summarize(time_calls(full_download, args.iterations))
+
+    started = time.perf_counter()
+    watermark, initial_bytes, pages = sync_all(client, headers)
+    initial_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    idle = summarize(time_calls(lambda: client.get("/sync/", params={"since": watermark}, headers=headers),
+                                args.iterations))
+    idle_bytes = len(client.get("/sync/", params={"since": watermark}, headers=headers).content)
+
+    card_id = client.get(f"/flashcards/deck/{deck_ids[0]}", params={"limit": 1}, headers=headers).json()[0]["id"]
+    changed = []
+    for i in range(args.iterations):
+        client.put(f"/flashcards/{card_id}", json={"back": f"edited {i}"}, headers=headers).raise_for_status()
+        started = time.perf_counter()
+        watermark, changed_bytes, _ = sync_all(client, headers, watermark)
+        changed.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        "benchmark": "sync",
+        "decks": args.decks,
+        "cards_per_deck": args.cards,
+        "full_download": {"bytes": full_bytes, **full},
+        "initial_sync": {"bytes": initial_bytes, "pages": pages, "ms": initial_ms},
+        "idle": {"bytes": idle_bytes, **idle},
+        "one_card_changed": {"bytes": changed_bytes, **summarize(changed)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+POST /auth/sync-user cost for a returning user, before and after the upsert.
+
+"select_then_write" replays the original handler: SELECT by email, assign,
+commit and refresh. "upsert" calls the new sync (one ON CONFLICT statement
+that writes nothing, plus the read-back). A burst of
+concurrent first logins for one email checks that none of them fail.
+
+    python -m benchmarks.bench_user_sync --iterations 2000
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import create_schema, seed_user, summarize, time_calls
+from sqlalchemy import event
+
+from app.auth import sync
+from app.auth.router import UserSyncRequest
+from app.database import SessionLocal, engine
+from app.db_models import User
+
+
+def select_then_write(db, data):
+    db_user = db.query(User).filter(User.email == data.email).first()
+    db_user.name = data.name or db_user.name
+    db_user.google_id = data.google_id or db_user.google_id
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.before)
+
+    def before(self, *args):
+        self.count += 1
+
+    def per_call(self, fn, iterations: int) -> float:
+        self.count = 0
+        for _ in range(iterations):
+            fn()
+        return self.count / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    create_schema()
+    user = seed_user("sync-user")
+    data = UserSyncRequest(email=user.email, name=user.name, google_id=user.google_id)
+    counter = StatementCounter()
+
+    db = SessionLocal()
+    try:
+        results = {}
+        for name, fn in (
+            ("select_then_write", lambda: select_then_write(db, data)),
+            ("upsert", lambda: sync.sync_user(db, data)),
+        ):
+            results[name] = {**summarize(time_calls(fn, args.iterations)),
+                             "statements_per_call": counter.per_call(fn, 20)}
+    finally:
+        db.close()
+
+    def first_login(_):
+        with SessionLocal() as session:
+            try:
+                sync.sync_user(session, UserSyncRequest(email="race@example.com", name="race", google_id="race"))
+                return "ok"
+            except Exception as exc:
+                return type(exc).__name__
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        outcomes = list(pool.map(first_login, range(args.concurrency)))
+
+    print(json.dumps({
+        "benchmark": "user_sync",
+        "results": results,
+        "concurrent_first_logins": {outcome: outcomes.count(outcome) for outcome in set(outcomes)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
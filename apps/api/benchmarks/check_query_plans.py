@@ -0,0 +1,104 @@
+"""
+Fail when a hot router query would fall back to a sequential scan.
+
+Migrates a database with Alembic (a throwaway SQLite file unless DATABASE_URL
+is set), then EXPLAINs the queries the routers run on every request. On
+Postgres sequential scans are disabled for the check, so any "Seq Scan" left
+in a plan means no usable index exists. Exits non-zero on a regression.
+
+    python -m benchmarks.check_query_plans
+"""
+import json
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks import common  # noqa: F401  (points the app at a throwaway database)
+from sqlalchemy import select, text, true
+
+from app import db_models
+from app.compaction import expired_cards_query, expired_decks_query
+from app.database import engine
+from app.decks.export import export_query
+from app.decks.summaries import card_stats_query, preview_query
+from app.flashcards.search import search_query
+from init_db import init_db
+
+Deck, Flashcard, User = db_models.Deck, db_models.Flashcard, db_models.User
+ReviewState = db_models.ReviewState
+BASE_TABLES = {"users", "decks", "flashcards", "review_states"}
+
+
+def hot_queries() -> Dict[str, object]:
+    return {
+        "user_by_google_id": select(User).where(User.google_id == "google-id"),
+        "deck_listing": select(Deck).where(
+            Deck.owner_id == 1, Deck.is_active == true()
+        ).order_by(Deck.id).limit(100),
+        "deck_listing_cursor": select(Deck).where(
+            Deck.owner_id == 1, Deck.is_active == true(), Deck.id > 1000
+        ).order_by(Deck.id).limit(100),
+        "owned_deck": select(Deck).where(
+            Deck.id == 1, Deck.owner_id == 1, Deck.is_active == true()
+        ),
+        "deck_flashcards": select(Flashcard).where(
+            Flashcard.deck_id == 1, Flashcard.is_active == true()
+        ).order_by(Flashcard.id).limit(100),
+        "deck_flashcards_cursor": select(Flashcard).where(
+            Flashcard.deck_id == 1, Flashcard.is_active == true(), Flashcard.id > 1000
+        ).order_by(Flashcard.id).limit(100),
+        "owned_flashcard": select(Flashcard).join(Deck).where(
+            Flashcard.id == 1, Deck.owner_id == 1, Flashcard.is_active == true()
+        ),
+        "deck_card_stats": card_stats_query([1, 2, 3]),
+        "deck_previews": preview_query([1, 2, 3], 3),
+        "deck_export": export_query(1, 1),
+        "flashcard_search": search_query(engine.dialect.name, 1, "capital city", 0, 20),
+        "due_queue": select(ReviewState, Flashcard).join(
+            Flashcard, Flashcard.id == ReviewState.flashcard_id
+        ).join(Deck, Deck.id == Flashcard.deck_id).where(
+            ReviewState.user_id == 1,
+            ReviewState.due_at <= datetime(2030, 1, 1),
+            Flashcard.is_active == true(),
+            Deck.is_active == true()
+        ).order_by(ReviewState.due_at).limit(20),
+        "compaction_expired_cards": expired_cards_query(datetime(2030, 1, 1), 500),
+        "compaction_expired_decks": expired_decks_query(datetime(2030, 1, 1), 500),
+    }
+
+
+def sequential_scans(connection, statement) -> List[str]:
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    if connection.dialect.name == "postgresql":
+        plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        scans, nodes = [], [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in BASE_TABLES:
+                scans.append(f"Seq Scan on {node['Relation Name']}")
+            nodes.extend(node.get("Plans", []))
+        return scans
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return [
+        row.detail for row in rows
+        if row.detail.startswith("SCAN ") and "USING" not in row.detail
+        and row.detail.split()[1] in BASE_TABLES
+    ]
+
+
+def main() -> int:
+    init_db()
+    failures = {}
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SET enable_seqscan = off"))
+        for name, statement in hot_queries().items():
+            scans = sequential_scans(connection, statement)
+            if scans:
+                failures[name] = scans
+    print(json.dumps({"dialect": engine.dialect.name, "checked": len(hot_queries()), "sequential_scans": failures}, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Shared setup for the offline benchmarks.
+
+Importing this module points the app at a throwaway SQLite database (unless
+DATABASE_URL is already set) and a fixed NEXTAUTH_SECRET, so benchmarks never
+need the real deployment environment.
+"""
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+BENCH_SECRET = "benchmark-secret"
+
+if not os.getenv("DATABASE_URL"):
+    _db_dir = tempfile.mkdtemp(prefix="promptly-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("NEXTAUTH_SECRET", BENCH_SECRET)
+# /internal/metrics is not served without a token
+os.environ.setdefault("METRICS_TOKEN", "benchmark-metrics-token")
+# Benchmarks drive one user far past any sane request rate; bench_rate_limit
+# turns these back on for itself
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+os.environ.setdefault("SHED_MAX_IN_FLIGHT", "0")
+os.environ.setdefault("SHED_POOL_WAIT_MS", "0")
+
+from app.authenticate import encode_jwe  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.db_models import User  # noqa: E402
+
+
+def create_schema():
+    """Apply the Alembic migrations, so benchmarks see the production indexes"""
+    from alembic import command
+    from init_db import alembic_config
+
+    config = alembic_config()
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+def seed_user(google_id: str = "bench-user") -> User:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.google_id == google_id).first()
+        if not user:
+            user = User(email=f"{google_id}@example.com", name=google_id, google_id=google_id)
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+
+def mint_token(google_id: str, ttl: int = 3600) -> str:
+    """Mint a NextAuth-compatible session token for google_id"""
+    return encode_jwe({"id": google_id, "exp": int(time.time()) + ttl}, os.environ["NEXTAUTH_SECRET"])
+
+
+def auth_headers(google_id: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {mint_token(google_id)}"}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    ms = [sample * 1000 for sample in samples]
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p50_ms": round(percentile(ms, 50), 4),
+        "p95_ms": round(percentile(ms, 95), 4),
+        "p99_ms": round(percentile(ms, 99), 4),
+    }
+
+
+def time_calls(fn: Callable[[], object], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
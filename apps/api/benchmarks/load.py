@@ -0,0 +1,373 @@
+"""
+Reproducible load test that drives every API endpoint.
+
+Seeds --users users, each with --decks decks of --cards cards, into the
+benchmark database (a throwaway SQLite file, or DATABASE_URL, e.g. a local
+Postgres), mints NextAuth session tokens for them and runs each scenario for
+--requests requests at --concurrency in-flight requests, either through an
+in-process ASGI client (--mode asgi) or over real HTTP against a uvicorn server
+started in-process (--mode http, or --url for an already running server).
+
+Reports throughput, p50/p95/p99 latency, SQL queries per request and peak RSS
+as JSON; pass a previous run's output as --baseline to get ratios against it.
+
+    python -m benchmarks.load --users 20 --cards 200 --requests 200 --output run.json
+    python -m benchmarks.load --mode http --concurrency 32 --baseline run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.common import auth_headers, create_schema, summarize
+import httpx
+from sqlalchemy import event, insert, select
+
+from app import db_models
+from app.database import DB_MODE, SessionLocal, engine, get_async_engine
+from main import app
+
+SEARCH_TERMS = ("front", "back", "card", "deck")
+
+
+@dataclass
+class UserContext:
+    google_id: str
+    email: str
+    headers: Dict[str, str]
+    deck_ids: List[int]
+    card_ids: List[int]
+    # Rows reserved for the DELETE scenarios, one per request
+    spare_deck_ids: List[int] = field(default_factory=list)
+    spare_card_ids: List[int] = field(default_factory=list)
+
+
+RequestSpec = Tuple[str, str, dict]
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[UserContext, int], RequestSpec]
+    # Setup that must not be timed, e.g. reserving rows to delete
+    prepare: Optional[Callable[[List[UserContext], int], None]] = None
+
+
+class QueryCounter:
+    """Counts statements executed by the app's engines"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.count += 1
+
+    def attach(self):
+        engines = [engine]
+        if DB_MODE == "async":
+            engines.append(get_async_engine().sync_engine)
+        for target in engines:
+            event.listen(target, "before_cursor_execute", self)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def seed(users: int, decks: int, cards: int, seed_value: int) -> List[UserContext]:
+    rng = random.Random(seed_value)
+    db = SessionLocal()
+    try:
+        run = uuid.uuid4().hex[:8]
+        google_ids = [f"load-{run}-{i}" for i in range(users)]
+        db.execute(insert(db_models.User), [
+            {"email": f"{google_id}@example.com", "name": google_id, "google_id": google_id, "is_active": True}
+            for google_id in google_ids
+        ])
+        user_ids = dict(db.execute(
+            select(db_models.User.google_id, db_models.User.id).where(db_models.User.google_id.in_(google_ids))
+        ).all())
+        db.execute(insert(db_models.Deck), [
+            {"name": f"deck {d}", "description": f"load test deck {d}", "owner_id": user_ids[google_id], "is_active": True}
+            for google_id in google_ids for d in range(decks)
+        ])
+        deck_rows = db.execute(
+            select(db_models.Deck.id, db_models.Deck.owner_id).where(db_models.Deck.owner_id.in_(user_ids.values()))
+        ).all()
+        card_rows = [
+            {"front": f"front {rng.choice(SEARCH_TERMS)} {c}", "back": f"back {c}", "deck_id": deck_id, "is_active": True}
+            for deck_id, _ in deck_rows for c in range(cards)
+        ]
+        for start in range(0, len(card_rows), 10000):
+            db.execute(insert(db_models.Flashcard), card_rows[start:start + 10000])
+        db.commit()
+
+        contexts = []
+        for google_id in google_ids:
+            owner_id = user_ids[google_id]
+            deck_ids = sorted(deck_id for deck_id, owner in deck_rows if owner == owner_id)
+            card_ids = db.execute(
+                select(db_models.Flashcard.id).where(db_models.Flashcard.deck_id.in_(deck_ids)).order_by(db_models.Flashcard.id)
+            ).scalars().all()
+            contexts.append(UserContext(google_id, f"{google_id}@example.com", auth_headers(google_id), deck_ids, list(card_ids)))
+        return contexts
+    finally:
+        db.close()
+
+
+def reserve_decks(contexts: List[UserContext], requests: int) -> None:
+    db = SessionLocal()
+    try:
+        for index, ctx in enumerate(contexts):
+            owner_id = db.execute(select(db_models.User.id).where(db_models.User.google_id == ctx.google_id)).scalar()
+            needed = len(range(index, requests, len(contexts)))
+            ctx.spare_deck_ids = [
+                db.execute(insert(db_models.Deck).values(name="spare", owner_id=owner_id, is_active=True)).inserted_primary_key[0]
+                for _ in range(needed)
+            ]
+        db.commit()
+    finally:
+        db.close()
+
+
+def reserve_cards(contexts: List[UserContext], requests: int) -> None:
+    db = SessionLocal()
+    try:
+        for index, ctx in enumerate(contexts):
+            needed = len(range(index, requests, len(contexts)))
+            ctx.spare_card_ids = [
+                db.execute(insert(db_models.Flashcard).values(
+                    front="spare", back="spare", deck_id=ctx.deck_ids[0], is_active=True
+                )).inserted_primary_key[0]
+                for _ in range(needed)
+            ]
+        db.commit()
+    finally:
+        db.close()
+
+
+def _pick(values: List[int], i: int) -> int:
+    return values[i % len(values)]
+
+
+def _import_body(i: int) -> bytes:
+    return "".join(json.dumps({"front": f"imported {i}-{n}", "back": "imported"}) + "\n" for n in range(10)).encode()
+
+
+def _review_batch(ctx: UserContext, i: int) -> dict:
+    now = datetime.now(timezone.utc).isoformat()
+    return {"reviews": [
+        {"review_id": uuid.uuid4().hex, "flashcard_id": _pick(ctx.card_ids, i * 10 + n), "grade": 4, "reviewed_at": now}
+        for n in range(10)
+    ]}
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("GET /auth/me", lambda ctx, i: ("GET", "/auth/me", {})),
+    Scenario("POST /auth/sync-user", lambda ctx, i: ("POST", "/auth/sync-user", {
+        "json": {"email": ctx.email, "name": ctx.google_id, "google_id": ctx.google_id}})),
+    Scenario("POST /auth/logout", lambda ctx, i: ("POST", "/auth/logout", {})),
+    Scenario("GET /decks/", lambda ctx, i: ("GET", "/decks/", {})),
+    Scenario("GET /decks/?preview=3", lambda ctx, i: ("GET", "/decks/", {"params": {"preview": 3}})),
+    Scenario("GET /decks/{deck_id}", lambda ctx, i: ("GET", f"/decks/{_pick(ctx.deck_ids, i)}", {})),
+    Scenario("GET /decks/{deck_id}/export", lambda ctx, i: ("GET", f"/decks/{_pick(ctx.deck_ids, i)}/export", {})),
+    Scenario("GET /decks/export", lambda ctx, i: ("GET", "/decks/export", {"params": {"format": "csv"}})),
+    Scenario("GET /flashcards/deck/{deck_id}", lambda ctx, i: ("GET", f"/flashcards/deck/{_pick(ctx.deck_ids, i)}", {})),
+    Scenario("GET /flashcards/{flashcard_id}", lambda ctx, i: ("GET", f"/flashcards/{_pick(ctx.card_ids, i)}", {})),
+    Scenario("GET /flashcards/search", lambda ctx, i: ("GET", "/flashcards/search", {
+        "params": {"q": SEARCH_TERMS[i % len(SEARCH_TERMS)]}})),
+    Scenario("GET /reviews/due", lambda ctx, i: ("GET", "/reviews/due", {})),
+    Scenario("GET /internal/metrics", lambda ctx, i: ("GET", "/internal/metrics", {
+        "headers": {"X-Metrics-Token": os.environ["METRICS_TOKEN"]}})),
+    Scenario("POST /decks/", lambda ctx, i: ("POST", "/decks/", {"json": {"name": f"new deck {i}"}})),
+    Scenario("PUT /decks/{deck_id}", lambda ctx, i: ("PUT", f"/decks/{_pick(ctx.deck_ids, i)}", {
+        "json": {"description": f"updated {i}"}})),
+    Scenario("POST /flashcards/deck/{deck_id}", lambda ctx, i: ("POST", f"/flashcards/deck/{_pick(ctx.deck_ids, i)}", {
+        "json": {"front": f"new front {i}", "back": "new back"}})),
+    Scenario("PUT /flashcards/{flashcard_id}", lambda ctx, i: ("PUT", f"/flashcards/{_pick(ctx.card_ids, i)}", {
+        "json": {"back": f"updated {i}"}})),
+    Scenario("POST /flashcards/deck/{deck_id}/import", lambda ctx, i: (
+        "POST", f"/flashcards/deck/{_pick(ctx.deck_ids, i)}/import", {
+            "params": {"format": "jsonl"}, "content": _import_body(i)})),
+    Scenario("POST /reviews/{flashcard_id}", lambda ctx, i: ("POST", f"/reviews/{_pick(ctx.card_ids, i)}", {
+        "json": {"grade": 1 + i % 5}})),
+    Scenario("POST /reviews/batch", lambda ctx, i: ("POST", "/reviews/batch", {"json": _review_batch(ctx, i)})),
+    Scenario("POST /reviews/deck/{deck_id}/reschedule", lambda ctx, i: (
+        "POST", f"/reviews/deck/{_pick(ctx.deck_ids, i)}/reschedule", {"json": {"interval_modifier": 1.0}})),
+    Scenario("DELETE /flashcards/{flashcard_id}", lambda ctx, i: ("DELETE", f"/flashcards/{ctx.spare_card_ids.pop()}", {}),
+             prepare=reserve_cards),
+    Scenario("DELETE /decks/{deck_id}", lambda ctx, i: ("DELETE", f"/decks/{ctx.spare_deck_ids.pop()}", {}),
+             prepare=reserve_decks),
+]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    contexts: List[UserContext],
+    requests: int,
+    concurrency: int,
+    counter: Optional[QueryCounter],
+) -> dict:
+    if scenario.prepare:
+        scenario.prepare(contexts, requests)
+    # Build every request up front so only the HTTP round trip is timed
+    specs = []
+    for i in range(requests):
+        ctx = contexts[i % len(contexts)]
+        method, url, kwargs = scenario.build(ctx, i // len(contexts))
+        specs.append((method, url, {**kwargs, "headers": {**ctx.headers, **kwargs.get("headers", {})}}))
+
+    samples: List[float] = []
+    statuses: Dict[str, int] = {}
+    pending = iter(specs)
+
+    async def worker():
+        for method, url, kwargs in pending:
+            started = time.perf_counter()
+            try:
+                status = str((await client.request(method, url, **kwargs)).status_code)
+            except httpx.TransportError:
+                status = "connection_error"
+            samples.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    queries_before = counter.count if counter else 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(samples)
+    result["throughput_rps"] = round(len(samples) / elapsed, 1)
+    result["errors"] = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    result["statuses"] = statuses
+    result["queries_per_request"] = round((counter.count - queries_before) / len(samples), 2) if counter else None
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server():
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=free_port(), log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{server.config.port}"
+
+
+def compare(results: dict, baseline: dict) -> dict:
+    """Ratios against a baseline run: > 1 means this run is slower or heavier"""
+    comparison = {}
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        comparison[name] = {
+            metric: round(current[metric] / previous[metric], 3)
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+            if current.get(metric) and previous.get(metric)
+        }
+        if current["throughput_rps"] and previous.get("throughput_rps"):
+            comparison[name]["throughput_rps"] = round(current["throughput_rps"] / previous["throughput_rps"], 3)
+    return comparison
+
+
+async def run(args) -> dict:
+    create_schema()
+    contexts = seed(args.users, args.decks, args.cards, args.seed)
+    scenarios = [s for s in SCENARIOS if not args.only or any(term in s.name for term in args.only)]
+
+    server = None
+    counter = None
+    if args.url:
+        base_url = args.url
+    else:
+        counter = QueryCounter()
+        counter.attach()
+        if args.mode == "http":
+            server, thread, base_url = start_server()
+
+    if args.url or args.mode == "http":
+        client = httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app, raise_app_exceptions=False), base_url="http://bench", timeout=60)
+
+    results = {}
+    try:
+        async with client:
+            for scenario in scenarios:
+                print(f"running {scenario.name}", file=sys.stderr)
+                results[scenario.name] = await run_scenario(
+                    client, scenario, contexts, args.requests, args.concurrency, counter
+                )
+    finally:
+        if server:
+            server.should_exit = True
+            thread.join()
+        if DB_MODE == "async":
+            # aiosqlite connections run on non-daemon threads that would keep the process alive
+            await get_async_engine().dispose()
+
+    return {
+        "benchmark": "load",
+        "mode": "http" if args.url else args.mode,
+        "db_mode": DB_MODE,
+        "database": engine.dialect.name,
+        "config": {
+            "users": args.users, "decks": args.decks, "cards": args.cards,
+            "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+        },
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--decks", type=int, default=5, help="decks per user")
+    parser.add_argument("--cards", type=int, default=100, help="cards per deck")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=("asgi", "http"), default="asgi")
+    parser.add_argument("--url", help="load an already running server instead (queries are not counted)")
+    parser.add_argument("--only", action="append", help="run scenarios whose name contains this; repeatable")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report["results"], json.load(f))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
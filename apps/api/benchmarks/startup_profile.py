@@ -0,0 +1,128 @@
+"""
+Cold-start profile: import-time breakdown of `import main`, then
+startup-to-ready time, per-worker memory and graceful shutdown time of
+serve.py.
+
+    python -m benchmarks.startup_profile --workers 2
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from benchmarks.common import create_schema
+import httpx
+
+API_DIR = Path(__file__).resolve().parent.parent
+# Libraries that should stay off the import path until first use
+LAZY_MODULES = ("jose", "google.auth", "google.oauth2", "requests", "uvicorn")
+
+
+def import_profile(top: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=API_DIR, env=os.environ, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    by_package = defaultdict(int)
+    for name, self_us, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+    loaded = {name for name, _, _ in modules}
+    total_us = next(cumulative for name, _, cumulative in modules if name == "main")
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "modules": len(modules),
+        "by_package_ms": {
+            package: round(us / 1000, 1)
+            for package, us in sorted(by_package.items(), key=lambda item: -item[1])[:top]
+        },
+        "slowest_modules_ms": {
+            name: round(self_us / 1000, 1)
+            for name, self_us, _ in sorted(modules, key=lambda module: -module[1])[:top]
+        },
+        "eagerly_loaded": [module for module in LAZY_MODULES if module in loaded],
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_profile(workers: int, timeout: float) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=API_DIR, env=os.environ,
+    )
+    try:
+        first_ready_ms = None
+        processes = {}
+        # A fresh connection per poll, so the kernel can hand it to any worker
+        headers = {"X-Metrics-Token": os.getenv("METRICS_TOKEN", ""), "Connection": "close"}
+        with httpx.Client(base_url=base_url, timeout=2, headers=headers) as client:
+            deadline = time.monotonic() + timeout
+            # Requests are spread over the workers by the kernel; poll until each has answered
+            while len(processes) < workers and time.monotonic() < deadline:
+                try:
+                    response = client.get("/internal/metrics")
+                except httpx.TransportError:
+                    time.sleep(0.02)
+                    continue
+                if response.status_code == 200:
+                    stats = response.json()["process"]
+                    if stats["ready"]:
+                        if first_ready_ms is None:
+                            first_ready_ms = round((time.perf_counter() - started) * 1000, 1)
+                        processes[stats["pid"]] = {"ready_ms": stats["ready_ms"], "rss_mb": stats["rss_mb"]}
+                time.sleep(0.01)
+        all_ready_ms = round((time.perf_counter() - started) * 1000, 1) if len(processes) == workers else None
+    finally:
+        stop_started = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+        shutdown_ms = round((time.perf_counter() - stop_started) * 1000, 1)
+
+    return {
+        "workers": workers,
+        "launch_to_first_ready_ms": first_ready_ms,
+        "launch_to_all_seen_ready_ms": all_ready_ms,
+        "per_worker": processes,
+        "graceful_shutdown_ms": shutdown_ms,
+        "exit_code": process.returncode,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--skip-serve", action="store_true", help="only report the import-time breakdown")
+    args = parser.parse_args()
+
+    create_schema()
+    report = {"benchmark": "startup", "imports": import_profile(args.top)}
+    if not args.skip_serve:
+        report["serve"] = serve_profile(args.workers, args.timeout)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
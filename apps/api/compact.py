@@ -0,0 +1,30 @@
+"""
+Compact soft-deleted decks and flashcards
+Run this periodically (e.g. daily from cron) to move rows deleted longer ago
+than SOFT_DELETE_RETENTION_DAYS out of the hot tables; see app/compaction.py
+"""
+import argparse
+import json
+import logging
+
+from app import compaction
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive or purge soft-deleted decks and flashcards")
+    parser.add_argument("--mode", choices=["archive", "purge"], default=compaction.COMPACTION_MODE)
+    parser.add_argument("--retention-days", type=float, default=compaction.SOFT_DELETE_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=compaction.COMPACTION_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=compaction.COMPACTION_BATCH_PAUSE,
+                        help="seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be compacted")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    compactor = compaction.Compactor(args.mode, args.retention_days, args.batch_size, args.pause)
+    report = compactor.pending() if args.dry_run else compactor.run()
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,35 @@
 """
 Database initialization script
-Run this to create all tables
+Run this to bring the schema up to date with the Alembic migrations
 """
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
 from app.database import engine
-from app.db_models import Base
+
+ALEMBIC_INI = Path(__file__).parent / "alembic.ini"
+# Revision matching the schema the old create_all startup produced
+INITIAL_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    return config
+
 
 def init_db():
-    """Create all tables"""
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully!")
+    """Apply all pending migrations"""
+    config = alembic_config()
+    inspector = inspect(engine)
+    if inspector.has_table("users") and not inspector.has_table("alembic_version"):
+        # Tables created by create_all before migrations existed: adopt them
+        command.stamp(config, INITIAL_REVISION)
+    command.upgrade(config, "head")
+    print("✅ Database schema is up to date!")
 
 if __name__ == "__main__":
     init_db()
@@ -1,26 +1,32 @@
-from fastapi import FastAPI
+from fastapi import APIRouter, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 import os
-from dotenv import load_dotenv
+from typing import Optional
 from app.auth.router import router as auth_router
+from app.batch.router import router as batch_router
 from app.decks.router import router as decks_router
 from app.flashcards.router import router as flashcards_router
-from app.database import engine
-from app.db_models import Base
-
-# Load environment variables
-load_dotenv()
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from app.internal.router import router as internal_router
+from app.reviews.router import router as reviews_router
+from app.sync.router import router as sync_router
+from app.database import DB_MODE
+from app import instrumentation, rate_limit, replicas
+from app.startup import lifespan
 
+# The schema is managed by Alembic; run `python init_db.py` before starting.
+# Importing this module has no side effects beyond building the app: startup
+# work runs in the lifespan handler, once per worker.
 app = FastAPI(
     title="Promptly API",
     description="FastAPI backend for Promptly application with PostgreSQL and Google OAuth",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Load shedding and rate limit headers; added before CORS so that shed
+# responses still carry CORS headers
+rate_limit.install(app)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,13 +34,57 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor", "ETag", "Server-Timing",
+        "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After",
+    ],
 )
 
+# Per-request query counts and timings: Server-Timing header, sampled logs and
+# per-route histograms under /internal/metrics
+instrumentation.install(app)
+
+# Read-your-writes: reads by a user who just wrote skip the replicas
+replicas.install(app)
+
+
+def include_router_with_twins(router: APIRouter, async_router: Optional[APIRouter] = None, **kwargs):
+    """Include router, swapping in async twins for the routes async_router also serves
+
+    Routes keep the order of the sync router so static paths such as
+    /decks/export still match before /decks/{deck_id}.
+    """
+    twins = {}
+    if async_router is not None:
+        twins = {(route.path, method): route for route in async_router.routes for method in route.methods}
+    merged = APIRouter()
+    merged.routes = [
+        next((twins[(route.path, method)] for method in route.methods if (route.path, method) in twins), route)
+        for route in router.routes
+    ]
+    app.include_router(merged, **kwargs)
+
+
 # Include routers
-app.include_router(auth_router, tags=["auth"])
-app.include_router(decks_router, tags=["decks"])
-app.include_router(flashcards_router, tags=["flashcards"])
+async_auth_router = async_decks_router = async_flashcards_router = None
+if DB_MODE == "async":
+    # Async twins take over the core CRUD routes; anything they do not cover
+    # is still served by the sync routers
+    from app.auth.async_router import router as async_auth_router
+    from app.decks.async_router import router as async_decks_router
+    from app.flashcards.async_router import router as async_flashcards_router
+
+include_router_with_twins(auth_router, async_auth_router, tags=["auth"])
+include_router_with_twins(decks_router, async_decks_router, tags=["decks"])
+include_router_with_twins(flashcards_router, async_flashcards_router, tags=["flashcards"])
+app.include_router(reviews_router, tags=["reviews"])
+app.include_router(sync_router, tags=["sync"])
+app.include_router(batch_router, tags=["batch"])
+app.include_router(internal_router, tags=["internal"])
 
 if __name__ == "__main__":
+    # Development server with auto-reload; production runs serve.py
+    import uvicorn
+
     port = int(os.getenv("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
@@ -0,0 +1,53 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import Base, engine
+from app import db_models  # noqa: F401  (registers the models on Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Search objects created by raw SQL in migration 0005; they have no ORM model
+SEARCH_OBJECTS = {"search_vector", "ix_flashcards_search_vector"}
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    if name in SEARCH_OBJECTS or (type_ == "table" and name.startswith("flashcards_fts")):
+        return False
+    return True
+
+
+def run_migrations_offline():
+    """Emit SQL to stdout instead of running it (alembic upgrade --sql)"""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        include_object=include_object,
+        render_as_batch=engine.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,39 @@
+"""Index the foreign keys and the (owner/deck, is_active) hot paths
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Composite indexes that create_all may have added before migrations existed;
+    # the partial indexes below replace them
+    op.execute("DROP INDEX IF EXISTS ix_decks_owner_active_id")
+    op.execute("DROP INDEX IF EXISTS ix_flashcards_deck_active_id")
+
+    op.create_index("ix_decks_owner_id", "decks", ["owner_id"])
+    op.create_index(
+        "ix_decks_active_owner_id", "decks", ["owner_id", "id"],
+        postgresql_where=sa.text("is_active = true"), sqlite_where=sa.text("is_active = 1"),
+    )
+    op.create_index("ix_flashcards_deck_id", "flashcards", ["deck_id"])
+    op.create_index(
+        "ix_flashcards_active_deck_id", "flashcards", ["deck_id", "id"],
+        postgresql_where=sa.text("is_active = true"), sqlite_where=sa.text("is_active = 1"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_flashcards_active_deck_id", table_name="flashcards")
+    op.drop_index("ix_flashcards_deck_id", table_name="flashcards")
+    op.drop_index("ix_decks_active_owner_id", table_name="decks")
+    op.drop_index("ix_decks_owner_id", table_name="decks")
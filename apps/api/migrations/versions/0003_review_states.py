@@ -0,0 +1,36 @@
+"""Spaced-repetition review state per card
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "review_states",
+        sa.Column("flashcard_id", sa.Integer(), sa.ForeignKey("flashcards.id"), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("ease", sa.Float(), nullable=False),
+        sa.Column("interval_days", sa.Float(), nullable=False),
+        sa.Column("repetitions", sa.Integer(), nullable=False),
+        sa.Column("lapses", sa.Integer(), nullable=False),
+        sa.Column("due_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_reviewed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_review_states_user_due", "review_states", ["user_id", "due_at"])
+
+
+def downgrade():
+    op.drop_index("ix_review_states_user_due", table_name="review_states")
+    op.drop_table("review_states")
@@ -0,0 +1,32 @@
+"""Review log keyed by client review id for idempotent batch sync
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "review_logs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("review_id", sa.String(64), nullable=False),
+        sa.Column("flashcard_id", sa.Integer(), sa.ForeignKey("flashcards.id"), nullable=False),
+        sa.Column("grade", sa.Integer(), nullable=False),
+        sa.Column("reviewed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.UniqueConstraint("user_id", "review_id", name="uq_review_logs_user_review"),
+    )
+
+
+def downgrade():
+    op.drop_table("review_logs")
@@ -0,0 +1,70 @@
+"""Full-text search index over flashcard front/back
+
+Postgres gets a generated tsvector column with a partial GIN index over active
+cards. SQLite gets an external-content FTS5 table kept in sync by triggers,
+which drop soft-deleted cards from the index and re-add restored ones. Neither
+object is part of the ORM metadata (see include_object in env.py).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute(
+            "ALTER TABLE flashcards ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+            "(to_tsvector('english', coalesce(front, '') || ' ' || coalesce(back, ''))) STORED"
+        )
+        op.execute(
+            "CREATE INDEX ix_flashcards_search_vector ON flashcards "
+            "USING GIN (search_vector) WHERE is_active = true"
+        )
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE flashcards_fts USING fts5("
+            "front, back, content='flashcards', content_rowid='id')"
+        )
+        op.execute(
+            "INSERT INTO flashcards_fts(rowid, front, back) "
+            "SELECT id, front, back FROM flashcards WHERE is_active = 1"
+        )
+        op.execute(
+            "CREATE TRIGGER flashcards_fts_insert AFTER INSERT ON flashcards WHEN new.is_active = 1 BEGIN "
+            "INSERT INTO flashcards_fts(rowid, front, back) VALUES (new.id, new.front, new.back); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER flashcards_fts_delete AFTER DELETE ON flashcards WHEN old.is_active = 1 BEGIN "
+            "INSERT INTO flashcards_fts(flashcards_fts, rowid, front, back) VALUES ('delete', old.id, old.front, old.back); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER flashcards_fts_update AFTER UPDATE OF front, back, is_active ON flashcards BEGIN "
+            "INSERT INTO flashcards_fts(flashcards_fts, rowid, front, back) "
+            "SELECT 'delete', old.id, old.front, old.back WHERE old.is_active = 1; "
+            "INSERT INTO flashcards_fts(rowid, front, back) "
+            "SELECT new.id, new.front, new.back WHERE new.is_active = 1; "
+            "END"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_flashcards_search_vector")
+        op.execute("ALTER TABLE flashcards DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS flashcards_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS flashcards_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS flashcards_fts_insert")
+        op.execute("DROP TABLE IF EXISTS flashcards_fts")
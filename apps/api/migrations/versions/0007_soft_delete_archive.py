@@ -0,0 +1,83 @@
+"""Soft-delete timestamps and archive tables for compaction
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ("decks", "flashcards"):
+        op.add_column(table, sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+        # Rows deleted before this column existed: their last update is the best guess
+        op.execute(
+            f"UPDATE {table} SET deleted_at = COALESCE(updated_at, created_at, CURRENT_TIMESTAMP) "
+            f"WHERE is_active = false"
+        )
+        op.create_index(
+            f"ix_{table}_deleted_at", table, ["deleted_at"],
+            postgresql_where=sa.text("is_active = false"), sqlite_where=sa.text("is_active = 0"),
+        )
+
+    op.create_table(
+        "decks_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_decks_archive_owner_id", "decks_archive", ["owner_id"])
+
+    op.create_table(
+        "flashcards_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("front", sa.Text(), nullable=False),
+        sa.Column("back", sa.Text(), nullable=False),
+        sa.Column("deck_id", sa.Integer(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_flashcards_archive_deck_id", "flashcards_archive", ["deck_id"])
+
+    op.create_table(
+        "review_logs_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("review_id", sa.String(64), nullable=False),
+        sa.Column("flashcard_id", sa.Integer(), nullable=False),
+        sa.Column("grade", sa.Integer(), nullable=False),
+        sa.Column("reviewed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_review_logs_archive_flashcard_id", "review_logs_archive", ["flashcard_id"])
+
+
+def downgrade():
+    op.drop_index("ix_review_logs_archive_flashcard_id", table_name="review_logs_archive")
+    op.drop_table("review_logs_archive")
+    op.drop_index("ix_flashcards_archive_deck_id", table_name="flashcards_archive")
+    op.drop_table("flashcards_archive")
+    op.drop_index("ix_decks_archive_owner_id", table_name="decks_archive")
+    op.drop_table("decks_archive")
+    for table in ("flashcards", "decks"):
+        op.drop_index(f"ix_{table}_deleted_at", table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("deleted_at")
@@ -0,0 +1,38 @@
+"""Per-user change numbers for delta sync
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ("users", "decks", "flashcards"):
+        op.add_column(table, sa.Column("change_seq", sa.BigInteger(), nullable=False, server_default="0"))
+        # Existing rows count as change 1, so a first sync from 0 returns them
+        op.execute(f"UPDATE {table} SET change_seq = 1")
+    op.add_column("users", sa.Column("sync_floor", sa.BigInteger(), nullable=False, server_default="0"))
+    for table in ("decks_archive", "flashcards_archive"):
+        op.add_column(table, sa.Column("change_seq", sa.BigInteger(), nullable=True))
+
+    op.create_index("ix_decks_owner_change_seq", "decks", ["owner_id", "change_seq", "id"])
+    op.create_index("ix_flashcards_deck_change_seq", "flashcards", ["deck_id", "change_seq", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_flashcards_deck_change_seq", table_name="flashcards")
+    op.drop_index("ix_decks_owner_change_seq", table_name="decks")
+    for table in ("flashcards_archive", "decks_archive", "flashcards", "decks"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("change_seq")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("sync_floor")
+        batch_op.drop_column("change_seq")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the API.
+
+Binds the listening socket, imports the app once in the master process
+(--preload, the default) and forks --workers uvicorn workers that share the
+socket. Preloading means imports happen once and the loaded code is shared
+copy-on-write between workers; each worker still runs the lifespan startup
+itself, so no database connection crosses a fork. Crashed workers are
+replaced. SIGTERM/SIGINT stop accepting connections, let in-flight requests
+finish for up to --graceful-timeout seconds, then kill what is left.
+
+    python serve.py --workers 4
+    WEB_CONCURRENCY=4 PORT=8000 python serve.py
+
+Run `python init_db.py` first to apply migrations.
+"""
+import argparse
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger("serve")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the API with preloaded, forked uvicorn workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction,
+                        default=os.getenv("PRELOAD", "1") != "0")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    return parser.parse_args()
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, args) -> None:
+    """Body of a forked worker; never returns"""
+    import uvicorn
+
+    # Restore default handlers; uvicorn installs its own graceful ones in serve()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    from app import replicas, startup
+    from app.database import reset_after_fork
+    from main import app
+
+    startup.mark_process_start()
+    reset_after_fork()
+    replicas.reset_after_fork()
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+    )
+    code = 0
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException:
+        logger.exception("worker %s crashed", os.getpid())
+        code = 1
+    os._exit(code)
+
+
+class Master:
+    def __init__(self, sock: socket.socket, args):
+        self.sock = sock
+        self.args = args
+        self.workers = {}
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.sock, self.args)
+        self.workers[pid] = time.monotonic()
+        logger.info("started worker %s", pid)
+
+    def stop(self, signum, frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("received %s, stopping %s workers", signal.Signals(signum).name, len(self.workers))
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+
+    def reap(self, block: bool) -> None:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            self.workers.pop(pid, None)
+            if not self.stopping:
+                logger.warning("worker %s exited with status %s, replacing it", pid, os.waitstatus_to_exitcode(status))
+                self.spawn()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+        while not self.stopping:
+            self.reap(block=False)
+            time.sleep(0.5)
+
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap(block=False)
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning("worker %s did not stop in time, killing it", pid)
+            os.kill(pid, signal.SIGKILL)
+        self.reap(block=True)
+        logger.info("all workers stopped")
+
+
+def main():
+    args = parse_args()
+    # The pool sizing in app.db_pool splits the connection budget by this
+    os.environ["WEB_CONCURRENCY"] = str(max(1, args.workers))
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    # SQLAlchemy pools log every dispose/recreate at INFO under their class's module
+    logging.getLogger("app.db_pool").setLevel(max(logging.WARNING, logging.getLogger().level))
+
+    sock = bind_socket(args.host, args.port)
+    if args.preload:
+        started = time.perf_counter()
+        importlib.import_module("main")
+        logger.info("preloaded app in %.0f ms", (time.perf_counter() - started) * 1000)
+    logger.info("listening on %s:%s with %s workers", args.host, args.port, args.workers)
+    Master(sock, args).run()
+    sock.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
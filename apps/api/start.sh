@@ -19,6 +19,10 @@ fi
 echo "📦 Installing dependencies..."
 $PIP_PATH install -r requirements.txt
 
+# Apply database migrations
+echo "🗄️ Applying database migrations..."
+$PYTHON_PATH init_db.py || exit 1
+
 # Start the application
 echo "🚀 Starting FastAPI server..."
-$PYTHON_PATH main.py
+$PYTHON_PATH serve.py
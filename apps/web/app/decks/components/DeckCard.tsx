@@ -43,7 +43,7 @@ export function DeckCard({ deck, onEdit, onDelete, onView }: DeckCardProps) {
       
       <div className="flex justify-between items-center">
         <div className="text-sm text-gray-500">
-          <span className="font-medium">{deck.flashcards?.length || 0}</span> cards
+          <span className="font-medium">{deck.card_count ?? deck.flashcards?.length ?? 0}</span> cards
           <span className="mx-2">•</span>
           Created {new Date(deck.created_at).toLocaleDateString()}
         </div>
@@ -153,7 +153,7 @@ export default function DecksPage() {
                     {deck.name}
                   </h3>
                   <span className="text-sm text-gray-500 bg-gray-100 px-2 py-1 rounded">
-                    {deck.flashcards?.length || 0} cards
+                    {deck.card_count ?? deck.flashcards?.length ?? 0} cards
                   </span>
                 </div>
                 {deck.description && (
@@ -16,7 +16,8 @@ interface Deck {
   name: string;
   description?: string;
   created_at: string;
-  flashcards: Array<{ id: number; front: string; back: string }>;
+  card_count?: number;
+  flashcards?: Array<{ id: number; front: string; back: string }> | null;
 }
 
 export default function DecksPage() {
@@ -164,7 +165,7 @@ export default function DecksPage() {
                       {deck.name}
                     </CardTitle>
                     <Badge variant="secondary">
-                      {deck.flashcards?.length || 0} cards
+                      {deck.card_count ?? deck.flashcards?.length ?? 0} cards
                     </Badge>
                   </div>
                   {deck.description && (
@@ -21,7 +21,11 @@ export interface Deck {
   is_active: boolean
   created_at: string
   updated_at?: string
-  flashcards: Flashcard[]
+  // Deck listings return summaries; full card lists only come with the deck detail
+  card_count?: number
+  last_modified_at?: string
+  preview?: Flashcard[]
+  flashcards?: Flashcard[] | null
 }
 
 export interface DeckCreate {